@@ -0,0 +1,195 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Capture backends used by ScreenBoard to turn the current camera view into a
+    board image, ie.
+
+    board = ScreenBoard(image_path, backend=get_backend('offscreen'))
+
+"playblast" captures through the interactive model panel. "offscreen"
+    renders with Viewport 2.0 through ogsRender and needs no visible panel,
+    so it also runs in a batch mayapy session on farm nodes. "standin"
+    writes placeholder images without Maya, for testing board pipelines.
+'''
+
+import os
+
+try:
+    import maya.cmds as mc
+    from VAD import BoardImageOps
+except ImportError:
+    mc = None
+    BoardImageOps = None
+
+STANDIN_SIZE = (64, 64)
+
+
+def write_placeholder_image(image_path, width, height):
+    '''
+    write gradient placeholder image as binary PPM data, whatever the
+        extension of the path
+
+    :type   image_path: C{str}
+    :param  image_path: path to write image to
+    :type   width: C{int}
+    :param  width: image width, 0 uses the stand-in size
+    :type   height: C{int}
+    :param  height: image height, 0 uses the stand-in size
+    '''
+    width = width or STANDIN_SIZE[0]
+    height = height or STANDIN_SIZE[1]
+
+    row_values = []
+    for x in range(width):
+        row_values.extend([x * 255 / max(1, width - 1), 128, 128])
+    row = bytearray(row_values)
+
+    with open(image_path, 'wb') as image_file:
+        image_file.write('P6\n%d %d\n255\n' % (width, height))
+        for _ in range(height):
+            image_file.write(row)
+
+
+class CaptureBackend(object):
+    '''
+    Base of board capture backends, capturing through the active model panel
+        with playblast unless a backend renders some other way
+    '''
+    name = None
+
+    def __init__(self, camera=None):
+        '''
+        initialize instance variables
+
+        :type   camera: C{str}
+        :param  camera: *OPTIONAL* camera to capture, backends capturing
+                            through a model panel use the panel's camera
+        '''
+        self._camera = camera
+
+    @property
+    def camera(self):
+        '''
+        get camera to capture
+        '''
+        return self._camera
+
+    @camera.setter
+    def camera(self, cam):
+        '''
+        set camera to capture
+
+        :type   cam: C{str}
+        :param  cam: camera transform
+        '''
+        self._camera = cam
+
+    def capture(self, image_path, width_height, ext='jpg', quality=40):
+        '''
+        capture the current camera view to an image file
+
+        :type   image_path: C{str}
+        :param  image_path: path to save image to
+        :type   width_height: C{tuple}
+        :param  width_height: width and height of image; values of 0 means
+                                the backend's default size
+        :type   ext: C{str}
+        :param  ext: image format, ie. "jpg"
+        :type   quality: C{int}
+        :param  quality: image quality, where the format supports it
+        '''
+        mc.playblast(
+                frame=1, format="image", completeFilename=image_path,
+                clearCache=True, viewer=False, showOrnaments=False,
+                compression=ext, quality=quality, percent=100,
+                widthHeight=width_height)
+
+
+class PlayblastBackend(CaptureBackend):
+    '''
+    Captures through the active model panel with playblast
+    '''
+    name = 'playblast'
+
+
+class OffscreenBackend(CaptureBackend):
+    '''
+    Renders offscreen with Viewport 2.0, without a model panel
+    '''
+    name = 'offscreen'
+
+    @property
+    def camera(self):
+        '''
+        get camera to render, defaults to the first renderable camera in
+            the scene
+        '''
+        if not self._camera:
+            renderable = [cam for cam in mc.ls(type='camera', long=True)
+                                    if mc.getAttr('%s.renderable' % cam)]
+            if not renderable:
+                raise RuntimeError('No camera set to render offscreen boards.')
+            return mc.listRelatives(renderable[0], parent=True,
+                                    fullPath=True)[0]
+
+        return self._camera
+
+    @camera.setter
+    def camera(self, cam):
+        '''
+        set camera to render
+
+        :type   cam: C{str}
+        :param  cam: camera transform
+        '''
+        self._camera = cam
+
+    def capture(self, image_path, width_height, ext='jpg', quality=40):
+        width, height = width_height
+        width = width or mc.getAttr('defaultResolution.width')
+        height = height or mc.getAttr('defaultResolution.height')
+
+        rendered = mc.ogsRender(camera=self.camera, width=width,
+                                height=height, currentFrame=True)
+
+        # ogsRender writes with the scene's render settings, convert it to
+        #   the board's format, quality and path
+        image = BoardImageOps.read_image(rendered)
+        BoardImageOps.write_image(image, image_path, ext, quality)
+        os.remove(rendered)
+
+
+class StandinBackend(CaptureBackend):
+    '''
+    Writes placeholder images without rendering anything
+    '''
+    name = 'standin'
+
+    def capture(self, image_path, width_height, ext='jpg', quality=40):
+        write_placeholder_image(image_path, *width_height)
+
+
+BACKENDS = dict((backend.name, backend) for backend in
+                        [PlayblastBackend, OffscreenBackend, StandinBackend])
+
+
+def get_backend(name, **kwargs):
+    '''
+    create capture backend by name
+
+    :type   name: C{str}
+    :param  name: one of BACKENDS
+    :param  kwargs: passed on to the backend, ie. camera for "offscreen"
+    '''
+    if name not in BACKENDS:
+        raise ValueError('Unsupported capture backend: %s. Use one of: %s.'
+                                    % (name, ', '.join(sorted(BACKENDS))))
+
+    return BACKENDS[name](**kwargs)
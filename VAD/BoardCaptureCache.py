@@ -0,0 +1,312 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Skip-unchanged cache for screen board captures. Each board is keyed on a
+    fingerprint of everything that shows up in it: camera view, the
+    transforms, geometry and shading of the captured nodes, scene lights,
+    display settings and output size. Fingerprints of published boards are
+    kept in a sidecar file next to the images, so boards whose fingerprint
+    still matches are not rendered again.
+
+Geometry is fingerprinted on its component counts, every point and UV
+    position and the modification time of the file it is referenced from.
+    Shading covers the assigned shading engines, every attribute and
+    connection of their networks and the path and modification time of
+    their file textures.
+'''
+
+import hashlib
+import json
+import os
+import sys
+
+import maya.cmds as mc
+
+CACHE_FILE = '.board_cache.json'
+CAMERA_ATTRS = ('focalLength', 'horizontalFilmAperture',
+                'verticalFilmAperture', 'orthographic', 'orthographicWidth',
+                'preScale', 'nearClipPlane', 'farClipPlane')
+LIGHT_ATTRS = ('color', 'intensity')
+GEOMETRY_TYPES = ['mesh', 'nurbsSurface', 'nurbsCurve']
+TEXTURE_ATTRS = {'file': 'fileTextureName'}
+
+
+def _hash(values):
+    '''
+    get hash of json serializable values
+    '''
+    return hashlib.sha1(json.dumps(values, sort_keys=True)).hexdigest()
+
+
+def camera_fingerprint(camera):
+    '''
+    get fingerprint of a camera's current view
+
+    :type   camera: C{str}
+    :param  camera: camera transform
+    '''
+    cam_shape = mc.listRelatives(camera, type='camera', fullPath=True)[0]
+    return _hash([mc.xform(camera, query=True, worldSpace=True, matrix=True)]
+                 + [mc.getAttr('%s.%s' % (cam_shape, attr))
+                                                    for attr in CAMERA_ATTRS])
+
+
+def _points_hash(shape):
+    '''
+    get hash of the object space point positions of a shape, and its UVs
+        for meshes
+    '''
+    components = '%s.cv[*]' % shape
+    if mc.nodeType(shape) == 'mesh':
+        components = '%s.vtx[*]' % shape
+
+    checksum = hashlib.sha1(repr(mc.xform(components, query=True,
+                                          objectSpace=True, translation=True)))
+    if mc.nodeType(shape) == 'mesh' and mc.polyEvaluate(shape, uvcoord=True):
+        checksum.update(repr(mc.polyEditUV('%s.map[*]' % shape, query=True)))
+
+    return checksum.hexdigest()
+
+
+def _shading_node_values(node):
+    '''
+    get type, attribute values, incoming connections and texture file of a
+        shading network node
+    '''
+    values = [node, mc.nodeType(node)]
+    for attr in sorted(mc.listAttr(node, scalar=True, read=True,
+                                   settable=True) or []):
+        try:
+            values.append([attr, mc.getAttr('%s.%s' % (node, attr))])
+        except (RuntimeError, ValueError):
+            # attributes of unconnected array elements can not be read
+            continue
+
+    values.append(mc.listConnections(node, source=True, destination=False,
+                                     connections=True, plugs=True) or [])
+
+    texture_attr = TEXTURE_ATTRS.get(mc.nodeType(node))
+    if texture_attr:
+        texture = mc.getAttr('%s.%s' % (node, texture_attr))
+        values.append([texture, os.path.getmtime(texture)
+                                    if os.path.isfile(texture) else None])
+
+    return values
+
+
+def shading_fingerprint(shapes):
+    '''
+    get fingerprint of the shading engines assigned to shapes, their
+        members among the shapes and their shading networks
+
+    :type   shapes: C{list}
+    :param  shapes: geometry shapes, with full paths
+    '''
+    if not shapes:
+        return _hash([])
+
+    values = []
+    network = set()
+    shape_set = set(shapes)
+    engines = mc.listConnections(shapes, type='shadingEngine') or []
+    for engine in sorted(set(engines)):
+        members = mc.ls(mc.sets(engine, query=True) or [], long=True)
+        values.append([engine, sorted(member for member in members
+                        if member.split('.')[0] in shape_set)])
+        # dag objects are pruned, so only the shading network is walked
+        network.update(mc.listHistory(engine, pruneDagObjects=True) or [])
+
+    for node in sorted(network):
+        values.append(_shading_node_values(node))
+
+    return _hash(values)
+
+
+def nodes_fingerprint(nodes=None):
+    '''
+    get fingerprint of the transforms, geometry and shading of nodes and all
+        their descendants, or of the whole scene if no nodes are specified
+
+    :type   nodes: C{list}
+    :param  nodes: *OPTIONAL* root nodes to fingerprint
+    '''
+    if nodes:
+        transforms = mc.ls(nodes, long=True) + (mc.listRelatives(nodes,
+                                allDescendents=True, fullPath=True,
+                                type='transform') or [])
+        shapes = mc.listRelatives(nodes, allDescendents=True, fullPath=True,
+                                  type=GEOMETRY_TYPES) or []
+    else:
+        transforms = mc.ls(type='transform', long=True)
+        shapes = mc.ls(type=GEOMETRY_TYPES, long=True)
+
+    values = []
+    for transform in sorted(set(transforms)):
+        values.append([transform, mc.xform(transform, query=True,
+                                           worldSpace=True, matrix=True)])
+
+    shapes = sorted(set(shapes))
+    ref_files = set()
+    for shape in shapes:
+        counts = []
+        if mc.nodeType(shape) == 'mesh':
+            counts = mc.polyEvaluate(shape, vertex=True, edge=True, face=True,
+                                     uvcoord=True)
+        values.append([shape, counts, _points_hash(shape)])
+        if mc.referenceQuery(shape, isNodeReferenced=True):
+            ref_files.add(mc.referenceQuery(shape, filename=True,
+                                            withoutCopyNumber=True))
+
+    for ref_file in sorted(ref_files):
+        values.append([ref_file, os.path.getmtime(ref_file)
+                                    if os.path.isfile(ref_file) else None])
+
+    values.append(shading_fingerprint(shapes))
+    return _hash(values)
+
+
+def lights_fingerprint():
+    '''
+    get fingerprint of all scene lights
+    '''
+    values = []
+    for lght in sorted(mc.ls(lights=True, long=True) or []):
+        transform = lght.rpartition('|')[0] or lght
+        values.append([lght, mc.xform(transform, query=True, worldSpace=True,
+                                      matrix=True)]
+                      + [mc.getAttr('%s.%s' % (lght, attr))
+                                                    for attr in LIGHT_ATTRS])
+
+    return _hash(values)
+
+
+def display_fingerprint(panel):
+    '''
+    get fingerprint of a model panel's display settings
+
+    :type   panel: C{str}
+    :param  panel: model panel
+    '''
+    return _hash([mc.modelEditor(panel, query=True, rendererName=True),
+                  mc.modelEditor(panel, query=True, displayAppearance=True),
+                  mc.modelEditor(panel, query=True, displayTextures=True),
+                  mc.modelEditor(panel, query=True, displayLights=True)])
+
+
+def board_fingerprint(*parts):
+    '''
+    combine fingerprint parts and output settings into one board fingerprint
+    '''
+    return _hash(list(parts))
+
+
+class BoardCaptureCache(object):
+    '''
+    Fingerprints of published boards, kept per image directory
+    '''
+    def __init__(self):
+        '''
+        initialize instance variables
+        '''
+        self._caches = {}
+        self._changed = set()
+        self._hits = []
+        self._misses = []
+
+    @property
+    def hits(self):
+        '''
+        get list of board paths that were up to date
+        '''
+        return self._hits
+
+    @property
+    def misses(self):
+        '''
+        get list of board paths that needed capturing
+        '''
+        return self._misses
+
+    def _dir_cache(self, image_dir):
+        '''
+        get fingerprints of a directory, loading its sidecar on first use
+        '''
+        if image_dir not in self._caches:
+            cache = {}
+            cache_path = os.path.join(image_dir, CACHE_FILE)
+            if os.path.isfile(cache_path):
+                try:
+                    with open(cache_path, 'r') as cache_file:
+                        cache = json.load(cache_file)
+                except ValueError:
+                    sys.stdout.write('ignoring unreadable board cache %s'
+                                                                % cache_path)
+            self._caches[image_dir] = cache
+
+        return self._caches[image_dir]
+
+    def is_current(self, image_path, fingerprint, extra_paths=None):
+        '''
+        check if published board exists and matches fingerprint, recording
+            the result as a hit or miss
+
+        :type   image_path: C{str}
+        :param  image_path: path to published board
+        :type   fingerprint: C{str}
+        :param  fingerprint: fingerprint of the board about to be captured
+        :type   extra_paths: C{list}
+        :param  extra_paths: *OPTIONAL* other files written with the board,
+                                ie. its thumbnail, that must exist as well
+        '''
+        image_dir, image_file = os.path.split(image_path)
+        board_paths = [image_path] + list(extra_paths or [])
+        current = all(os.path.isfile(path) for path in board_paths) \
+                    and self._dir_cache(image_dir).get(image_file) == fingerprint
+
+        if current:
+            self._hits.append(image_path)
+        else:
+            self._misses.append(image_path)
+
+        return current
+
+    def store(self, image_path, fingerprint):
+        '''
+        record fingerprint of a freshly captured board
+
+        :type   image_path: C{str}
+        :param  image_path: path to published board
+        :type   fingerprint: C{str}
+        :param  fingerprint: fingerprint of the captured board
+        '''
+        image_dir, image_file = os.path.split(image_path)
+        self._dir_cache(image_dir)[image_file] = fingerprint
+        self._changed.add(image_dir)
+
+    def save(self):
+        '''
+        write sidecars of all directories with newly captured boards
+        '''
+        for image_dir in self._changed:
+            with open(os.path.join(image_dir, CACHE_FILE), 'w') as cache_file:
+                json.dump(self._caches[image_dir], cache_file, indent=2,
+                          sort_keys=True)
+        self._changed = set()
+
+    def report(self):
+        '''
+        write summary of hits and misses, returning it as a dict
+        '''
+        sys.stdout.write('board cache: %d up to date, %d captured'
+                                        % (len(self._hits), len(self._misses)))
+        for image_path in self._hits:
+            sys.stdout.write('  skipped %s' % image_path)
+
+        return {'hits': list(self._hits), 'misses': list(self._misses)}
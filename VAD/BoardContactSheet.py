@@ -0,0 +1,233 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Contact sheets of screen board images. Boards are read one at a time,
+    scaled into the next grid cell of the current sheet and labelled, so only
+    a single sheet and a single board are ever held in memory, ie.
+
+    with ContactSheet('/show/0010/published/0010_contact_%02d.jpg') as sheet:
+        for board_path, label in boards:
+            sheet.add(board_path, label)
+'''
+
+from VAD import BoardImageOps
+
+CHANNELS = BoardImageOps.CHANNELS
+
+# 5x7 bitmap font, one int per row with the leftmost pixel as bit 4
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 7
+FONT = {
+    '0': (0x0E, 0x11, 0x13, 0x15, 0x19, 0x11, 0x0E),
+    '1': (0x04, 0x0C, 0x04, 0x04, 0x04, 0x04, 0x0E),
+    '2': (0x0E, 0x11, 0x01, 0x02, 0x04, 0x08, 0x1F),
+    '3': (0x1F, 0x02, 0x04, 0x02, 0x01, 0x11, 0x0E),
+    '4': (0x02, 0x06, 0x0A, 0x12, 0x1F, 0x02, 0x02),
+    '5': (0x1F, 0x10, 0x1E, 0x01, 0x01, 0x11, 0x0E),
+    '6': (0x06, 0x08, 0x10, 0x1E, 0x11, 0x11, 0x0E),
+    '7': (0x1F, 0x01, 0x02, 0x04, 0x08, 0x08, 0x08),
+    '8': (0x0E, 0x11, 0x11, 0x0E, 0x11, 0x11, 0x0E),
+    '9': (0x0E, 0x11, 0x11, 0x0F, 0x01, 0x02, 0x0C),
+    'A': (0x0E, 0x11, 0x11, 0x11, 0x1F, 0x11, 0x11),
+    'B': (0x1E, 0x11, 0x11, 0x1E, 0x11, 0x11, 0x1E),
+    'C': (0x0E, 0x11, 0x10, 0x10, 0x10, 0x11, 0x0E),
+    'D': (0x1C, 0x12, 0x11, 0x11, 0x11, 0x12, 0x1C),
+    'E': (0x1F, 0x10, 0x10, 0x1E, 0x10, 0x10, 0x1F),
+    'F': (0x1F, 0x10, 0x10, 0x1E, 0x10, 0x10, 0x10),
+    'G': (0x0E, 0x11, 0x10, 0x17, 0x11, 0x11, 0x0F),
+    'H': (0x11, 0x11, 0x11, 0x1F, 0x11, 0x11, 0x11),
+    'I': (0x0E, 0x04, 0x04, 0x04, 0x04, 0x04, 0x0E),
+    'J': (0x07, 0x02, 0x02, 0x02, 0x02, 0x12, 0x0C),
+    'K': (0x11, 0x12, 0x14, 0x18, 0x14, 0x12, 0x11),
+    'L': (0x10, 0x10, 0x10, 0x10, 0x10, 0x10, 0x1F),
+    'M': (0x11, 0x1B, 0x15, 0x15, 0x11, 0x11, 0x11),
+    'N': (0x11, 0x11, 0x19, 0x15, 0x13, 0x11, 0x11),
+    'O': (0x0E, 0x11, 0x11, 0x11, 0x11, 0x11, 0x0E),
+    'P': (0x1E, 0x11, 0x11, 0x1E, 0x10, 0x10, 0x10),
+    'Q': (0x0E, 0x11, 0x11, 0x11, 0x15, 0x12, 0x0D),
+    'R': (0x1E, 0x11, 0x11, 0x1E, 0x14, 0x12, 0x11),
+    'S': (0x0F, 0x10, 0x10, 0x0E, 0x01, 0x01, 0x1E),
+    'T': (0x1F, 0x04, 0x04, 0x04, 0x04, 0x04, 0x04),
+    'U': (0x11, 0x11, 0x11, 0x11, 0x11, 0x11, 0x0E),
+    'V': (0x11, 0x11, 0x11, 0x11, 0x11, 0x0A, 0x04),
+    'W': (0x11, 0x11, 0x11, 0x15, 0x15, 0x15, 0x0A),
+    'X': (0x11, 0x11, 0x0A, 0x04, 0x0A, 0x11, 0x11),
+    'Y': (0x11, 0x11, 0x11, 0x0A, 0x04, 0x04, 0x04),
+    'Z': (0x1F, 0x01, 0x02, 0x04, 0x08, 0x10, 0x1F),
+    '_': (0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x1F),
+    '-': (0x00, 0x00, 0x00, 0x1F, 0x00, 0x00, 0x00),
+    '.': (0x00, 0x00, 0x00, 0x00, 0x00, 0x0C, 0x0C),
+    ' ': (0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00),
+    '?': (0x0E, 0x11, 0x01, 0x02, 0x04, 0x00, 0x04),
+}
+
+
+class ContactSheet(object):
+    '''
+    Grid of labelled board images written out as one or more sheet images
+    '''
+    def __init__(self, sheet_path, columns=4, rows=4, tile_size=(384, 216),
+                 margin=8, font_scale=2, ext='jpg', background=(32, 32, 32),
+                 text_color=(230, 230, 230)):
+        '''
+        initialize instance variables
+
+        :type   sheet_path: C{str}
+        :param  sheet_path: path of sheet images, with a "%d" style
+                                placeholder for the sheet number
+        :type   columns: C{int}
+        :param  columns: number of boards across a sheet
+        :type   rows: C{int}
+        :param  rows: number of boards down a sheet
+        :type   tile_size: C{tuple}
+        :param  tile_size: width and height each board is scaled to
+        :type   margin: C{int}
+        :param  margin: space around boards
+        :type   font_scale: C{int}
+        :param  font_scale: size of each font pixel in sheet pixels
+        :type   ext: C{str}
+        :param  ext: image format of sheets
+        :type   background: C{tuple}
+        :param  background: RGB sheet color
+        :type   text_color: C{tuple}
+        :param  text_color: RGB label color
+        '''
+        self._sheet_path = sheet_path
+        self._columns = columns
+        self._rows = rows
+        self._tile_width, self._tile_height = tile_size
+        self._margin = margin
+        self._font_scale = font_scale
+        self._ext = ext
+        self._background = bytearray(list(background) + [255])
+        self._text_color = bytearray(list(text_color) + [255])
+
+        self._label_height = GLYPH_HEIGHT * font_scale + margin
+        self._cell_width = self._tile_width + margin
+        self._cell_height = self._tile_height + self._label_height + margin
+        self._width = columns * self._cell_width + margin
+        self._height = rows * self._cell_height + margin
+
+        self._pixels = None
+        self._count = 0
+        self._written = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def written(self):
+        '''
+        get list of sheet images written so far
+        '''
+        return self._written
+
+    @property
+    def size(self):
+        '''
+        get width and height of each sheet
+        '''
+        return (self._width, self._height)
+
+    def add(self, image_path, label=''):
+        '''
+        scale board image into the next cell, writing the sheet once full
+
+        :type   image_path: C{str}
+        :param  image_path: path to board image
+        :type   label: C{str}
+        :param  label: text written below the board
+        '''
+        if self._pixels is None:
+            self._pixels = self._background * (self._width * self._height)
+
+        cell = self._count % (self._columns * self._rows)
+        left = self._margin + (cell % self._columns) * self._cell_width
+        top = self._margin + (cell / self._columns) * self._cell_height
+
+        tile = BoardImageOps.resized_image(BoardImageOps.read_image(image_path),
+                                           self._tile_width,
+                                           self._tile_height)
+        self._paste(BoardImageOps.image_bytes(tile), left, top,
+                    self._tile_width, self._tile_height)
+        self._draw_text(label, left, top + self._tile_height
+                                                        + self._margin / 2)
+
+        self._count += 1
+        if self._count % (self._columns * self._rows) == 0:
+            self._write_sheet()
+
+    def close(self):
+        '''
+        write the last, partially filled sheet
+        '''
+        if self._pixels is not None:
+            self._write_sheet()
+
+    def _row_start(self, x, y):
+        '''
+        get buffer offset of a pixel, with y from the top of the sheet while
+            MImage rows run bottom to top
+        '''
+        return ((self._height - 1 - y) * self._width + x) * CHANNELS
+
+    def _paste(self, tile_pixels, left, top, width, height):
+        '''
+        copy tile pixels into the sheet, a row at a time
+
+        :type   tile_pixels: C{str}
+        :param  tile_pixels: RGBA pixel bytes of tile, rows bottom to top
+        '''
+        row_size = width * CHANNELS
+        for row in range(height):
+            start = self._row_start(left, top + height - 1 - row)
+            self._pixels[start:start + row_size] = \
+                                tile_pixels[row * row_size:(row + 1) * row_size]
+
+    def _draw_text(self, text, left, top):
+        '''
+        draw text with the bitmap font, clipped to the tile width
+
+        :type   text: C{str}
+        :param  text: text to draw
+        :type   left: C{int}
+        :param  left: left edge of text
+        :type   top: C{int}
+        :param  top: top edge of text
+        '''
+        scale = self._font_scale
+        advance = (GLYPH_WIDTH + 1) * scale
+        block = self._text_color * scale
+
+        for index, char in enumerate(text[:self._tile_width / advance]):
+            glyph = FONT.get(char.upper(), FONT['?'])
+            for glyph_row, bits in enumerate(glyph):
+                for glyph_col in range(GLYPH_WIDTH):
+                    if not bits & (1 << (GLYPH_WIDTH - 1 - glyph_col)):
+                        continue
+                    x = left + index * advance + glyph_col * scale
+                    for y in range(top + glyph_row * scale,
+                                   top + (glyph_row + 1) * scale):
+                        start = self._row_start(x, y)
+                        self._pixels[start:start + len(block)] = block
+
+    def _write_sheet(self):
+        '''
+        write current sheet to file and start a new one
+        '''
+        sheet_path = self._sheet_path % (len(self._written) + 1)
+        BoardImageOps.create_image(self._pixels, self._width,
+                                   self._height).writeToFile(sheet_path,
+                                                             self._ext)
+        self._written.append(sheet_path)
+        self._pixels = None
@@ -0,0 +1,480 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+In-process image operations on captured screen boards using the Maya API
+    MImage, so extra board sizes come from the one captured image rather
+    than additional playblasts.
+
+Captured frames can be run through a PostProcessStage, which crops, resizes
+    and converts them as arrays with vectorized NumPy operations, writing
+    every variant concurrently on a thread pool. Without NumPy the variants
+    fall back to MImage resizing.
+
+MImage writes compressed formats at a fixed default quality, so images
+    written with a quality are saved lossless first and encoded with the
+    imconvert utility shipped with Maya.
+'''
+
+import ctypes
+import os
+import subprocess
+import tempfile
+import warnings
+from multiprocessing.pool import ThreadPool
+
+import maya.api.OpenMaya as om
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+CHANNELS = 4 # MImage byte images are RGBA
+LOSSLESS_EXT = 'png'
+LOSSY_FORMATS = ('jpg', 'jpeg')
+
+
+def read_image(image_path):
+    '''
+    read image file into an MImage
+
+    :type   image_path: C{str}
+    :param  image_path: path to image file
+    '''
+    image = om.MImage()
+    image.readFromFile(image_path)
+    return image
+
+
+def converter_path():
+    '''
+    get path to Maya's imconvert utility, None if it can not be found
+    '''
+    maya_location = os.getenv('MAYA_LOCATION')
+    if not maya_location:
+        return None
+
+    for name in ('imconvert', 'imconvert.exe'):
+        converter = os.path.join(maya_location, 'bin', name)
+        if os.path.isfile(converter):
+            return converter
+
+    return None
+
+
+def write_image(image, image_path, ext, quality=None):
+    '''
+    write an MImage to file, encoding compressed formats at the specified
+        quality
+
+    :type   image: C{MImage}
+    :param  image: image to write
+    :type   image_path: C{str}
+    :param  image_path: path to write image to
+    :type   ext: C{str}
+    :param  ext: image format, ie. "jpg"
+    :type   quality: C{int}
+    :param  quality: *OPTIONAL* quality of compressed formats, 0 - 100
+    '''
+    if quality is None or ext.lower() not in LOSSY_FORMATS:
+        image.writeToFile(image_path, ext)
+        return
+
+    converter = converter_path()
+    if not converter:
+        warnings.warn("imconvert not found, writing %s at MImage's default "
+                        "quality." % image_path, UserWarning)
+        image.writeToFile(image_path, ext)
+        return
+
+    handle, lossless_path = tempfile.mkstemp(suffix='.%s' % LOSSLESS_EXT)
+    os.close(handle)
+    try:
+        image.writeToFile(lossless_path, LOSSLESS_EXT)
+        subprocess.check_call([converter, '-quality', str(quality),
+                               lossless_path, image_path])
+    finally:
+        os.remove(lossless_path)
+
+
+def image_bytes(image):
+    '''
+    get copy of the RGBA pixel bytes of an image, rows run bottom to top
+
+    :type   image: C{MImage}
+    :param  image: image to get pixels from
+    '''
+    width, height = image.getSize()
+    return ctypes.string_at(image.pixels(), width * height * CHANNELS)
+
+
+def create_image(pixels, width, height):
+    '''
+    create an MImage from RGBA pixel bytes
+
+    :type   pixels: C{str} / C{bytearray}
+    :param  pixels: RGBA pixel bytes, rows bottom to top
+    :type   width: C{int}
+    :param  width: image width
+    :type   height: C{int}
+    :param  height: image height
+    '''
+    image = om.MImage()
+    image.create(width, height, CHANNELS, om.MImage.kByte)
+    image.setPixels(bytearray(pixels), width, height)
+    return image
+
+
+def crop_image(image, x, y, width, height):
+    '''
+    get cropped copy of an image
+
+    :type   image: C{MImage}
+    :param  image: image to crop
+    :type   x: C{int}
+    :param  x: left edge of crop
+    :type   y: C{int}
+    :param  y: bottom edge of crop, MImage rows run bottom to top
+    :type   width: C{int}
+    :param  width: crop width
+    :type   height: C{int}
+    :param  height: crop height
+    '''
+    src_width = image.getSize()[0]
+    pixels = image_bytes(image)
+    row_size = src_width * CHANNELS
+
+    rows = []
+    for row in range(y, y + height):
+        start = row * row_size + x * CHANNELS
+        rows.append(pixels[start:start + width * CHANNELS])
+
+    return create_image(''.join(rows), width, height)
+
+
+def crop_to_aspect(image, width, height):
+    '''
+    get centered crop of an image matching the aspect ratio of the
+        specified size, or the image itself if it already matches
+
+    :type   image: C{MImage}
+    :param  image: image to crop
+    :type   width: C{int}
+    :param  width: width of intended size
+    :type   height: C{int}
+    :param  height: height of intended size
+    '''
+    src_width, src_height = image.getSize()
+    crop_width = min(src_width,
+                     int(round(src_height * width / float(height))))
+    crop_height = min(src_height,
+                      int(round(src_width * height / float(width))))
+
+    if (crop_width, crop_height) == (src_width, src_height):
+        return image
+
+    return crop_image(image, (src_width - crop_width) / 2,
+                      (src_height - crop_height) / 2, crop_width, crop_height)
+
+
+def resized_image(image, width, height):
+    '''
+    get copy of an image scaled to the specified size, cropping the center
+        first when the aspect ratio differs so nothing is stretched
+
+    :type   image: C{MImage}
+    :param  image: image to resize
+    :type   width: C{int}
+    :param  width: intended width
+    :type   height: C{int}
+    :param  height: intended height
+    '''
+    cropped = crop_to_aspect(image, width, height)
+    if cropped is image:
+        cropped = create_image(image_bytes(image), *image.getSize())
+
+    cropped.resize(width, height, False)
+    return cropped
+
+
+def write_sizes(source_path, sizes):
+    '''
+    write resized copies of an image file, reading the source only once
+
+    :type   source_path: C{str}
+    :param  source_path: path to the full resolution image
+    :type   sizes: C{list}
+    :param  sizes: list of (path, width, height, extension) to write
+    :return: C{list} of written paths
+    '''
+    if not sizes:
+        return []
+
+    return PostProcessStage([BoardVariant(image_path, width, height, ext)
+                        for image_path, width, height, ext in sizes]
+                            ).run_file(source_path)
+
+
+def image_array(image):
+    '''
+    get RGBA pixels of an image as a (height, width, 4) uint8 array,
+        rows top to bottom
+
+    :type   image: C{MImage}
+    :param  image: image to get pixels from
+    '''
+    width, height = image.getSize()
+    pixels = numpy.frombuffer(image_bytes(image), dtype=numpy.uint8)
+    return pixels.reshape(height, width, CHANNELS)[::-1]
+
+
+def array_image(pixels):
+    '''
+    create an MImage from a (height, width, 4) uint8 array, rows top
+        to bottom
+
+    :type   pixels: C{numpy.ndarray}
+    :param  pixels: RGBA pixel array
+    '''
+    height, width = pixels.shape[:2]
+    return create_image(numpy.ascontiguousarray(pixels[::-1]).tostring(),
+                        width, height)
+
+
+def crop_array(pixels, x, y, width, height):
+    '''
+    get cropped view of a pixel array
+
+    :type   pixels: C{numpy.ndarray}
+    :param  pixels: pixel array, rows top to bottom
+    :type   x: C{int}
+    :param  x: left edge of crop
+    :type   y: C{int}
+    :param  y: top edge of crop
+    :type   width: C{int}
+    :param  width: crop width
+    :type   height: C{int}
+    :param  height: crop height
+    '''
+    return pixels[y:y + height, x:x + width]
+
+
+def crop_array_to_aspect(pixels, width, height):
+    '''
+    get centered crop of a pixel array matching the aspect ratio of the
+        specified size
+
+    :type   pixels: C{numpy.ndarray}
+    :param  pixels: pixel array
+    :type   width: C{int}
+    :param  width: width of intended size
+    :type   height: C{int}
+    :param  height: height of intended size
+    '''
+    src_height, src_width = pixels.shape[:2]
+    crop_width = min(src_width,
+                     int(round(src_height * width / float(height))))
+    crop_height = min(src_height,
+                      int(round(src_width * height / float(width))))
+
+    return crop_array(pixels, (src_width - crop_width) / 2,
+                      (src_height - crop_height) / 2, crop_width, crop_height)
+
+
+def _resize_axis(pixels, size, axis):
+    '''
+    resize pixel array along one axis, averaging the source pixels covered
+        by each target pixel when shrinking and repeating them when growing
+    '''
+    src_size = pixels.shape[axis]
+    if size == src_size:
+        return pixels
+    if size > src_size:
+        return pixels.take((numpy.arange(size) * src_size) // size, axis=axis)
+
+    edges = numpy.linspace(0, src_size, size + 1).astype(numpy.intp)
+    sums = numpy.add.reduceat(pixels.astype(numpy.uint32), edges[:-1],
+                              axis=axis)
+    counts = numpy.diff(edges).reshape([-1 if i == axis else 1
+                                            for i in range(pixels.ndim)])
+    return (sums + counts // 2) // counts
+
+
+def resize_array(pixels, width, height):
+    '''
+    get copy of a pixel array box filtered to the specified size
+
+    :type   pixels: C{numpy.ndarray}
+    :param  pixels: pixel array
+    :type   width: C{int}
+    :param  width: intended width
+    :type   height: C{int}
+    :param  height: intended height
+    '''
+    resized = _resize_axis(_resize_axis(pixels, height, 0), width, 1)
+    return resized.astype(numpy.uint8)
+
+
+def greyscale_array(pixels):
+    '''
+    get copy of a pixel array converted to greyscale, keeping alpha
+
+    :type   pixels: C{numpy.ndarray}
+    :param  pixels: RGBA pixel array
+    '''
+    luma = numpy.dot(pixels[..., :3].astype(numpy.float32),
+                     numpy.array([0.299, 0.587, 0.114], dtype=numpy.float32))
+    grey = pixels.copy()
+    grey[..., :3] = numpy.clip(luma + 0.5, 0, 255).astype(numpy.uint8)[
+                                                                ..., None]
+    return grey
+
+
+class BoardVariant(object):
+    '''
+    Description of an image written from a captured board
+    '''
+    __slots__ = ('path', 'width', 'height', 'ext', 'crop', 'greyscale',
+                 'quality')
+
+    def __init__(self, path, width=None, height=None, ext='jpg', crop=None,
+                 greyscale=False, quality=None):
+        '''
+        initialize instance variables
+
+        :type   path: C{str}
+        :param  path: path to write variant to
+        :type   width: C{int}
+        :param  width: *OPTIONAL* width to resize to, defaults to the
+                        cropped / source size
+        :type   height: C{int}
+        :param  height: *OPTIONAL* height to resize to, defaults to the
+                        cropped / source size
+        :type   ext: C{str}
+        :param  ext: image format written, ie. "jpg", "png"
+        :type   crop: C{tuple}
+        :param  crop: *OPTIONAL* (x, y, width, height) to crop to before
+                        resizing, y from the top. Without it the center is
+                        cropped to the variant's aspect ratio.
+        :type   greyscale: C{bool}
+        :param  greyscale: convert variant to greyscale
+        :type   quality: C{int}
+        :param  quality: *OPTIONAL* quality of compressed formats, defaults
+                            to MImage's quality
+        '''
+        self.path = path
+        self.width = width
+        self.height = height
+        self.ext = ext
+        self.crop = crop
+        self.greyscale = greyscale
+        self.quality = quality
+
+
+class PostProcessStage(object):
+    '''
+    Post-processing of captured board frames into image variants
+    '''
+    def __init__(self, variants, threads=4):
+        '''
+        initialize instance variables
+
+        :type   variants: C{list}
+        :param  variants: list of C{BoardVariant} written for every frame
+        :type   threads: C{int}
+        :param  threads: number of variants processed and written at once
+        '''
+        self._variants = list(variants)
+        self._threads = threads
+
+    @property
+    def variants(self):
+        '''
+        get list of variants written for every frame
+        '''
+        return self._variants
+
+    def process_array(self, pixels, variant):
+        '''
+        apply a variant's crop, resize and conversion to a pixel array
+
+        :type   pixels: C{numpy.ndarray}
+        :param  pixels: RGBA pixel array, rows top to bottom
+        :type   variant: C{BoardVariant}
+        :param  variant: variant to apply
+        '''
+        if variant.crop:
+            pixels = crop_array(pixels, *variant.crop)
+
+        width = variant.width or pixels.shape[1]
+        height = variant.height or pixels.shape[0]
+        if not variant.crop:
+            pixels = crop_array_to_aspect(pixels, width, height)
+
+        pixels = resize_array(pixels, width, height)
+        if variant.greyscale:
+            pixels = greyscale_array(pixels)
+
+        return pixels
+
+    def _write_variant(self, frame, variant):
+        '''
+        process and write a single variant of a frame
+        '''
+        if numpy is None:
+            image = frame
+            if variant.crop:
+                x, y, width, height = variant.crop
+                image = crop_image(frame, x, frame.getSize()[1] - y - height,
+                                   width, height)
+            src_width, src_height = image.getSize()
+            image = resized_image(image, variant.width or src_width,
+                                  variant.height or src_height)
+        else:
+            image = array_image(self.process_array(frame, variant))
+
+        write_image(image, variant.path, variant.ext, variant.quality)
+        return variant.path
+
+    def run(self, frame):
+        '''
+        write every variant of a captured frame concurrently. Only MImage
+            is used from the pool threads, never maya commands.
+
+        :type   frame: C{numpy.ndarray} / C{MImage}
+        :param  frame: captured frame as pixel array or image
+        :return: C{list} of written paths
+        '''
+        if numpy is not None and not isinstance(frame, numpy.ndarray):
+            frame = image_array(frame)
+        elif numpy is None and not isinstance(frame, om.MImage):
+            raise TypeError("Pixel arrays need numpy, pass an MImage instead.")
+
+        if not self._variants:
+            return []
+
+        pool = ThreadPool(min(self._threads, len(self._variants)))
+        try:
+            results = [pool.apply_async(self._write_variant, (frame, variant))
+                                                for variant in self._variants]
+            return [result.get() for result in results]
+        finally:
+            pool.close()
+            pool.join()
+
+    def run_file(self, image_path):
+        '''
+        write every variant of a captured image file
+
+        :type   image_path: C{str}
+        :param  image_path: path to the captured image
+        :return: C{list} of written paths
+        '''
+        return self.run(read_image(image_path))
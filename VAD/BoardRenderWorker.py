@@ -0,0 +1,238 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Headless rendering of screen board jobs, split across several worker
+    sessions. Each worker opens the saved scene once and renders its share of
+    the jobs, reporting every finished board back as a result line, ie.
+
+    mayapy -m VAD.BoardRenderWorker --scene shot.mb --jobs jobs.json
+
+A job is a dict with 'camera', 'bookmark', 'path', 'width', 'height',
+    'quality' and 'ext'. The "standin" renderer writes placeholder images
+    without starting Maya, so the pipeline can be run on any machine.
+'''
+
+import argparse
+import json
+import os
+import Queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from VAD.BoardCaptureBackends import get_backend
+
+RENDERERS = ('ogs', 'standin')
+# capture backend used for each renderer
+RENDERER_BACKENDS = {'ogs': 'offscreen', 'standin': 'standin'}
+RESULT_MARKER = 'BOARD_RESULT '
+
+
+def split_jobs(jobs, workers):
+    '''
+    split jobs round robin into a list per worker, so every worker gets a
+        similar mix of jobs
+
+    :type   jobs: C{list}
+    :param  jobs: board jobs
+    :type   workers: C{int}
+    :param  workers: number of workers
+    '''
+    workers = max(1, min(workers, len(jobs)))
+    return [chunk for chunk in [jobs[i::workers] for i in range(workers)]
+                                                                    if chunk]
+
+
+def render_job(job, renderer='ogs'):
+    '''
+    render a single board job
+
+    :type   job: C{dict}
+    :param  job: board job
+    :type   renderer: C{str}
+    :param  renderer: one of RENDERERS
+    :return: C{dict} result with the job's 'index', 'bookmark', 'path',
+                'error' and 'seconds'
+    '''
+    result = {'index': job.get('index'), 'camera': job.get('camera'),
+              'bookmark': job.get('bookmark'), 'path': job['path'],
+              'error': None}
+    start = time.time()
+
+    try:
+        if renderer != 'standin':
+            import maya.cmds as mc
+            mc.cameraView(job['bookmark'], edit=True, camera=job['camera'],
+                          setCamera=True)
+
+        backend = get_backend(RENDERER_BACKENDS[renderer],
+                              camera=job.get('camera'))
+        backend.capture(job['path'], (job.get('width') or 0,
+                                      job.get('height') or 0),
+                        job.get('ext', 'jpg'), job.get('quality', 40))
+    except Exception, e:
+        result['error'] = "%s\n%s" % (e, traceback.format_exc())
+
+    result['seconds'] = time.time() - start
+    return result
+
+
+def run_worker(scene_file, jobs, renderer='ogs', out=None):
+    '''
+    render a worker's share of jobs, opening the scene once
+
+    :type   scene_file: C{str}
+    :param  scene_file: saved scene file to render from
+    :type   jobs: C{list}
+    :param  jobs: board jobs of this worker
+    :type   renderer: C{str}
+    :param  renderer: one of RENDERERS
+    :type   out: C{file}
+    :param  out: *OPTIONAL* stream result lines are written to, stdout
+    '''
+    out = out or sys.stdout
+    if renderer != 'standin':
+        import maya.standalone
+        maya.standalone.initialize(name='python')
+        import maya.cmds as mc
+        mc.file(scene_file, open=True, force=True)
+
+    for job in jobs:
+        out.write('%s%s\n' % (RESULT_MARKER,
+                              json.dumps(render_job(job, renderer))))
+        out.flush()
+
+
+def _read_results(process, results):
+    '''
+    forward worker result lines to the results queue, followed by
+        None once the worker's output is closed
+    '''
+    for line in iter(process.stdout.readline, ''):
+        if line.startswith(RESULT_MARKER):
+            results.put(json.loads(line[len(RESULT_MARKER):]))
+    results.put(None)
+
+
+def render_jobs(scene_file, jobs, workers=4, mayapy=None, renderer='ogs',
+                progress=None):
+    '''
+    render jobs across several worker processes and merge their results
+
+    :type   scene_file: C{str}
+    :param  scene_file: saved scene file to render from
+    :type   jobs: C{list}
+    :param  jobs: board jobs
+    :type   workers: C{int}
+    :param  workers: number of worker processes
+    :type   mayapy: C{str}
+    :param  mayapy: *OPTIONAL* python interpreter for workers, defaults to the
+                        current one
+    :type   renderer: C{str}
+    :param  renderer: one of RENDERERS
+    :type   progress: C{function}
+    :param  progress: *OPTIONAL* called with (done, total, result) as each
+                        board finishes
+    :return: C{dict} with 'rendered' and 'failed' results and 'seconds'
+    '''
+    if renderer not in RENDERERS:
+        raise ValueError('Unsupported renderer: %s. Use one of: %s.'
+                                            % (renderer, ', '.join(RENDERERS)))
+
+    for i, job in enumerate(jobs):
+        job['index'] = i
+
+    start = time.time()
+    job_dir = tempfile.mkdtemp(prefix='board_jobs_')
+
+    # workers import this package, make sure they can find it
+    env = dict(os.environ)
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([package_root]
+                            + [path for path in [env.get('PYTHONPATH')] if path])
+
+    processes = []
+    results = Queue.Queue()
+    try:
+        for worker, chunk in enumerate(split_jobs(jobs, workers)):
+            jobs_path = os.path.join(job_dir, 'worker_%02d.json' % worker)
+            with open(jobs_path, 'w') as jobs_file:
+                json.dump(chunk, jobs_file)
+
+            process = subprocess.Popen([mayapy or sys.executable, '-m',
+                                        'VAD.BoardRenderWorker',
+                                        '--scene', scene_file,
+                                        '--jobs', jobs_path,
+                                        '--renderer', renderer],
+                                       stdout=subprocess.PIPE, env=env)
+            reader = threading.Thread(target=_read_results,
+                                      args=(process, results))
+            reader.daemon = True
+            reader.start()
+            processes.append(process)
+
+        finished = {}
+        running = len(processes)
+        while running:
+            result = results.get()
+            if result is None:
+                running -= 1
+                continue
+            finished[result['index']] = result
+            if progress:
+                progress(len(finished), len(jobs), result)
+    finally:
+        for process in processes:
+            process.wait()
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+    # jobs of crashed workers never report back
+    for job in jobs:
+        if job['index'] not in finished:
+            finished[job['index']] = {'index': job['index'],
+                                      'camera': job.get('camera'),
+                                      'bookmark': job.get('bookmark'),
+                                      'path': job['path'], 'seconds': 0.0,
+                                      'error': 'Worker exited before '
+                                                    + 'rendering this board.'}
+
+    merged = [finished[i] for i in sorted(finished.keys())]
+    return {'rendered': [result for result in merged if not result['error']],
+            'failed': [result for result in merged if result['error']],
+            'seconds': time.time() - start}
+
+
+def main(argv=None):
+    '''
+    worker process entry point
+    '''
+    parser = argparse.ArgumentParser(
+                description="Render a share of screen board jobs.")
+    parser.add_argument('--scene', required=True,
+                        help="saved scene file to render from")
+    parser.add_argument('--jobs', required=True,
+                        help="json file with this worker's board jobs")
+    parser.add_argument('--renderer', choices=RENDERERS, default='ogs',
+                        help="renderer to use for boards")
+    args = parser.parse_args(argv)
+
+    with open(args.jobs, 'r') as jobs_file:
+        jobs = json.load(jobs_file)
+
+    run_worker(args.scene, jobs, args.renderer)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
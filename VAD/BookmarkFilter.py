@@ -0,0 +1,242 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Camera bookmark filtering for screen boards. All exclude rules of a filter,
+    prefixes, postfixes, globs and regular expressions, are compiled once
+    into a single pattern, so every bookmark is tested with one match, ie.
+
+    bfilter = BookmarkFilter(exclude_prefixes=['temp'],
+                             exclude_globs=['*_old'])
+    boards, rejected = bfilter.split(bookmarks)
+
+Compiled patterns are cached on their rules and shared between filters.
+'''
+
+import fnmatch
+import re
+
+DEFAULT_INCLUDE_PREFIXES = ('board',)
+
+_PATTERN_CACHE = {}
+
+
+def compile_pattern(pattern):
+    '''
+    get compiled regular expression, compiling each pattern only once
+
+    :type   pattern: C{str}
+    :param  pattern: regular expression
+    '''
+    if pattern not in _PATTERN_CACHE:
+        _PATTERN_CACHE[pattern] = re.compile(pattern)
+
+    return _PATTERN_CACHE[pattern]
+
+
+def prefix_rule(prefixes):
+    '''
+    get regular expression matching names starting with one of the
+        prefixes, followed by at least one more word character
+
+    :type   prefixes: C{list}
+    :param  prefixes: prefixes, as regular expressions
+    '''
+    return "^(%s)[_\w]+$" % "|".join(prefixes)
+
+
+def postfix_rule(postfixes):
+    '''
+    get regular expression matching names with one of the postfixes after
+        at least one word character
+
+    :type   postfixes: C{list}
+    :param  postfixes: postfixes, as regular expressions
+    '''
+    return "^[\w_]+(%s)" % "|".join(postfixes)
+
+
+def glob_rule(glob):
+    '''
+    get regular expression matching the whole name against a glob
+
+    :type   glob: C{str}
+    :param  glob: shell style pattern, ie. "*_temp"
+    '''
+    # translate appends its flags, which are moot for single line names
+    rule = fnmatch.translate(glob)
+    if rule.endswith('(?ms)'):
+        rule = rule[:-len('(?ms)')]
+
+    return rule
+
+
+class BookmarkFilter(object):
+    '''
+    Include / exclude rules for camera bookmarks, compiled into one matcher
+    '''
+    def __init__(self, include_prefixes=DEFAULT_INCLUDE_PREFIXES,
+                 exclude_prefixes=None, exclude_postfixes=None,
+                 exclude_globs=None, exclude_regexes=None):
+        '''
+        initialize instance variables
+
+        :type   include_prefixes: C{list}
+        :param  include_prefixes: prefixes that may never be excluded, any
+                                    exclude prefix matching them is dropped
+        :type   exclude_prefixes: C{list}
+        :param  exclude_prefixes: *OPTIONAL* prefixes to exclude bookmarks
+        :type   exclude_postfixes: C{list}
+        :param  exclude_postfixes: *OPTIONAL* postfixes to exclude bookmarks
+        :type   exclude_globs: C{list}
+        :param  exclude_globs: *OPTIONAL* shell style patterns to exclude
+                                    bookmarks, ie. "*_temp"
+        :type   exclude_regexes: C{list}
+        :param  exclude_regexes: *OPTIONAL* regular expressions to exclude
+                                    bookmarks, matched from the start
+        '''
+        self._include_prefixes = list(include_prefixes or [])
+        self._exclude_prefixes = list(exclude_prefixes or [])
+        self._exclude_postfixes = list(exclude_postfixes or [])
+        self._exclude_globs = list(exclude_globs or [])
+        self._exclude_regexes = list(exclude_regexes or [])
+        self._matcher = None
+
+    @property
+    def include_prefixes(self):
+        '''
+        get list of prefixes that may never be excluded
+        '''
+        return list(self._include_prefixes)
+
+    @property
+    def exclude_prefixes(self):
+        '''
+        get list of exclude prefixes, without those matching an include prefix
+        '''
+        if not self._include_prefixes:
+            return list(self._exclude_prefixes)
+
+        include = compile_pattern("^(%s)[_\w]*$"
+                                        % "|".join(self._include_prefixes))
+        return [prefix for prefix in self._exclude_prefixes
+                                                if not include.match(prefix)]
+
+    @property
+    def exclude_postfixes(self):
+        '''
+        get list of exclude postfixes
+        '''
+        return list(self._exclude_postfixes)
+
+    @property
+    def exclude_globs(self):
+        '''
+        get list of exclude globs
+        '''
+        return list(self._exclude_globs)
+
+    @property
+    def exclude_regexes(self):
+        '''
+        get list of exclude regular expressions
+        '''
+        return list(self._exclude_regexes)
+
+    def add_rules(self, exclude_prefixes=None, exclude_postfixes=None,
+                  exclude_globs=None, exclude_regexes=None):
+        '''
+        add exclude rules, recompiling the matcher on next use
+
+        :type   exclude_prefixes: C{list}
+        :param  exclude_prefixes: *OPTIONAL* prefixes to exclude bookmarks
+        :type   exclude_postfixes: C{list}
+        :param  exclude_postfixes: *OPTIONAL* postfixes to exclude bookmarks
+        :type   exclude_globs: C{list}
+        :param  exclude_globs: *OPTIONAL* shell style patterns to exclude
+        :type   exclude_regexes: C{list}
+        :param  exclude_regexes: *OPTIONAL* regular expressions to exclude
+        '''
+        self._exclude_prefixes.extend(exclude_prefixes or [])
+        self._exclude_postfixes.extend(exclude_postfixes or [])
+        self._exclude_globs.extend(exclude_globs or [])
+        self._exclude_regexes.extend(exclude_regexes or [])
+        self._matcher = None
+
+    @property
+    def exclude_rule(self):
+        '''
+        get single regular expression combining all exclude rules, None
+            when nothing is excluded
+        '''
+        rules = []
+        if self.exclude_prefixes:
+            rules.append(prefix_rule(self.exclude_prefixes))
+        if self._exclude_postfixes:
+            rules.append(postfix_rule(self._exclude_postfixes))
+        rules.extend(glob_rule(glob) for glob in self._exclude_globs)
+        rules.extend(self._exclude_regexes)
+
+        if not rules:
+            return None
+
+        return "|".join("(?:%s)" % rule for rule in rules)
+
+    @property
+    def matcher(self):
+        '''
+        get compiled exclude matcher, None when nothing is excluded
+        '''
+        if self._matcher is None:
+            rule = self.exclude_rule
+            self._matcher = compile_pattern(rule) if rule else False
+
+        return self._matcher or None
+
+    def is_excluded(self, bookmark):
+        '''
+        check if bookmark matches any of the exclude rules
+
+        :type   bookmark: C{str}
+        :param  bookmark: bookmark name
+        '''
+        matcher = self.matcher
+        return bool(matcher and matcher.match(bookmark))
+
+    def split(self, bookmarks):
+        '''
+        split bookmarks into those kept for boards and those excluded,
+            keeping their order
+
+        :type   bookmarks: C{list}
+        :param  bookmarks: bookmark names
+        :return: C{tuple} of matched and rejected bookmark lists
+        '''
+        matcher = self.matcher
+        if not matcher:
+            return list(bookmarks), []
+
+        matched = []
+        rejected = []
+        for bookmark in bookmarks:
+            if matcher.match(bookmark):
+                rejected.append(bookmark)
+            else:
+                matched.append(bookmark)
+
+        return matched, rejected
+
+    def filter(self, bookmarks):
+        '''
+        get bookmarks not matching any exclude rule
+
+        :type   bookmarks: C{list}
+        :param  bookmarks: bookmark names
+        '''
+        return self.split(bookmarks)[0]
@@ -0,0 +1,173 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Offline duplicate / origin audit of published Maya ASCII files. Runs the
+    same checks as FindDuplicateWSPositions without a Maya session, so it
+    can be used on farm nodes against many files in parallel, ie.
+
+    python -m VAD.DuplicateWSPositionsAudit -r /tmp/reports /show/layout/*.ma
+'''
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from VAD.MayaAsciiReader import MayaAsciiReader, GEOMETRY_TYPES
+from VAD.PositionIndex import find_duplicate_positions, is_asset_node
+
+
+def get_file_assets(reader):
+    '''
+    collect all unique legal assets from a read file, matching the asset
+        rules of FindDuplicateWSPositions.get_assets
+
+    :type   reader: C{MayaAsciiReader}
+    :param  reader: reader that has already read its file
+    '''
+    assets = set()
+    for shape in reader.nodes_of_type(GEOMETRY_TYPES):
+        trans_node = reader.nodes.get(shape.parent)
+        if trans_node is None or not trans_node.parent:
+            continue
+        if trans_node.parent in reader.nodes \
+                                and is_asset_node(trans_node.parent):
+            assets.add(trans_node.parent)
+
+    return list(assets)
+
+
+def audit_file(ma_path, tolerance=0.0):
+    '''
+    run duplicate world space position / origin audit on a single file
+
+    :type   ma_path: C{str}
+    :param  ma_path: path to Maya ASCII file
+    :type   tolerance: C{float}
+    :param  tolerance: max distance between pivots to still be considered
+                        a duplicate, 0.0 requires an exact match
+    :return: C{dict} report, 'error' is set if the file could not be checked
+    '''
+    report = {'file': ma_path, 'assets': 0, 'ws_dupes': [], 'origin': [],
+              'clusters': [], 'tolerance': tolerance, 'error': None}
+    start = time.time()
+
+    try:
+        reader = MayaAsciiReader(ma_path).read()
+        assets = get_file_assets(reader)
+        report['assets'] = len(assets)
+        report.update(find_duplicate_positions(
+                            [(asset, reader.world_pivots(asset))
+                                            for asset in assets], tolerance))
+    except Exception, e:
+        report['error'] = "%s\n%s" % (e, traceback.format_exc())
+
+    report['seconds'] = time.time() - start
+    return report
+
+
+def _audit_file_star(args):
+    '''
+    unpack arguments for process pool usage
+    '''
+    return audit_file(*args)
+
+
+def write_report(report, report_dir):
+    '''
+    write audit report for a file as json to the report directory
+
+    :type   report: C{dict}
+    :param  report: report returned by audit_file
+    :type   report_dir: C{str}
+    :param  report_dir: directory to write report into
+    '''
+    base_name = os.path.splitext(os.path.basename(report['file']))[0]
+    report_path = os.path.join(report_dir, '%s_ws_dupes.json' % base_name)
+
+    with open(report_path, 'w') as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+
+    return report_path
+
+
+def audit_files(ma_paths, report_dir=None, processes=None, tolerance=0.0):
+    '''
+    audit multiple files in parallel with a process pool, writing a
+        report per file if a report directory was provided
+
+    :type   ma_paths: C{list}
+    :param  ma_paths: list of Maya ASCII files
+    :type   report_dir: C{str}
+    :param  report_dir: *OPTIONAL* directory to write json reports into
+    :type   processes: C{int}
+    :param  processes: *OPTIONAL* number of worker processes, defaults to
+                        the cpu count
+    :type   tolerance: C{float}
+    :param  tolerance: max distance between pivots to still be considered
+                        a duplicate, 0.0 requires an exact match
+    :return: C{list} of report dicts
+    '''
+    reports = []
+    pool = multiprocessing.Pool(processes=processes)
+    try:
+        for report in pool.imap_unordered(_audit_file_star,
+                                [(ma_path, tolerance) for ma_path in ma_paths]):
+            status = 'FAILED' if report['error'] else \
+                        '%d dupes, %d at origin' % (len(report['ws_dupes']),
+                                                    len(report['origin']))
+            print '%s: %s (%.2fs)' % (report['file'], status,
+                                                        report['seconds'])
+            if report_dir:
+                write_report(report, report_dir)
+            reports.append(report)
+    finally:
+        pool.close()
+        pool.join()
+
+    return reports
+
+
+def main(argv=None):
+    '''
+    command line entry point
+    '''
+    parser = argparse.ArgumentParser(
+                description="Audit Maya ASCII files for assets with duplicate "
+                            + "world space positions or sitting at origin.")
+    parser.add_argument('files', nargs='+',
+                        help="Maya ASCII files or glob patterns to audit")
+    parser.add_argument('-r', '--report-dir', default=None,
+                        help="directory to write a json report per file")
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument('-t', '--tolerance', type=float, default=0.0,
+                        help="max pivot distance still considered a duplicate")
+    args = parser.parse_args(argv)
+
+    ma_paths = []
+    for pattern in args.files:
+        ma_paths.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    if args.report_dir and not os.path.isdir(args.report_dir):
+        os.makedirs(args.report_dir)
+
+    reports = audit_files(ma_paths, args.report_dir, args.processes,
+                          args.tolerance)
+
+    return 1 if [report for report in reports if report['error']] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
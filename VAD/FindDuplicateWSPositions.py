@@ -7,11 +7,18 @@
 # $Author: johnz $
 #
 
+import maya.api.OpenMaya as om
 import maya.cmds as mc
 
-import re
 from functools import partial
 
+from VAD.PositionIndex import PositionIndex, duplicate_results, \
+                            find_duplicate_positions, is_asset_node, \
+                            is_at_origin
+
+# persistent audit started with start_live_audit
+_live_audit = None
+
 
 class DuplicateWSPositionResults_GUI(object):
     '''
@@ -34,6 +41,9 @@ class DuplicateWSPositionResults_GUI(object):
         self._dup_scroll_list = None
         self._origins_scroll_form = None
         self._origins_scroll_list = None
+        self._cluster_scroll_form = None
+        self._cluster_scroll_list = None
+        self._cluster_members = {}
 
         # prep for gui building
         self._remove_existing()
@@ -41,20 +51,19 @@ class DuplicateWSPositionResults_GUI(object):
 
     def _build_ui(self):
         '''
-        Build a one to two scroll list gui to display found
+        Build a one to three scroll list gui to display found
             duplicate positional assets
         '''
         # initialize basic window dimensions to start with
-        base_height = {'single': 265, 'double': 480}
+        base_height = {1: 265, 2: 480, 3: 695}
         base_width = 625
-        use_height = 'single'
 
         self._window = mc.window(
                         self.WIN_NAME,
                         title='dd Find Duplicate World Space Position Results',
                         sizeable=True,
                         resizeToFitChildren=True,
-                        widthHeight=(base_width, base_height['single']))
+                        widthHeight=(base_width, base_height[1]))
 
         self._main_flayout = mc.formLayout(numberOfDivisions=100)
 
@@ -87,8 +96,10 @@ class DuplicateWSPositionResults_GUI(object):
                 )
 
         # determine if gui window should be resized based on scroll lists built
-        if self._dup_scroll_form and self._origins_scroll_form:
-            use_height = 'double'
+        use_height = len([form for form in [self._cluster_scroll_form,
+                                            self._dup_scroll_form,
+                                            self._origins_scroll_form]
+                                                                if form])
 
         mc.window(self._window, edit=True,
                   widthHeight=(base_width, base_height[use_height]))
@@ -102,11 +113,24 @@ class DuplicateWSPositionResults_GUI(object):
                                                     adjustableColumn=True,
                                                     parent=self._main_flayout)
 
+        # determine if should create a scroll list of duplicate clusters
+        clusters = self.found_assets.get('clusters')
+        if clusters:
+            self._build_clusters_scroll_list()
+            self._fill_scroll_list(self._cluster_scroll_list,
+                                   self._collect_cluster_labels(clusters))
+            sep = mc.separator(horizontal=True, style="in", height=10,
+                                parent=self._scroll_collection_form)
+
         # determine if should create a scroll list for duplicate world space
         if self.found_assets['ws_dupes']:
+            # list members next to their fellow cluster members when known
+            dupes = self.found_assets['ws_dupes']
+            if clusters:
+                dupes = [member for cluster in clusters
+                                        for member in cluster['members']]
             self._build_duplicates_scroll_list()
-            self._fill_scroll_list(self._dup_scroll_list,
-                                            self.found_assets['ws_dupes'])
+            self._fill_scroll_list(self._dup_scroll_list, dupes)
 
         # determine if should create a scroll list for assets at origin
         if self.found_assets['origin']:
@@ -140,6 +164,62 @@ class DuplicateWSPositionResults_GUI(object):
                                             scroll_annotate,
                                             self._scroll_collection_form)
 
+    def _build_clusters_scroll_list(self):
+        '''
+        Prep default values and kick of build of scroll list for
+            clusters of duplicate world space assets
+        '''
+        scroll_label = "Discovered Clusters of Co-located Assets:"
+        scroll_annotate = "Displays each group of assets that share the " \
+                        + "same world space pivot. Selecting a cluster " \
+                        + "selects all of its member assets."
+
+        self._cluster_scroll_form, self._cluster_scroll_list = \
+                            self._build_scroll_list(
+                                            scroll_label,
+                                            scroll_annotate,
+                                            self._scroll_collection_form)
+        mc.textScrollList(self._cluster_scroll_list, edit=True,
+                          selectCommand=self._do_select_clusters)
+
+    def _collect_cluster_labels(self, clusters):
+        '''
+        build display label for each cluster, storing its members for
+            selection lookups
+
+        :type   clusters: C{list}
+        :param  clusters: list of cluster dicts from check_for_dupe_positions
+        '''
+        labels = []
+        self._cluster_members = {}
+        for i, cluster in enumerate(clusters):
+            label = "Cluster %03d - %d assets" % (i + 1,
+                                                  len(cluster['members']))
+            if cluster['max_distance']:
+                label += " (max distance %g)" % cluster['max_distance']
+            label += ": %s" % cluster['members'][0].rpartition("|")[-1]
+
+            self._cluster_members[label] = cluster['members']
+            labels.append(label)
+
+        return labels
+
+    def _do_select_clusters(self, *args):
+        '''
+        Selects all members of the listed clusters in scene file with a
+            single selection call
+        '''
+        labels = self._get_selected_items(self._cluster_scroll_list) or []
+        members = []
+        for label in labels:
+            members.extend(self._cluster_members.get(label, []))
+
+        if members:
+            try:
+                mc.select(members, replace=True)
+            except:
+                pass
+
     def _build_origins_scroll_list(self):
         '''
         Prep default values and kick of build of scroll list for
@@ -212,8 +292,10 @@ class DuplicateWSPositionResults_GUI(object):
         :type   list_elements: C{list}
         :param  list_elements: list of elements to add to scroll list
         '''
-        for asset in list_elements:
-            mc.textScrollList(scroll_list, edit=True, append=asset)
+        # append all elements in a single edit, rather than one per element
+        if list_elements:
+            mc.textScrollList(scroll_list, edit=True,
+                                            append=list(list_elements))
 
     def _remove_existing(self, *args):
         '''
@@ -234,101 +316,390 @@ def get_assets():
     check all geometry assets in scene in order to collect all unique assets
     '''
     print "Locating geometry assets in scene.."
-    geometry = mc.ls(geometry=True)
-    # print geometry
-    assets = []
-    for geo in geometry:
-        trans_node = mc.listRelatives(geo, parent=True, fullPath=True)[0]
-        asset_node = mc.listRelatives(trans_node, parent=True, fullPath=True)
-        if asset_node:
-            grp_patt = re.compile("_GRP_")
-            if grp_patt.search(asset_node[0].rpartition("|")[-1]):
-                assets.append(asset_node[0])
+    geometry = mc.ls(geometry=True, long=True)
+    if not geometry:
+        return []
+
+    # collect the transforms of every shape in a single query, the asset
+    #   node is then just the parent portion of each transform's full path
+    transforms = mc.listRelatives(geometry, parent=True, fullPath=True) or []
+
+    assets = set()
+    checked = set()
+    for trans_node in transforms:
+        asset_node = trans_node.rpartition("|")[0]
+        if not asset_node or asset_node in checked:
+            continue
+        checked.add(asset_node)
 
-    return list(set(assets))
+        if is_asset_node(asset_node):
+            assets.add(asset_node)
 
+    return list(assets)
 
-def is_at_origin(t_pivot):
-    '''
-    check if the asset's position is located at the origin
 
-    :param t_pivot:
+def _collect_pivots(found_assets):
     '''
-    found = 0
-    for i in range(3):
-        if t_pivot[i] == 0:
-            found += 1
+    query world space pivots once per asset
 
-    if found == 3:
-        return True
-
-    return False
+    :type   found_assets: C{list}
+    :param  found_assets: list of assets to query
+    '''
+    for asset in found_assets:
+        yield asset, mc.xform(asset, query=True, worldSpace=True,
+                                            absolute=True, pivots=True)
 
 
-def check_for_dupe_positions(found_assets):
+def check_for_dupe_positions(found_assets, tolerance=0.0):
     '''
     test world space position of each asset against positions of scene assets
-    :param found_assets:
-    :return:
+
+    :type   found_assets: C{list}
+    :param  found_assets: list of assets to check
+    :type   tolerance: C{float}
+    :param  tolerance: max distance between pivots to still be considered
+                        a duplicate, 0.0 requires an exact match
+    :return: C{dict} with 'ws_dupes', 'origin' and 'clusters' results
     '''
     print "Checking assets for similar world space positions or at origin..."
-    # initialize list for duplicate position assets
-    found_positions = {'ws_dupes': [], 'origin': []}
-    ws_dupes = []
-
     mc.waitCursor(state=True)
 
-    # check each asset
-    for asset in found_assets:
-        apivots = mc.xform(asset, query=True, worldSpace=True,
-                                            absolute=True, pivots=True)
+    try:
+        # each pivot is queried once and bucketed, rather than comparing
+        #   every asset against every other asset
+        found_positions = find_duplicate_positions(
+                                    _collect_pivots(found_assets), tolerance)
+    finally:
+        mc.waitCursor(state=False)
 
-        # check if pivot exists at origin
-        if is_at_origin(apivots):
-            found_positions['origin'].append(asset)
-            continue
+    return found_positions
+
+
+class ManualSceneEvents(object):
+    '''
+    Stand-in scene event source that is driven by explicit calls, for use
+        outside of Maya's message callbacks, ie. scripted batch changes
+    '''
+    def __init__(self):
+        '''
+        initialize instance variables
+        '''
+        self._listener = None
+        self._watched = set()
+
+    @property
+    def watched(self):
+        '''
+        get set of assets currently being watched for moves
+        '''
+        return self._watched
+
+    def subscribe(self, listener):
+        '''
+        connect listener to receive asset_moved / scene_changed events
+
+        :type   listener: C{IncrementalDuplicateAudit}
+        :param  listener: object to notify of scene changes
+        '''
+        self._listener = listener
+
+    def unsubscribe(self):
+        '''
+        disconnect current listener and stop watching all assets
+        '''
+        self.unwatch(list(self._watched))
+        self._listener = None
+
+    def watch(self, assets):
+        '''
+        start watching specified assets for moves
+
+        :type   assets: C{list}
+        :param  assets: assets to watch
+        '''
+        self._watched.update(assets)
+
+    def unwatch(self, assets):
+        '''
+        stop watching specified assets for moves
+
+        :type   assets: C{list}
+        :param  assets: assets to stop watching
+        '''
+        self._watched.difference_update(assets)
 
-        # iterate over scene assets for comparisons
-        for test_asset in found_assets:
-            # skip testing if both assets are the same
-            if test_asset == asset:
+    def moved(self, asset):
+        '''
+        notify listener that an asset or one of its parents moved
+
+        :type   asset: C{str}
+        :param  asset: full path of moved asset
+        '''
+        if self._listener and asset in self._watched:
+            self._listener.asset_moved(asset)
+
+    def changed(self):
+        '''
+        notify listener that nodes were added, removed, renamed or reparented
+        '''
+        if self._listener:
+            self._listener.scene_changed()
+
+
+class MayaSceneEvents(ManualSceneEvents):
+    '''
+    Scene event source built on Maya message callbacks. Watched assets get a
+        world matrix modified callback, so moving a parent group also flags
+        the assets below it, while dag / name changes flag the asset
+        membership for a recheck.
+    '''
+    def __init__(self):
+        '''
+        initialize instance variables
+        '''
+        super(MayaSceneEvents, self).__init__()
+        self._scene_callbacks = []
+        self._asset_callbacks = {}
+
+    def subscribe(self, listener):
+        '''
+        connect listener and register scene wide callbacks
+
+        :type   listener: C{IncrementalDuplicateAudit}
+        :param  listener: object to notify of scene changes
+        '''
+        super(MayaSceneEvents, self).subscribe(listener)
+
+        changed = lambda *args: self.changed()
+        self._scene_callbacks = [
+                om.MDGMessage.addNodeAddedCallback(changed, 'dagNode'),
+                om.MDGMessage.addNodeRemovedCallback(changed, 'dagNode'),
+                om.MDagMessage.addAllDagChangesCallback(changed),
+                om.MNodeMessage.addNameChangedCallback(om.MObject(), changed),
+                om.MSceneMessage.addCallback(om.MSceneMessage.kAfterOpen,
+                                             changed),
+                om.MSceneMessage.addCallback(om.MSceneMessage.kAfterNew,
+                                             changed)]
+
+    def unsubscribe(self):
+        '''
+        disconnect listener and remove all registered callbacks
+        '''
+        super(MayaSceneEvents, self).unsubscribe()
+        if self._scene_callbacks:
+            om.MMessage.removeCallbacks(self._scene_callbacks)
+        self._scene_callbacks = []
+
+    def watch(self, assets):
+        '''
+        register world matrix callbacks for specified assets
+
+        :type   assets: C{list}
+        :param  assets: assets to watch
+        '''
+        for asset in assets:
+            if asset in self._asset_callbacks:
                 continue
+            sel = om.MSelectionList()
+            try:
+                sel.add(asset)
+            except RuntimeError:
+                continue
+            self._asset_callbacks[asset] = \
+                    om.MDagMessage.addWorldMatrixModifiedCallback(
+                                sel.getDagPath(0),
+                                lambda *args: self.moved(args[-1]), asset)
 
-            # collect test asset world positions
-            tpivots = mc.xform(test_asset, query=True, worldSpace=True,
-                                            absolute=True, pivots=True)
+        super(MayaSceneEvents, self).watch(assets)
+
+    def unwatch(self, assets):
+        '''
+        remove world matrix callbacks for specified assets
 
-            # check if position elements match
-            ps_found = 0
-            for attr in range(len(apivots)):
-                if apivots[attr] == tpivots[attr]:
-                    ps_found += 1
+        :type   assets: C{list}
+        :param  assets: assets to stop watching
+        '''
+        for asset in assets:
+            callback_id = self._asset_callbacks.pop(asset, None)
+            if callback_id is None:
+                continue
+            try:
+                om.MMessage.removeCallback(callback_id)
+            except RuntimeError:
+                # node was already deleted along with its callbacks
+                pass
 
-            # add test asset if all transform information matched
-            if ps_found == len(apivots):
-                found_positions['ws_dupes'].append(test_asset)
-                ws_dupes.append(test_asset)
+        super(MayaSceneEvents, self).unwatch(assets)
 
-    # clean up list of found assets to eliminate duplicate assets in lists
-    found_positions['origin'] = list(set(found_positions['origin']))
-    found_positions['ws_dupes'] = list(set(found_positions['ws_dupes']))
-    mc.waitCursor(state=False)
 
-    return found_positions
+class IncrementalDuplicateAudit(object):
+    '''
+    Persistent duplicate position audit that keeps a live PositionIndex of
+        asset pivots. Scene events only flag assets as dirty; the pivots of
+        dirty assets are re-read the next time results are requested, so
+        results stay current without rescanning the whole scene.
+    '''
+    def __init__(self, tolerance=0.0, event_source=None):
+        '''
+        initialize instance variables
+
+        :type   tolerance: C{float}
+        :param  tolerance: max distance between pivots to still be considered
+                            a duplicate, 0.0 requires an exact match
+        :type   event_source: C{ManualSceneEvents}
+        :param  event_source: *OPTIONAL* source of scene change events,
+                            defaults to Maya message callbacks
+        '''
+        self._tolerance = tolerance
+        self._index = PositionIndex(tolerance)
+        self._origin = set()
+        self._known = set()
+        self._dirty = set()
+        self._membership_dirty = True
+        self._results = None
+
+        self._event_source = event_source
+        if self._event_source is None:
+            self._event_source = MayaSceneEvents()
+        self._event_source.subscribe(self)
+
+    @property
+    def tolerance(self):
+        '''
+        get max distance between pivots for assets to be co-located
+        '''
+        return self._tolerance
 
+    @property
+    def assets(self):
+        '''
+        get list of legal assets currently tracked by the audit
+        '''
+        self._sync()
+        return list(self._known)
+
+    def asset_moved(self, asset):
+        '''
+        event handler flagging a single asset's pivots as out of date
 
-def select_duplicates():
+        :type   asset: C{str}
+        :param  asset: full path of moved asset
+        '''
+        self._dirty.add(asset)
+
+    def scene_changed(self):
+        '''
+        event handler flagging the asset membership as out of date
+        '''
+        self._membership_dirty = True
+
+    def stop(self):
+        '''
+        stop listening to scene events
+        '''
+        self._event_source.unsubscribe()
+
+    def results(self):
+        '''
+        get current duplicate position results, only re-reading assets
+            that were added or moved since the last call
+
+        :return: C{dict} with 'ws_dupes', 'origin' and 'clusters' results
+        '''
+        self._sync()
+        if self._results is None:
+            self._results = duplicate_results(self._index, self._origin)
+
+        return self._results
+
+    def _sync(self):
+        '''
+        bring index up to date with flagged scene changes
+        '''
+        if self._membership_dirty:
+            current = set(get_assets())
+            removed = self._known - current
+            added = current - self._known
+
+            for asset in removed:
+                self._index.remove(asset)
+                self._origin.discard(asset)
+
+            self._event_source.unwatch(removed)
+            self._event_source.watch(added)
+            self._known = current
+            self._dirty.update(added)
+            self._membership_dirty = False
+            if removed:
+                self._results = None
+
+        dirty = self._dirty & self._known
+        self._dirty = set()
+        if not dirty:
+            return
+
+        for asset, apivots in _collect_pivots(dirty):
+            if is_at_origin(apivots, self._tolerance):
+                self._index.remove(asset)
+                self._origin.add(asset)
+            else:
+                self._origin.discard(asset)
+                self._index.update(asset, apivots)
+
+        self._results = None
+
+
+def start_live_audit(tolerance=0.0):
+    '''
+    start a persistent duplicate position audit that select_duplicates
+        will use instead of rescanning the scene
+
+    :type   tolerance: C{float}
+    :param  tolerance: max distance between pivots to still be considered
+                        a duplicate, 0.0 requires an exact match
+    '''
+    global _live_audit
+    stop_live_audit()
+    _live_audit = IncrementalDuplicateAudit(tolerance)
+
+    return _live_audit
+
+
+def stop_live_audit():
+    '''
+    stop the persistent duplicate position audit, if running
+    '''
+    global _live_audit
+    if _live_audit is not None:
+        _live_audit.stop()
+    _live_audit = None
+
+
+def select_duplicates(tolerance=0.0):
     '''
     check scene for and select assets with same world space positions
+
+    :type   tolerance: C{float}
+    :param  tolerance: max distance between pivots to still be considered
+                        a duplicate, 0.0 requires an exact match
     '''
     msg = ''
-    # collect legal assets in the scene
-    assets = get_assets()
+    # collect legal assets in the scene, using the live audit's already
+    #   collected assets if one is running with the same tolerance
+    use_live = _live_audit is not None and _live_audit.tolerance == tolerance
+    if use_live:
+        assets = _live_audit.assets
+    else:
+        assets = get_assets()
+
     if not assets:
         msg = "Was unable to locate any legal assets in the scene to check."
     else:
         # locate duplicate positioned scene assets
-        located_assets = check_for_dupe_positions(assets)
+        if use_live:
+            located_assets = _live_audit.results()
+        else:
+            located_assets = check_for_dupe_positions(assets, tolerance)
 
         # display results to user
         if located_assets['ws_dupes'] or located_assets['origin']:
@@ -339,6 +710,13 @@ def select_duplicates():
             print "%s:" % msg
             print "\n".join(located_assets['ws_dupes'])
 
+            if tolerance > 0:
+                print "Co-located clusters within tolerance %s:" % tolerance
+                for cluster in located_assets['clusters']:
+                    print "\t%s" % ", ".join(
+                            ["%s (%g)" % (member, dist) for member, dist
+                             in zip(cluster['members'], cluster['distances'])])
+
             if located_assets['origin']:
                 o_msg = "Found %d assets sitting at the origin" \
                                                 % len(located_assets['origin'])
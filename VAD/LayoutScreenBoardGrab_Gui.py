@@ -36,7 +36,7 @@ class LayoutScreenBoardGrab_GUI(object):
                                 title='dd Layout Screen Board Grab',
                                 sizeable=False,
                                 resizeToFitChildren=True,
-                                widthHeight=(625, 135))
+                                widthHeight=(625, 300))
 
         self._main_flayout = mc.formLayout(numberOfDivisions=100)
 
@@ -93,6 +93,29 @@ class LayoutScreenBoardGrab_GUI(object):
                                               + "default HD size coded into "
                                               + "the tool.")
 
+        self._preview_button = mc.button(label='Preview Bookmarks',
+                                    height=25,
+                                    parent=self._main_flayout,
+                                    command=self.preview,
+                                    annotation="List the bookmarks of the "
+                                               + "selected camera that boards "
+                                               + "will be created for, and "
+                                               + "those that are excluded.")
+
+        self._preview_layout = mc.rowLayout(numberOfColumns=2,
+                                cw2=[300, 300],
+                                parent=self._main_flayout)
+        self._matched_list = mc.textScrollList(height=130, width=295,
+                                    allowMultiSelection=True,
+                                    parent=self._preview_layout,
+                                    annotation="Bookmarks boards will be "
+                                               + "created for.")
+        self._rejected_list = mc.textScrollList(height=130, width=295,
+                                    allowMultiSelection=True,
+                                    parent=self._preview_layout,
+                                    annotation="Bookmarks excluded by the "
+                                               + "prefixes and postfixes.")
+
         self._ok_button = mc.button(label='OK', height=30,
                                     parent=self._main_flayout,
                                     command=self.kick_off,
@@ -107,6 +130,10 @@ class LayoutScreenBoardGrab_GUI(object):
                             (self._rlayout, 'left', 10),
                             (self._rlayout, 'right', 5),
                             (self._use_panel_chbx, 'right', 10),
+                            (self._preview_button, 'left', 10),
+                            (self._preview_button, 'right', 10),
+                            (self._preview_layout, 'left', 10),
+                            (self._preview_layout, 'right', 5),
                             (self._ok_button, 'left', 10),
                             (self._ok_button, 'bottom', 10),
                             (self._ok_button, 'right', 10)
@@ -114,7 +141,11 @@ class LayoutScreenBoardGrab_GUI(object):
                 attachControl=[
                             (self._path_field, "bottom", 5, self._rlayout),
                             (self._rlayout, "bottom", 5, self._use_panel_chbx),
-                            (self._use_panel_chbx, "bottom", 5, self._ok_button)
+                            (self._use_panel_chbx, "bottom", 5,
+                                                        self._preview_button),
+                            (self._preview_button, "bottom", 5,
+                                                        self._preview_layout),
+                            (self._preview_layout, "bottom", 5, self._ok_button)
                     ]
                 )
 
@@ -158,6 +189,28 @@ class LayoutScreenBoardGrab_GUI(object):
         '''
         mc.showWindow(self._window)
 
+    def preview(self, *args):
+        '''
+        list bookmarks of the selected camera split by the exclude settings
+        :param args:
+        '''
+        if not self._check_prereqs():
+            return
+
+        matched, rejected = ddScreenBoardGrab.preview_layout_bookmarks(
+                                    exclude_prefixes=self.exclude_prefixes,
+                                    exclude_postfixes=self.exclude_postfixes)
+
+        mc.textScrollList(self._matched_list, edit=True, removeAll=True)
+        mc.textScrollList(self._rejected_list, edit=True, removeAll=True)
+        if matched:
+            mc.textScrollList(self._matched_list, edit=True, append=matched)
+        if rejected:
+            mc.textScrollList(self._rejected_list, edit=True, append=rejected)
+
+        print 'Previewed %d boards, %d excluded bookmarks' \
+                                                % (len(matched), len(rejected))
+
     def kick_off(self, *args):
         '''
         kick off the processing of layout boards with the specified settings
@@ -0,0 +1,300 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Incremental light set export. A manifest sidecar keeps a content hash of
+    every exported light, so later exports only write a delta document of
+    added, changed and removed lights, ie.
+
+    exporter = LightSetDeltaExport('/show/0010/0010_ABC_forest_lights.xml')
+    exporter.export(Scene(), SceneLights().lights)
+
+The first export writes the full light set. Every export after that with
+    changed lights writes "<base>_delta_v###.xml", and optionally patches
+    the full light set in place so fresh imports stay current.
+'''
+
+import hashlib
+import json
+import os
+
+from VAD.LightSetFormats import read_light_details
+from VAD.LightsToU import LightsToUStreamWriter, Scene, _light_details
+
+MANIFEST_VERSION = 1
+DELTA_GROUPS = ('Added', 'Changed', 'Removed')
+
+
+def light_key(details):
+    '''
+    get unique key of a light from its details, the full transform path
+
+    :type   details: C{dict}
+    :param  details: light details
+    '''
+    return '|'.join([details.get('Path') or '', details.get('Name') or ''])
+
+
+def details_hash(details):
+    '''
+    get content hash of light details
+
+    :type   details: C{dict}
+    :param  details: light details
+    '''
+    return hashlib.sha1(json.dumps(details, sort_keys=True)).hexdigest()
+
+
+def diff_light_set(light_hashes, light_set):
+    '''
+    compare lights against hashes from the last export
+
+    :type   light_hashes: C{dict}
+    :param  light_hashes: light key to details hash of last export
+    :type   light_set: C{list}
+    :param  light_set: current lights
+    :return: C{dict} with 'Added', 'Changed' and 'Removed' light details
+                lists, as well as the current 'hashes'
+    '''
+    delta = {'Added': [], 'Changed': [], 'Removed': [], 'hashes': {}}
+
+    for lght in light_set:
+        details = _light_details(lght)
+        key = light_key(details)
+        delta['hashes'][key] = details_hash(details)
+
+        if key not in light_hashes:
+            delta['Added'].append(details)
+        elif light_hashes[key] != delta['hashes'][key]:
+            delta['Changed'].append(details)
+
+    for key in sorted(light_hashes.keys()):
+        if key not in delta['hashes']:
+            path, _, name = key.rpartition('|')
+            delta['Removed'].append({'Name': name, 'Path': path})
+
+    return delta
+
+
+def load_manifest(manifest_path):
+    '''
+    load manifest of last export, if any
+
+    :type   manifest_path: C{str}
+    :param  manifest_path: path to manifest sidecar
+    '''
+    if not os.path.isfile(manifest_path):
+        return None
+
+    with open(manifest_path, 'r') as manifest_file:
+        manifest = json.load(manifest_file)
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+
+    return manifest
+
+
+def save_manifest(manifest_path, revision, light_hashes):
+    '''
+    save manifest of the current export
+
+    :type   manifest_path: C{str}
+    :param  manifest_path: path to manifest sidecar
+    :type   revision: C{int}
+    :param  revision: revision of the current export
+    :type   light_hashes: C{dict}
+    :param  light_hashes: light key to details hash
+    '''
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump({'version': MANIFEST_VERSION, 'revision': revision,
+                   'lights': light_hashes},
+                  manifest_file, indent=2, sort_keys=True)
+
+
+def write_delta(delta_path, scene_details, delta, from_revision, revision,
+                set_type='MayaLightSetDelta'):
+    '''
+    write delta document of added, changed and removed lights
+
+    :type   delta_path: C{str}
+    :param  delta_path: path to the delta file to write
+    :type   scene_details: C{Scene} / C{dict}
+    :param  scene_details: collection of scene related details
+    :type   delta: C{dict}
+    :param  delta: delta returned by diff_light_set
+    :type   from_revision: C{int}
+    :param  from_revision: revision the delta applies on top of
+    :type   revision: C{int}
+    :param  revision: revision after applying the delta
+    :type   set_type: C{str}
+    :param  set_type: root level element of the delta document
+    '''
+    with LightsToUStreamWriter(delta_path, set_type) as writer:
+        writer.write_scene_details(scene_details)
+        writer.write_scene_details({'From_Revision': str(from_revision),
+                                    'Revision': str(revision)})
+        for group in DELTA_GROUPS:
+            writer.write_lights(delta[group], group)
+
+
+def read_delta(delta_path):
+    '''
+    read delta document written by write_delta
+
+    :type   delta_path: C{str}
+    :param  delta_path: path to the delta file to read
+    :return: C{dict} with 'scene', 'from_revision', 'revision' and the
+                'Added', 'Changed' and 'Removed' light details lists
+    '''
+    _, scene_details, groups = read_light_details(delta_path, DELTA_GROUPS)
+
+    delta = dict(groups)
+    delta['from_revision'] = int(scene_details.pop('From_Revision'))
+    delta['revision'] = int(scene_details.pop('Revision'))
+    delta['scene'] = scene_details
+
+    return delta
+
+
+def apply_delta(xml_path, delta):
+    '''
+    patch a full light set file in place with a delta, keeping lights
+        sorted by name the same way a full export does
+
+    :type   xml_path: C{str}
+    :param  xml_path: path to the full light set xml file
+    :type   delta: C{dict}
+    :param  delta: delta returned by read_delta or diff_light_set, with the
+                    current scene details under 'scene'
+    '''
+    set_type, scene_details, groups = read_light_details(xml_path)
+
+    lights = {}
+    for details in groups['Lights']:
+        lights[light_key(details)] = details
+    for details in delta['Removed']:
+        lights.pop(light_key(details), None)
+    for details in delta['Added'] + delta['Changed']:
+        lights[light_key(details)] = details
+
+    scene_details = delta.get('scene') or scene_details
+    if isinstance(scene_details, Scene):
+        scene_details = scene_details.details
+
+    # write next to the original, then swap so readers never see a partial file
+    tmp_path = '%s.tmp' % xml_path
+    with LightsToUStreamWriter(tmp_path, set_type) as writer:
+        writer.write_scene_details(scene_details)
+        writer.write_lights(sorted(lights.values(),
+                                   key=lambda x: x.get('Name')))
+
+    if os.name == 'nt' and os.path.isfile(xml_path):
+        os.remove(xml_path)
+    os.rename(tmp_path, xml_path)
+
+
+class LightSetDeltaExport(object):
+    '''
+    Exports only the lights that changed since the last export
+    '''
+    def __init__(self, xml_path, set_type='MayaLightSet', patch=False):
+        '''
+        initialize instance variables
+
+        :type   xml_path: C{str}
+        :param  xml_path: path to the full light set xml file
+        :type   set_type: C{str}
+        :param  set_type: collection type name for root level element
+        :type   patch: C{bool}
+        :param  patch: also patch the full light set file in place with
+                        every delta
+        '''
+        self._xml_path = xml_path
+        self._set_type = set_type
+        self._patch = patch
+
+    @property
+    def xml_path(self):
+        '''
+        get path to the full light set xml file
+        '''
+        return self._xml_path
+
+    @property
+    def manifest_path(self):
+        '''
+        get path to the manifest sidecar of the light set
+        '''
+        return '%s_manifest.json' % os.path.splitext(self._xml_path)[0]
+
+    def delta_path(self, revision):
+        '''
+        get path to the delta file of a revision
+
+        :type   revision: C{int}
+        :param  revision: revision written by the delta
+        '''
+        return '%s_delta_v%03d.xml' % (os.path.splitext(self._xml_path)[0],
+                                       revision)
+
+    def export(self, scene_details, light_set):
+        '''
+        export lights, writing the full light set on first export and
+            only a delta document afterwards
+
+        :type   scene_details: C{Scene} / C{dict}
+        :param  scene_details: collection of scene related details
+        :type   light_set: C{list}
+        :param  light_set: current lights
+        :return: C{dict} with 'revision', 'path' of the written file and
+                    'added', 'changed', 'removed' light keys. Nothing is
+                    written when no light changed, 'path' is None and
+                    'revision' stays the last exported revision.
+        '''
+        if isinstance(scene_details, Scene):
+            scene_details = scene_details.details
+
+        manifest = load_manifest(self.manifest_path)
+        if manifest is None or not os.path.isfile(self._xml_path):
+            manifest = {'revision': 0, 'lights': {}}
+            full_export = True
+        else:
+            full_export = False
+
+        delta = diff_light_set(manifest['lights'], light_set)
+        if not full_export and not (delta['Added'] or delta['Changed']
+                                                        or delta['Removed']):
+            return {'revision': manifest['revision'], 'path': None,
+                    'added': [], 'changed': [], 'removed': []}
+
+        revision = manifest['revision'] + 1
+
+        if full_export:
+            out_path = self._xml_path
+            with LightsToUStreamWriter(out_path, self._set_type) as writer:
+                writer.write_scene_details(scene_details)
+                writer.write_lights([_light_details(lght)
+                                                    for lght in light_set])
+        else:
+            out_path = self.delta_path(revision)
+            write_delta(out_path, scene_details, delta,
+                        manifest['revision'], revision)
+            if self._patch:
+                delta['scene'] = scene_details
+                apply_delta(self._xml_path, delta)
+
+        save_manifest(self.manifest_path, revision, delta['hashes'])
+
+        return {'revision': revision, 'path': out_path,
+                'added': [light_key(details) for details in delta['Added']],
+                'changed': [light_key(details)
+                                            for details in delta['Changed']],
+                'removed': [light_key(details)
+                                            for details in delta['Removed']]}
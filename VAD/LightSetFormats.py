@@ -0,0 +1,435 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Maya independent compact light set formats, written alongside the
+    MayaLightSet XML produced by LightsToU. Light details are stored as typed
+    columns rather than a string element per value, ie. all light positions
+    are a single float array of x,y,z triplets.
+
+Columnar JSON::
+
+    {"format": "MayaLightSet", "version": 1, "set_type": "MayaLightSet",
+     "scene": {"Scene": ..., ...}, "count": 2,
+     "columns": {"name": [...], "position": [x0, y0, z0, x1, ...], ...}}
+
+Binary, little endian::
+
+    header      4s magic 'MLSB', H version, H reserved, I light count
+    set_type    string
+    scene       I detail count, then key / value string pairs
+    strings     per STRING_COLUMNS, count strings each
+    vectors     per VECTOR_COLUMNS, count * 3 float64 each
+    scalars     per SCALAR_COLUMNS, count float64 each
+
+    strings are an I byte length followed by utf-8 bytes. Missing scalars
+    are NaN in the binary layout and null in JSON.
+'''
+
+import array
+import json
+import math
+import struct
+import sys
+import time
+
+from xml.etree.ElementTree import iterparse
+
+FORMAT_NAME = 'MayaLightSet'
+FORMAT_VERSION = 1
+BINARY_MAGIC = 'MLSB'
+
+_HEADER = struct.Struct('<4sHHI')
+_LENGTH = struct.Struct('<I')
+
+STRING_COLUMNS = ('name', 'path', 'type', 'shadows')
+VECTOR_COLUMNS = (('position', 'xyz'), ('rotation', 'xyz'), ('scale', 'xyz'),
+                  ('color', 'rgb'))
+SCALAR_COLUMNS = ('intensity', 'shadow_resolution', 'shadow_bias',
+                  'spot_angle', 'range')
+
+
+class LightSetFormatException(Exception):
+    pass
+
+
+def _detail_key(column):
+    '''
+    get light detail key for a column, ie. 'spot_angle' -> 'Spot_Angle'
+
+    :type   column: C{str}
+    :param  column: column name
+    '''
+    return column.title()
+
+
+def _to_float(value):
+    '''
+    convert a detail value to float, missing values become NaN
+
+    :type   value: C{str}
+    :param  value: detail value
+    '''
+    if value is None or value == '':
+        return float('nan')
+
+    return float(value)
+
+
+def _to_unicode(value):
+    '''
+    convert a detail value to unicode text
+
+    :type   value: C{str}
+    :param  value: detail value
+    '''
+    if value is None:
+        return u''
+    if isinstance(value, unicode):
+        return value
+    if isinstance(value, str):
+        return value.decode('utf-8')
+
+    return unicode(value)
+
+
+def light_set_columns(light_set):
+    '''
+    convert light details to typed columns
+
+    :type   light_set: C{list}
+    :param  light_set: list of light detail dicts, or objects with a
+                        details property (SceneLightNode, SceneLightRecord)
+    :return: C{dict} of column name to list of values
+    '''
+    columns = {}
+    for column in STRING_COLUMNS + SCALAR_COLUMNS:
+        columns[column] = []
+    for column, _ in VECTOR_COLUMNS:
+        columns[column] = []
+
+    for lght in light_set:
+        lght_details = lght
+        if not isinstance(lght, dict):
+            lght_details = lght.details
+
+        for column in STRING_COLUMNS:
+            columns[column].append(
+                            _to_unicode(lght_details.get(_detail_key(column))))
+        for column, axes in VECTOR_COLUMNS:
+            vector = lght_details.get(_detail_key(column)) or {}
+            columns[column].extend([_to_float(vector.get(axis))
+                                                            for axis in axes])
+        for column in SCALAR_COLUMNS:
+            columns[column].append(
+                            _to_float(lght_details.get(_detail_key(column))))
+
+    return columns
+
+
+def _scene_dict(scene_details):
+    '''
+    normalize scene details to unicode key / value pairs
+
+    :type   scene_details: C{dict}
+    :param  scene_details: collection of scene related details
+    '''
+    return dict([(_to_unicode(key), _to_unicode(val))
+                            for key, val in (scene_details or {}).iteritems()])
+
+
+def _light_set_data(set_type, scene_details, columns):
+    '''
+    build the in memory light set layout shared by all readers
+    '''
+    return {'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'set_type': set_type,
+            'scene': scene_details,
+            'count': len(columns['name']),
+            'columns': columns}
+
+
+def write_json(json_path, scene_details, light_set, set_type=FORMAT_NAME):
+    '''
+    write light set as columnar json
+
+    :type   json_path: C{str}
+    :param  json_path: path to the json file to write
+    :type   scene_details: C{dict}
+    :param  scene_details: collection of scene related details
+    :type   light_set: C{list}
+    :param  light_set: list of lights with detail dict
+    :type   set_type: C{str}
+    :param  set_type: collection type name of the light set
+    '''
+    columns = light_set_columns(light_set)
+    for column in columns:
+        if column in STRING_COLUMNS:
+            continue
+        # json has no NaN, missing values are written as null
+        columns[column] = [None if math.isnan(val) else val
+                                                    for val in columns[column]]
+
+    with open(json_path, 'wb') as json_file:
+        json.dump(_light_set_data(set_type, _scene_dict(scene_details),
+                                  columns),
+                  json_file, separators=(',', ':'), sort_keys=True)
+
+
+def read_json(json_path):
+    '''
+    read columnar json light set, missing values are returned as NaN
+
+    :type   json_path: C{str}
+    :param  json_path: path to the json file to read
+    :return: C{dict} light set with 'set_type', 'scene', 'count', 'columns'
+    '''
+    with open(json_path, 'rb') as json_file:
+        data = json.load(json_file)
+
+    if data.get('format') != FORMAT_NAME:
+        raise LightSetFormatException('Not a light set file: %s' % json_path)
+    if data.get('version') > FORMAT_VERSION:
+        raise LightSetFormatException('Unsupported light set version %s: %s'
+                                        % (data.get('version'), json_path))
+
+    columns = data['columns']
+    for column in columns:
+        if column in STRING_COLUMNS:
+            continue
+        columns[column] = [float('nan') if val is None else val
+                                                    for val in columns[column]]
+
+    return data
+
+
+def _pack_string(value):
+    '''
+    pack string as byte length and utf-8 bytes
+    '''
+    value = _to_unicode(value).encode('utf-8')
+    return _LENGTH.pack(len(value)) + value
+
+
+def _pack_floats(values):
+    '''
+    pack list of floats as little endian float64 values
+    '''
+    floats = array.array('d', values)
+    if sys.byteorder == 'big':
+        floats.byteswap()
+    return floats.tostring()
+
+
+def write_binary(binary_path, scene_details, light_set, set_type=FORMAT_NAME):
+    '''
+    write light set in the compact binary layout
+
+    :type   binary_path: C{str}
+    :param  binary_path: path to the binary file to write
+    :type   scene_details: C{dict}
+    :param  scene_details: collection of scene related details
+    :type   light_set: C{list}
+    :param  light_set: list of lights with detail dict
+    :type   set_type: C{str}
+    :param  set_type: collection type name of the light set
+    '''
+    columns = light_set_columns(light_set)
+    scene_details = _scene_dict(scene_details)
+
+    with open(binary_path, 'wb') as binary_file:
+        binary_file.write(_HEADER.pack(BINARY_MAGIC, FORMAT_VERSION, 0,
+                                       len(columns['name'])))
+        binary_file.write(_pack_string(set_type))
+
+        binary_file.write(_LENGTH.pack(len(scene_details)))
+        for key in sorted(scene_details.keys()):
+            binary_file.write(_pack_string(key))
+            binary_file.write(_pack_string(scene_details[key]))
+
+        for column in STRING_COLUMNS:
+            binary_file.write(''.join([_pack_string(val)
+                                                for val in columns[column]]))
+        for column, _ in VECTOR_COLUMNS:
+            binary_file.write(_pack_floats(columns[column]))
+        for column in SCALAR_COLUMNS:
+            binary_file.write(_pack_floats(columns[column]))
+
+
+class _BinaryLightSetReader(object):
+    '''
+    Sequential reader over the bytes of a binary light set
+    '''
+    def __init__(self, data, binary_path):
+        self._data = data
+        self._offset = 0
+        self._binary_path = binary_path
+
+    def read(self, size):
+        '''
+        read the next number of bytes
+        '''
+        if self._offset + size > len(self._data):
+            raise LightSetFormatException('Truncated light set file: %s'
+                                                        % self._binary_path)
+        chunk = self._data[self._offset:self._offset + size]
+        self._offset += size
+        return chunk
+
+    def read_struct(self, fmt):
+        '''
+        read and unpack the next struct
+        '''
+        return fmt.unpack(self.read(fmt.size))
+
+    def read_string(self):
+        '''
+        read the next length prefixed utf-8 string
+        '''
+        length = self.read_struct(_LENGTH)[0]
+        return self.read(length).decode('utf-8')
+
+    def read_floats(self, count):
+        '''
+        read the next number of little endian float64 values
+        '''
+        floats = array.array('d')
+        floats.fromstring(self.read(count * floats.itemsize))
+        if sys.byteorder == 'big':
+            floats.byteswap()
+        return floats.tolist()
+
+
+def read_binary(binary_path):
+    '''
+    read binary light set, missing values are returned as NaN
+
+    :type   binary_path: C{str}
+    :param  binary_path: path to the binary file to read
+    :return: C{dict} light set with 'set_type', 'scene', 'count', 'columns'
+    '''
+    with open(binary_path, 'rb') as binary_file:
+        reader = _BinaryLightSetReader(binary_file.read(), binary_path)
+
+    magic, version, _, count = reader.read_struct(_HEADER)
+    if magic != BINARY_MAGIC:
+        raise LightSetFormatException('Not a light set file: %s' % binary_path)
+    if version > FORMAT_VERSION:
+        raise LightSetFormatException('Unsupported light set version %s: %s'
+                                                    % (version, binary_path))
+
+    set_type = reader.read_string()
+    scene_details = {}
+    for _ in range(reader.read_struct(_LENGTH)[0]):
+        key = reader.read_string()
+        scene_details[key] = reader.read_string()
+
+    columns = {}
+    for column in STRING_COLUMNS:
+        columns[column] = [reader.read_string() for _ in range(count)]
+    for column, _ in VECTOR_COLUMNS:
+        columns[column] = reader.read_floats(count * 3)
+    for column in SCALAR_COLUMNS:
+        columns[column] = reader.read_floats(count)
+
+    return _light_set_data(set_type, scene_details, columns)
+
+
+def element_details(elem):
+    '''
+    convert a light set element back to a details dict / text value
+
+    :type   elem: C{Element}
+    :param  elem: element to convert
+    '''
+    if len(elem):
+        return dict([(child.tag, element_details(child)) for child in elem])
+
+    return elem.text
+
+
+def read_light_details(xml_path, group_tags=('Lights',)):
+    '''
+    read MayaLightSet XML written by LightsToU back into detail dicts,
+        clearing each light element once it has been read
+
+    :type   xml_path: C{str}
+    :param  xml_path: path to the xml file to read
+    :type   group_tags: C{list}
+    :param  group_tags: tags of root level elements grouping lights
+    :return: C{tuple} of root tag, scene details dict and dict of group tag
+                to list of light detail dicts
+    '''
+    set_type = None
+    scene_details = {}
+    groups = dict([(tag, []) for tag in group_tags])
+    group = None
+    depth = 0
+
+    for event, elem in iterparse(xml_path, events=('start', 'end')):
+        if event == 'start':
+            if set_type is None:
+                set_type = elem.tag
+            elif depth == 1 and elem.tag in groups:
+                group = groups[elem.tag]
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 2 and group is not None and elem.tag == 'Light':
+            group.append(element_details(elem))
+            elem.clear()
+        elif depth == 1:
+            if elem.tag not in groups:
+                scene_details[elem.tag] = element_details(elem)
+            group = None
+
+    return set_type, scene_details, groups
+
+
+def read_xml(xml_path):
+    '''
+    read MayaLightSet XML written by LightsToU into the same columnar layout
+        as the other readers
+
+    :type   xml_path: C{str}
+    :param  xml_path: path to the xml file to read
+    :return: C{dict} light set with 'set_type', 'scene', 'count', 'columns'
+    '''
+    set_type, scene_details, groups = read_light_details(xml_path)
+    return _light_set_data(set_type, _scene_dict(scene_details),
+                           light_set_columns(groups['Lights']))
+
+
+READERS = {'xml': read_xml, 'json': read_json, 'binary': read_binary}
+
+
+def benchmark_readers(paths, repeat=5):
+    '''
+    time reading the same light set in each format
+
+    :type   paths: C{dict}
+    :param  paths: format name ('xml', 'json', 'binary') to file path
+    :type   repeat: C{int}
+    :param  repeat: number of reads per format, the best time is kept
+    :return: C{dict} of format name to best read time in seconds
+    '''
+    timings = {}
+    for fmt, path in paths.iteritems():
+        best = None
+        for _ in range(repeat):
+            start = time.time()
+            READERS[fmt](path)
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        timings[fmt] = best
+
+    return timings
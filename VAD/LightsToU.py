@@ -9,6 +9,8 @@
 
 import codecs
 import datetime
+import itertools
+import math
 import os
 import re
 import warnings
@@ -16,7 +18,14 @@ import warnings
 from xml.etree.ElementTree import Element, SubElement, tostring, ElementTree
 from xml.dom import minidom
 
-import maya.cmds as mc
+try:
+    import maya.api.OpenMaya as om
+    import maya.cmds as mc
+except ImportError:
+    # scenes can still be processed offline from Maya ASCII files
+    om = mc = None
+
+from VAD import LightSetFormats
 
 
 def warning_user_friendly(message, category, filename, lineno,
@@ -37,27 +46,50 @@ class SceneNameException(Exception):
     pass
 
 
+class LightsToUFormatException(Exception):
+    pass
+
+
 class LightsToU(object):
     '''
     Processing of Maya scene lights to XML for Unity creation
     '''
     ENCODING_FORMAT = 'utf-8'
-    def __init__(self, set_type='MayaLightSet'):
+    OUTPUT_FORMATS = ('xml', 'json', 'binary')
+    def __init__(self, set_type='MayaLightSet', output_format='xml'):
         '''
         initialize instance variables
 
         :type   set_type: C{str}
         :param  set_type: collection type name for root level element
+        :type   output_format: C{str}
+        :param  output_format: file format written, one of OUTPUT_FORMATS
         '''
         self._set_type = set_type
-        self._xml_root = Element(self._set_type)
+        # processed scene details and lights, in processing order. Lights
+        #   share a single entry, the same as their single xml element
+        self._entries = []
+        self._light_sets = None
+        self._xml_root = None
         self._xml_path = None
+        self._output_format = None
+
+        self.output_format = output_format
 
     @property
     def xml_root(self):
         '''
-        get current xml root collection
+        get current xml root collection, built from the processed elements
+            on first use
         '''
+        if self._xml_root is None:
+            self._xml_root = Element(self._set_type)
+            for tag, value in self._entries:
+                if tag == 'Lights':
+                    self._build_lights(value)
+                    continue
+                self._process_elements(value)
+
         return self._xml_root
 
     @property
@@ -84,6 +116,29 @@ class LightsToU(object):
 
         self._xml_path = xml_file_path
 
+    @property
+    def output_format(self):
+        '''
+        get file format written by write
+        '''
+        return self._output_format
+
+    @output_format.setter
+    def output_format(self, output_format):
+        '''
+        set file format written by write, the xml path is used as the output
+            file path for every format
+
+        :type   output_format: C{str}
+        :param  output_format: one of OUTPUT_FORMATS
+        '''
+        if output_format not in self.OUTPUT_FORMATS:
+            raise LightsToUFormatException('Unsupported output format: %s. '
+                                % output_format + 'Use one of: %s.'
+                                % ', '.join(self.OUTPUT_FORMATS))
+
+        self._output_format = output_format
+
     def process_scene_details(self, scene_details):
         '''
         setup processing elements for scene details
@@ -95,15 +150,31 @@ class LightsToU(object):
         if isinstance(scene_details, Scene):
             scene_details = scene_details.details
 
-        self._process_elements(scene_details)
+        self._entries.append((None, scene_details))
+        self._xml_root = None
 
     def process_lights(self, light_set):
         '''
-        setup processing elements for provided set of lights
+        setup processing elements for provided set of lights. Lights are
+            only read for their details when written.
 
         :type   light_set: C{list}
         :param  light_set: list of lights with detail dict
         '''
+        if self._light_sets is None:
+            self._light_sets = []
+            self._entries.append(('Lights', self._light_sets))
+
+        self._light_sets.append(light_set)
+        self._xml_root = None
+
+    def _build_lights(self, light_sets):
+        '''
+        add elements for processed light sets to the xml root
+
+        :type   light_sets: C{list}
+        :param  light_sets: processed lists of lights
+        '''
         lights_elem_tag = 'Lights'
         # determine if element tag already exists before creating new
         lights_elem = None
@@ -115,13 +186,9 @@ class LightsToU(object):
             lights_elem = lights_elem_exists
 
         # iterate through and add new light element
-        for lght in light_set:
+        for lght in itertools.chain(*light_sets):
             lght_elem = SubElement(lights_elem, 'Light')
-            lght_details = lght
-            if isinstance(lght, SceneLightNode):
-                lght_details = lght.details
-
-            self._process_elements(lght_details, lght_elem)
+            self._process_elements(_light_details(lght), lght_elem)
 
     def _process_elements(self, elements, root=None):
         '''
@@ -154,17 +221,19 @@ class LightsToU(object):
         '''
         print string version of the elements
         '''
-        print tostring(self._xml_root)
+        print tostring(self.xml_root)
 
     def print_pretty_xml(self):
         '''
         print xml elements in a more human readable format
         '''
-        print self.prettify(self._xml_root)
+        print self.prettify(self.xml_root)
 
     def write(self):
         '''
-        write xml root data to file
+        write processed data to file in the selected output format. XML is
+            streamed straight to the file, one light at a time, without
+            building the element tree, json / binary use LightSetFormats
         '''
         if not self.xml_path:
             warnings.warn("XML file path has not been provided. " \
@@ -172,9 +241,39 @@ class LightsToU(object):
                             UserWarning)
             return
 
-        with codecs.open(self.xml_path, 'w',
-                        encoding=self.ENCODING_FORMAT) as xml_file:
-            xml_file.write(self.prettify(self.xml_root))
+        if self.output_format == 'json':
+            LightSetFormats.write_json(self.xml_path, *self._collect_details(),
+                                       set_type=self._set_type)
+            return
+        if self.output_format == 'binary':
+            LightSetFormats.write_binary(self.xml_path,
+                                         *self._collect_details(),
+                                         set_type=self._set_type)
+            return
+
+        with LightsToUStreamWriter(self.xml_path, self._set_type) as writer:
+            for tag, value in self._entries:
+                if tag == 'Lights':
+                    writer.write_lights(itertools.chain(*value))
+                    continue
+                writer.write_scene_details(value)
+
+    def _collect_details(self):
+        '''
+        collect scene details and light details, for writing the compact
+            formats
+        '''
+        scene_details = {}
+        light_set = []
+        for tag, value in self._entries:
+            if tag == 'Lights':
+                light_set.extend([_text_details(_light_details(lght))
+                                        for lght in itertools.chain(*value)])
+                continue
+            for key, detail in value.items():
+                scene_details[key] = _text_details(detail)
+
+        return scene_details, light_set
 
     @classmethod
     def prettify(cls, elem):
@@ -190,16 +289,229 @@ class LightsToU(object):
         return reparsed.toprettyxml(indent="  ", encoding=cls.ENCODING_FORMAT)
 
 
+class LightsToUStreamWriter(object):
+    '''
+    Incrementally writes an indented light set document to file, producing
+        the same bytes as LightsToU.prettify without holding the document
+        in memory. Lights are written out as they are processed, ie.
+
+        with LightsToUStreamWriter(xml_path) as writer:
+            writer.write_scene_details(Scene())
+            writer.write_lights(SceneLights().lights)
+    '''
+    ENCODING_FORMAT = LightsToU.ENCODING_FORMAT
+    INDENT = '  '
+
+    def __init__(self, xml_path, set_type='MayaLightSet'):
+        '''
+        initialize instance variables
+
+        :type   xml_path: C{str}
+        :param  xml_path: path to the xml file to write
+        :type   set_type: C{str}
+        :param  set_type: collection type name for root level element
+        '''
+        self._xml_path = xml_path
+        self._set_type = set_type
+        self._xml_file = None
+        self._root_open = False
+        self._lights_state = None # None, 'started' or 'open'
+        self._lights_tag = 'Lights'
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        '''
+        open xml file and write document header
+        '''
+        self._xml_file = codecs.open(self._xml_path, 'w',
+                                     encoding=self.ENCODING_FORMAT)
+        self._write('<?xml version="1.0" encoding="%s"?>\n'
+                                                    % self.ENCODING_FORMAT)
+
+    def close(self):
+        '''
+        close any open elements and the xml file
+        '''
+        if self._xml_file is None:
+            return
+
+        self._close_lights()
+        if self._root_open:
+            self._write('</%s>\n' % self._set_type)
+        else:
+            self._write('<%s/>\n' % self._set_type)
+
+        self._xml_file.close()
+        self._xml_file = None
+
+    def write_scene_details(self, scene_details):
+        '''
+        write scene detail elements under the root element
+
+        :type   scene_details: C{Scene} / C{dict}
+        :param  scene_details: collection of scene related details,
+                                ie. scene name, version, etc.
+        '''
+        if isinstance(scene_details, Scene):
+            scene_details = scene_details.details
+
+        self._close_lights()
+        self._open_root()
+        for key in sorted(scene_details.keys()):
+            self._write_value(key, scene_details[key], 1)
+
+    def write_lights(self, light_set, group_tag='Lights'):
+        '''
+        write each light to file as it is processed, under a single
+            group element that stays open until other elements or
+            the document are closed
+
+        :type   light_set: C{list}
+        :param  light_set: list of lights with detail dict
+        :type   group_tag: C{str}
+        :param  group_tag: tag of element grouping the lights
+        '''
+        self._open_root()
+        if self._lights_state is not None and self._lights_tag != group_tag:
+            self._close_lights()
+        if self._lights_state is None:
+            self._write('%s<%s' % (self.INDENT, group_tag))
+            self._lights_state = 'started'
+            self._lights_tag = group_tag
+
+        for lght in light_set:
+            if self._lights_state == 'started':
+                self._write('>\n')
+                self._lights_state = 'open'
+
+            self._write_value('Light', _light_details(lght), 2)
+
+    def write_element(self, elem, depth=1):
+        '''
+        write an existing ElementTree element and its children
+
+        :type   elem: C{Element}
+        :param  elem: element to write
+        :type   depth: C{int}
+        :param  depth: indentation level of element
+        '''
+        self._close_lights()
+        self._open_root()
+        self._write_etree(elem, depth)
+
+    def _open_root(self):
+        '''
+        write root start tag before its first child
+        '''
+        if not self._root_open:
+            self._write('<%s>\n' % self._set_type)
+            self._root_open = True
+
+    def _close_lights(self):
+        '''
+        close the light group element if one is being written
+        '''
+        if self._lights_state == 'started':
+            self._write('/>\n')
+        elif self._lights_state == 'open':
+            self._write('%s</%s>\n' % (self.INDENT, self._lights_tag))
+        self._lights_state = None
+
+    def _write_value(self, tag, value, depth):
+        '''
+        write a detail value as an element, recursing into dicts
+
+        :type   tag: C{str}
+        :param  tag: element tag
+        :type   value: C{dict} / C{str}
+        :param  value: nested details or element text
+        :type   depth: C{int}
+        :param  depth: indentation level of element
+        '''
+        indent = self.INDENT * depth
+        if isinstance(value, dict):
+            if not value:
+                self._write('%s<%s/>\n' % (indent, tag))
+                return
+            self._write('%s<%s>\n' % (indent, tag))
+            for key in sorted(value.keys()):
+                self._write_value(key, value[key], depth + 1)
+            self._write('%s</%s>\n' % (indent, tag))
+            return
+
+        self._write_text(tag, value, indent)
+
+    def _write_etree(self, elem, depth):
+        '''
+        write an ElementTree element, recursing into its children
+
+        :type   elem: C{Element}
+        :param  elem: element to write
+        :type   depth: C{int}
+        :param  depth: indentation level of element
+        '''
+        indent = self.INDENT * depth
+        if len(elem):
+            self._write('%s<%s>\n' % (indent, elem.tag))
+            for child in elem:
+                self._write_etree(child, depth + 1)
+            self._write('%s</%s>\n' % (indent, elem.tag))
+            return
+
+        self._write_text(elem.tag, elem.text, indent)
+
+    def _write_text(self, tag, text, indent):
+        '''
+        write a text only element, escaped the same way minidom does
+
+        :type   tag: C{str}
+        :param  tag: element tag
+        :type   text: C{str}
+        :param  text: element text
+        :type   indent: C{str}
+        :param  indent: indentation to write before element
+        '''
+        if text is None or text == '':
+            self._write('%s<%s/>\n' % (indent, tag))
+            return
+
+        if not isinstance(text, basestring):
+            text = str(text)
+        text = text.replace("&", "&amp;").replace("<", "&lt;") \
+                   .replace("\"", "&quot;").replace(">", "&gt;")
+        self._write('%s<%s>%s</%s>\n' % (indent, tag, text, tag))
+
+    def _write(self, data):
+        '''
+        write data to the open xml file
+
+        :type   data: C{str}
+        :param  data: data to write
+        '''
+        self._xml_file.write(data)
+
+
 class Scene(object):
-    def __init__(self):
+    def __init__(self, scene_file=None):
         '''
         initialize instance variables
+
+        :type   scene_file: C{str}
+        :param  scene_file: *OPTIONAL* path of scene file to get details
+                                from, defaults to the open scene
         '''
         self._scene = ''
         self._scene_version = 0
         self._time = str(datetime.datetime.now())
         self.__scene_path = ''
         self.__scene_file = ''
+        self.__scene_file_path = scene_file
 
         self._determine_scene_version()
 
@@ -223,7 +535,9 @@ class Scene(object):
         '''
         collect the current scene file and path
         '''
-        scene_file = mc.file(query=True, sceneName=True)
+        scene_file = self.__scene_file_path
+        if scene_file is None:
+            scene_file = mc.file(query=True, sceneName=True)
 
         self.__scene_path, self.__scene_file = os.path.split(scene_file)
 
@@ -282,18 +596,279 @@ class SceneLights(object):
         '''
         attempt to collect lights and their details in scene
         '''
-        found_lights = mc.ls(lights=True, long=True)
+        # names and types of all lights come back from a single query,
+        #   interleaved as [name, type, name, type, ...]
+        found_lights = mc.ls(lights=True, long=True, showType=True)
         if not found_lights:
             return
 
-        for lght in found_lights:
-            if mc.nodeType(lght) in self._UNSUPPORTED_LIGHTS:
-                continue
-            self._lights.append(SceneLightNode(lght))
+        supported = [lght for lght, light_type in zip(found_lights[::2],
+                                                      found_lights[1::2])
+                                if light_type not in self._UNSUPPORTED_LIGHTS]
 
+        self._lights = extract_light_records(supported)
         self._lights.sort(key=lambda x: x.name)
 
 
+class SceneLightRecord(object):
+    '''
+    Compact light record filled in by extract_light_records, providing the
+        same details as SceneLightNode
+    '''
+    __slots__ = ('name', 'path', 'position', 'rotation', 'scale', 'type',
+                 'color', 'intensity', 'shadows', 'shadow_resolution',
+                 'shadow_bias', 'spot_angle', 'range')
+
+    def __init__(self, name='', path=''):
+        '''
+        initialize record with base defaults, type specific
+            details are only set when they apply to the light
+
+        :type   name: C{str}
+        :param  name: light transform name
+        :type   path: C{str}
+        :param  path: dag path of light transform's parent
+        '''
+        self.name = name
+        self.path = path
+        self.position = {} # x,y,z
+        self.rotation = {} # x,y,z
+        self.scale = {} # x,y,z
+        self.type = ''
+        self.color = {} # r,g,b
+        self.intensity = '0.0'
+        self.shadows = 'No'
+
+    @property
+    def details(self):
+        '''
+        get the main variable and value details as a formatted dictionary
+        '''
+        vars_dict = {}
+        for slot in self.__slots__:
+            if hasattr(self, slot):
+                vars_dict[slot.title()] = getattr(self, slot)
+
+        return vars_dict
+
+
+def _light_details(lght):
+    '''
+    get details dict of a light node, record or details dict
+
+    :type   lght: C{SceneLightNode} / C{SceneLightRecord} / C{dict}
+    :param  lght: light to get details of
+    '''
+    if isinstance(lght, (SceneLightNode, SceneLightRecord)):
+        return lght.details
+
+    return lght
+
+
+def _text_details(value):
+    '''
+    get details as read back from their xml elements, where empty detail
+        dicts become empty text
+
+    :type   value: C{dict} / C{str}
+    :param  value: nested details or text value
+    '''
+    if isinstance(value, dict):
+        if not value:
+            return None
+        return dict([(key, _text_details(detail))
+                                            for key, detail in value.items()])
+
+    return value
+
+
+def _vector_dict(values, keys='xyz'):
+    '''
+    convert a list of values into a string dict, ie. {'x': '0.0', ...}
+
+    :type   values: C{list}
+    :param  values: values to convert
+    :type   keys: C{str}
+    :param  keys: key for each value
+    '''
+    return dict([(key, str(val)) for key, val in zip(keys, values)])
+
+
+def extract_light_records(lights):
+    '''
+    gather details for all specified lights in a single pass over the
+        Maya API, rather than many command queries per light
+
+    :type   lights: C{list}
+    :param  lights: full paths of light shape nodes
+    :return: C{list} of C{SceneLightRecord}
+    '''
+    records = []
+    if not lights:
+        return records
+
+    light_patt = re.compile('^([a-z]+)Light', re.IGNORECASE)
+    linear_unit = om.MDistance.uiUnit()
+    angle_unit = om.MAngle.uiUnit()
+
+    sel = om.MSelectionList()
+    for lght in lights:
+        sel.add(lght)
+
+    for i in range(sel.length()):
+        shape_path = sel.getDagPath(i)
+        shape_fn = om.MFnDependencyNode(shape_path.node())
+        plug = lambda attr: shape_fn.findPlug(attr, False)
+
+        transform_path = om.MDagPath(shape_path)
+        transform_path.pop()
+        transform_fn = om.MFnTransform(transform_path)
+        light_transform = transform_path.fullPathName()
+
+        # naming, matching SceneLightNode._get_naming_details
+        record = SceneLightRecord(light_transform.rpartition('|')[-1])
+        record.path = str(light_transform.partition("|%s" % record.name)[0])
+
+        if light_patt.search(shape_fn.typeName):
+            record.type = str(light_patt.search(shape_fn.typeName).groups()[0]
+                                                                ).capitalize()
+
+        # transformations, in the same ui units xform queries return
+        translation = transform_fn.translation(om.MSpace.kTransform)
+        rotation = transform_fn.rotation()
+        record.position = _vector_dict(
+                        [om.MDistance(val).asUnits(linear_unit)
+                            for val in (translation.x, translation.y,
+                                        translation.z)])
+        record.rotation = _vector_dict(
+                        [om.MAngle(val).asUnits(angle_unit)
+                            for val in (rotation.x, rotation.y, rotation.z)])
+        record.scale = _vector_dict(transform_fn.scale())
+
+        record.color = _vector_dict([plug('colorR').asFloat(),
+                                     plug('colorG').asFloat(),
+                                     plug('colorB').asFloat()], 'rgb')
+        record.intensity = str(plug('intensity').asFloat())
+
+        if record.type.startswith('Spot'):
+            record.spot_angle = str(
+                    plug('coneAngle').asMAngle().asUnits(angle_unit))
+            record.range = '1'
+
+        if plug('useDepthMapShadows').asBool():
+            record.shadows = 'Soft'
+            record.shadow_resolution = str(plug('dmapResolution').asInt())
+            record.shadow_bias = str(plug('dmapBias').asFloat())
+            if plug('dmapFilterSize').asInt() <= 1:
+                record.shadows = 'Hard'
+
+        records.append(record)
+
+    return records
+
+
+# light shape attributes read from Maya ASCII files, with maya's defaults
+FILE_LIGHT_DEFAULTS = {'cr': 1.0, 'cg': 1.0, 'cb': 1.0, 'in': 1.0,
+                       'dms': 0, 'dr': 512, 'db': 0.001, 'df': 1, 'ca': 40.0}
+FILE_LIGHT_TYPES = ('spotLight', 'pointLight', 'directionalLight', 'areaLight')
+
+
+def file_light_track_types():
+    '''
+    get MayaAsciiReader track types needed by extract_file_light_records
+    '''
+    from VAD.MayaAsciiReader import MayaAsciiReader
+
+    track_types = {'transform': set(MayaAsciiReader.transform_attrs())}
+    for light_type in FILE_LIGHT_TYPES:
+        track_types[light_type] = set(FILE_LIGHT_DEFAULTS.keys() + ['cl'])
+
+    return track_types
+
+
+def _file_light_value(node, attr, angle_unit):
+    '''
+    get light attribute value read from file, falling back to maya default
+
+    :type   node: C{MayaAsciiNode}
+    :param  node: light shape node
+    :type   attr: C{str}
+    :param  attr: short attribute name
+    :type   angle_unit: C{str}
+    :param  angle_unit: angular unit of the file
+    '''
+    if attr in node.attrs:
+        value = node.attrs[attr][0]
+        if value in ('yes', 'true'):
+            return 1
+        if value in ('no', 'false'):
+            return 0
+        return value
+
+    # color channels are usually set together through the compound
+    if attr in ('cr', 'cg', 'cb') and 'cl' in node.attrs:
+        return node.attrs['cl']['rgb'.index(attr[-1])]
+
+    if attr == 'ca' and not angle_unit.startswith('deg'):
+        return math.radians(FILE_LIGHT_DEFAULTS[attr])
+
+    return FILE_LIGHT_DEFAULTS[attr]
+
+
+def extract_file_light_records(reader):
+    '''
+    gather details for all supported lights read from a Maya ASCII file,
+        providing the same details as extract_light_records without a
+        Maya session. Values are in the file's working units, as xform and
+        getAttr queries would return them.
+
+    :type   reader: C{MayaAsciiReader}
+    :param  reader: reader created with file_light_track_types that has
+                        already read its file
+    :return: C{list} of C{SceneLightRecord}
+    '''
+    light_patt = re.compile('^([a-z]+)Light', re.IGNORECASE)
+    records = []
+
+    for shape in reader.nodes_of_type(FILE_LIGHT_TYPES):
+        transform = reader.nodes.get(shape.parent)
+        if transform is None:
+            continue
+        value = lambda attr: _file_light_value(shape, attr, reader.angle_unit)
+
+        # naming, matching SceneLightNode._get_naming_details
+        record = SceneLightRecord(transform.name)
+        record.path = str(transform.path.partition("|%s" % record.name)[0])
+
+        if light_patt.search(shape.node_type):
+            record.type = str(light_patt.search(shape.node_type).groups()[0]
+                                                                ).capitalize()
+
+        record.position = _vector_dict(reader.get_vector(transform, 't'))
+        record.rotation = _vector_dict(reader.get_vector(transform, 'r'))
+        record.scale = _vector_dict(reader.get_vector(transform, 's'))
+
+        record.color = _vector_dict([value('cr'), value('cg'), value('cb')],
+                                    'rgb')
+        record.intensity = str(float(value('in')))
+
+        if record.type.startswith('Spot'):
+            record.spot_angle = str(float(value('ca')))
+            record.range = '1'
+
+        if value('dms'):
+            record.shadows = 'Soft'
+            record.shadow_resolution = str(int(value('dr')))
+            record.shadow_bias = str(float(value('db')))
+            if value('df') <= 1:
+                record.shadows = 'Hard'
+
+        records.append(record)
+
+    records.sort(key=lambda x: x.name)
+    return records
+
+
 class SceneLightNode(object):
     '''
     Maya light node in scene
@@ -0,0 +1,254 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Batch export of scene lights for many scene files in parallel worker
+    processes. Scenes are either opened in headless mayapy workers, or read
+    offline from Maya ASCII files without a Maya session, ie.
+
+    mayapy -m VAD.LightsToUBatch -b mayapy -o /tmp/lights /show/shots/*.mb
+    python -m VAD.LightsToUBatch -o /tmp/lights /show/shots/*.ma
+'''
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from VAD.LightsToU import LightsToU, Scene, SceneLights, \
+                    extract_file_light_records, file_light_track_types
+from VAD.MayaAsciiReader import MayaAsciiReader
+
+BACKENDS = ('offline', 'mayapy')
+FORMAT_EXTENSIONS = {'xml': 'xml', 'json': 'json', 'binary': 'bin'}
+SUMMARY_FILE = 'lights_export_summary.json'
+
+
+def _init_mayapy_worker():
+    '''
+    start a headless Maya session once per worker process
+    '''
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+
+
+def _scene_lights(scene_file, backend):
+    '''
+    collect scene details and lights of a scene file
+
+    :type   scene_file: C{str}
+    :param  scene_file: path to the scene file
+    :type   backend: C{str}
+    :param  backend: one of BACKENDS
+    '''
+    if backend == 'mayapy':
+        import maya.cmds as mc
+        mc.file(scene_file, open=True, force=True)
+        return Scene(), SceneLights().lights
+
+    if not scene_file.lower().endswith('.ma'):
+        raise ValueError('Offline export only reads Maya ASCII files: %s'
+                                                                % scene_file)
+
+    reader = MayaAsciiReader(scene_file, file_light_track_types()).read()
+    return Scene(scene_file), extract_file_light_records(reader)
+
+
+def output_path(scene_file, output_dir=None, output_format='xml'):
+    '''
+    get light set file path written for a scene file
+
+    :type   scene_file: C{str}
+    :param  scene_file: path to the scene file
+    :type   output_dir: C{str}
+    :param  output_dir: *OPTIONAL* directory to write into, defaults to the
+                            scene's directory
+    :type   output_format: C{str}
+    :param  output_format: one of LightsToU.OUTPUT_FORMATS
+    '''
+    scene_dir, scene_name = os.path.split(scene_file)
+    return os.path.join(output_dir or scene_dir, '%s_lights.%s'
+                                % (os.path.splitext(scene_name)[0],
+                                   FORMAT_EXTENSIONS[output_format]))
+
+
+def export_scene(scene_file, output_dir=None, backend='offline',
+                 output_format='xml', overwrite=False):
+    '''
+    export lights of a single scene file
+
+    :type   scene_file: C{str}
+    :param  scene_file: path to the scene file
+    :type   output_dir: C{str}
+    :param  output_dir: *OPTIONAL* directory to write into, defaults to the
+                            scene's directory
+    :type   backend: C{str}
+    :param  backend: one of BACKENDS
+    :type   output_format: C{str}
+    :param  output_format: one of LightsToU.OUTPUT_FORMATS
+    :type   overwrite: C{bool}
+    :param  overwrite: replace previously exported file
+    :return: C{dict} report, 'error' is set if the scene could not be exported
+    '''
+    report = {'scene': scene_file, 'output': None, 'lights': 0,
+              'error': None}
+    start = time.time()
+
+    try:
+        scene, lights = _scene_lights(scene_file, backend)
+        report['lights'] = len(lights)
+
+        lights_to_u = LightsToU(output_format=output_format)
+        lights_to_u.process_scene_details(scene)
+        lights_to_u.process_lights(lights)
+
+        out_path = output_path(scene_file, output_dir, output_format)
+        if overwrite and os.path.isfile(out_path):
+            os.remove(out_path)
+        lights_to_u.xml_path = out_path
+        lights_to_u.write()
+        report['output'] = out_path
+    except Exception, e:
+        report['error'] = "%s\n%s" % (e, traceback.format_exc())
+
+    report['seconds'] = time.time() - start
+    return report
+
+
+def _export_scene_star(args):
+    '''
+    unpack arguments for process pool usage
+    '''
+    return export_scene(*args)
+
+
+def summarize(reports, seconds=None):
+    '''
+    build summary of timings and failures for a batch of reports
+
+    :type   reports: C{list}
+    :param  reports: reports returned by export_scene
+    :type   seconds: C{float}
+    :param  seconds: *OPTIONAL* wall clock time of the whole batch
+    '''
+    failed = [report for report in reports if report['error']]
+    scene_seconds = [report['seconds'] for report in reports]
+
+    return {'scenes': len(reports),
+            'exported': len(reports) - len(failed),
+            'failed': [{'scene': report['scene'], 'error': report['error']}
+                                                        for report in failed],
+            'lights': sum([report['lights'] for report in reports]),
+            'seconds': seconds,
+            'scene_seconds': sum(scene_seconds),
+            'slowest': max(reports, key=lambda x: x['seconds'])['scene']
+                                                        if reports else None,
+            'reports': sorted(reports, key=lambda x: x['scene'])}
+
+
+def export_scenes(scene_files, output_dir=None, backend='offline',
+                  processes=None, output_format='xml', overwrite=False):
+    '''
+    export lights of multiple scene files in parallel with a process pool
+
+    :type   scene_files: C{list}
+    :param  scene_files: list of scene files
+    :type   output_dir: C{str}
+    :param  output_dir: *OPTIONAL* directory to write into, defaults to each
+                            scene's directory
+    :type   backend: C{str}
+    :param  backend: one of BACKENDS
+    :type   processes: C{int}
+    :param  processes: *OPTIONAL* number of worker processes, defaults to
+                        the cpu count
+    :type   output_format: C{str}
+    :param  output_format: one of LightsToU.OUTPUT_FORMATS
+    :type   overwrite: C{bool}
+    :param  overwrite: replace previously exported files
+    :return: C{dict} summary of timings and failures
+    '''
+    if backend not in BACKENDS:
+        raise ValueError('Unsupported backend: %s. Use one of: %s.'
+                                            % (backend, ', '.join(BACKENDS)))
+
+    reports = []
+    start = time.time()
+    pool = multiprocessing.Pool(processes=processes,
+                    initializer=_init_mayapy_worker if backend == 'mayapy'
+                                                                else None)
+    try:
+        for report in pool.imap_unordered(_export_scene_star,
+                                [(scene_file, output_dir, backend,
+                                  output_format, overwrite)
+                                            for scene_file in scene_files]):
+            status = 'FAILED' if report['error'] else \
+                                                '%d lights' % report['lights']
+            print '%s: %s (%.2fs)' % (report['scene'], status,
+                                                        report['seconds'])
+            reports.append(report)
+    finally:
+        pool.close()
+        pool.join()
+
+    summary = summarize(reports, time.time() - start)
+    if output_dir:
+        with open(os.path.join(output_dir, SUMMARY_FILE), 'w') as summary_file:
+            json.dump(summary, summary_file, indent=2, sort_keys=True)
+
+    return summary
+
+
+def main(argv=None):
+    '''
+    command line entry point
+    '''
+    parser = argparse.ArgumentParser(
+                description="Export scene lights of many scene files.")
+    parser.add_argument('files', nargs='+',
+                        help="scene files or glob patterns to export")
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help="directory to write light sets and summary into, "
+                             + "defaults to each scene's directory")
+    parser.add_argument('-b', '--backend', choices=BACKENDS,
+                        default='offline',
+                        help="open scenes in mayapy or read .ma files offline")
+    parser.add_argument('-f', '--format', choices=LightsToU.OUTPUT_FORMATS,
+                        default='xml', help="light set file format")
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument('--overwrite', action='store_true',
+                        help="replace previously exported light sets")
+    args = parser.parse_args(argv)
+
+    scene_files = []
+    for pattern in args.files:
+        scene_files.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    if args.output_dir and not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    summary = export_scenes(scene_files, args.output_dir, args.backend,
+                            args.processes, args.format, args.overwrite)
+
+    print '%d of %d scenes exported, %d lights in %.2fs' \
+                        % (summary['exported'], summary['scenes'],
+                           summary['lights'], summary['seconds'])
+    for failed in summary['failed']:
+        print 'FAILED %s: %s' % (failed['scene'],
+                                 failed['error'].splitlines()[0])
+
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
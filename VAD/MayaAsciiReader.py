@@ -0,0 +1,534 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Streaming reader for Maya ASCII (.ma) files that works without a Maya
+    session. Only createNode / setAttr statements of tracked node types are
+    kept; everything else, including large mesh data blocks, is skipped line
+    by line so the file is never held in memory whole.
+'''
+
+import math
+import re
+import shlex
+
+# node types treated as geometry, mirroring ls(geometry=True)
+GEOMETRY_TYPES = ('mesh', 'nurbsSurface', 'nurbsCurve', 'subdiv')
+
+# transform attribute short names, with their long name aliases
+TRANSFORM_ATTRS = {'t': 'translate', 'r': 'rotate', 's': 'scale',
+                   'ro': 'rotateOrder', 'ra': 'rotateAxis',
+                   'rp': 'rotatePivot', 'sp': 'scalePivot',
+                   'rpt': 'rotatePivotTranslate',
+                   'spt': 'scalePivotTranslate'}
+
+_VECTOR_DEFAULTS = {'t': (0.0, 0.0, 0.0), 'r': (0.0, 0.0, 0.0),
+                    's': (1.0, 1.0, 1.0), 'ra': (0.0, 0.0, 0.0),
+                    'rp': (0.0, 0.0, 0.0), 'sp': (0.0, 0.0, 0.0),
+                    'rpt': (0.0, 0.0, 0.0), 'spt': (0.0, 0.0, 0.0)}
+
+# rotate order enum values, listed in order rotations are applied
+_ROTATE_ORDERS = ('xyz', 'yzx', 'zxy', 'xzy', 'yxz', 'zyx')
+
+_QUOTED_PATT = re.compile('"([^"]*)"')
+
+
+class MayaAsciiNode(object):
+    '''
+    node record collected from a Maya ASCII file
+    '''
+    __slots__ = ('name', 'path', 'node_type', 'parent', 'attrs')
+
+    def __init__(self, name, path, node_type, parent=None):
+        '''
+        initialize instance variables
+
+        :type   name: C{str}
+        :param  name: short node name
+        :type   path: C{str}
+        :param  path: full dag path for dag nodes, otherwise the node name
+        :type   node_type: C{str}
+        :param  node_type: maya node type, ie. "transform"
+        :type   parent: C{str}
+        :param  parent: full dag path of parent node, if any
+        '''
+        self.name = name
+        self.path = path
+        self.node_type = node_type
+        self.parent = parent
+        self.attrs = {}
+
+    def __repr__(self):
+        return "%s(%r, %r)" % (self.__class__.__name__,
+                               self.path, self.node_type)
+
+
+class MayaAsciiReader(object):
+    '''
+    Collects node hierarchies and attribute values from a Maya ASCII file
+    '''
+    def __init__(self, ma_path, track_types=None):
+        '''
+        initialize instance variables
+
+        :type   ma_path: C{str}
+        :param  ma_path: path to the .ma file to read
+        :type   track_types: C{dict}
+        :param  track_types: *OPTIONAL* node type mapped to the set of short
+                        attribute names to collect for it, an empty set keeps
+                        only the node. Defaults to transforms and geometry.
+        '''
+        self._ma_path = ma_path
+        self._track_types = track_types
+        if self._track_types is None:
+            self._track_types = {'transform': set(self.transform_attrs())}
+            for geo_type in GEOMETRY_TYPES:
+                self._track_types[geo_type] = set()
+
+        self._nodes = {}
+        self._short_names = {}
+        self._current = None
+        self._linear_unit = 'centimeter'
+        self._angle_unit = 'degree'
+
+    @staticmethod
+    def transform_attrs():
+        '''
+        get list of transform attribute names understood for world
+            position calculations, including the per axis children
+        '''
+        attrs = TRANSFORM_ATTRS.keys()
+        for attr in TRANSFORM_ATTRS.keys():
+            if attr == 'ro':
+                continue
+            attrs.extend(['%s%s' % (attr, axis) for axis in 'xyz'])
+
+        return attrs
+
+    @property
+    def ma_path(self):
+        '''
+        get path to the file being read
+        '''
+        return self._ma_path
+
+    @property
+    def nodes(self):
+        '''
+        get dict of collected nodes keyed by full path
+        '''
+        return self._nodes
+
+    @property
+    def linear_unit(self):
+        '''
+        get linear working unit declared by the file
+        '''
+        return self._linear_unit
+
+    @property
+    def angle_unit(self):
+        '''
+        get angular working unit declared by the file
+        '''
+        return self._angle_unit
+
+    def nodes_of_type(self, node_types):
+        '''
+        get list of collected nodes matching specified type(s)
+
+        :type   node_types: C{str} or C{list}
+        :param  node_types: node type or list of types to match
+        '''
+        if isinstance(node_types, basestring):
+            node_types = [node_types]
+
+        return [node for node in self._nodes.itervalues()
+                                        if node.node_type in node_types]
+
+    def read(self):
+        '''
+        stream through the file collecting tracked nodes and attributes
+        '''
+        buf = []
+        skipping = False
+
+        with open(self._ma_path, 'r') as ma_file:
+            for line in ma_file:
+                ends = line.rstrip().endswith(';')
+
+                if skipping:
+                    skipping = not ends
+                    continue
+
+                if buf:
+                    buf.append(line)
+                    if ends:
+                        self._process_statement(''.join(buf))
+                        buf = []
+                    continue
+
+                stripped = line.strip()
+                if not stripped or stripped.startswith('//'):
+                    continue
+
+                if not self._wants_statement(stripped):
+                    skipping = not ends
+                    continue
+
+                if ends:
+                    self._process_statement(stripped)
+                else:
+                    buf.append(line)
+
+        self._current = None
+        return self
+
+    def _wants_statement(self, first_line):
+        '''
+        determine from the first line of a statement whether it should be
+            collected, so large unwanted blocks never get buffered
+
+        :type   first_line: C{str}
+        :param  first_line: first line of the statement
+        '''
+        command = first_line.split(None, 1)[0]
+        if command in ('createNode', 'select', 'currentUnit'):
+            return True
+        if command != 'setAttr':
+            return False
+
+        found = _QUOTED_PATT.search(first_line)
+        if not found:
+            return False
+
+        node, attr = self._split_plug(found.group(1))
+        if node is None or node.node_type not in self._track_types:
+            return False
+
+        return attr in self._track_types[node.node_type]
+
+    def _split_plug(self, plug):
+        '''
+        resolve a setAttr plug into the tracked node and short attribute name
+
+        :type   plug: C{str}
+        :param  plug: plug as written in the file, ie. ".t" or "node.t"
+        '''
+        node_name, _, attr = plug.rpartition('.')
+        if node_name:
+            node = self._resolve_node(node_name)
+        else:
+            node = self._current
+
+        # map any long attribute names to short names, longest first so
+        #   "rotatePivot" is not taken as "rotate"
+        for short, long_name in sorted(TRANSFORM_ATTRS.iteritems(),
+                                       key=lambda x: -len(x[1])):
+            if attr.startswith(long_name) \
+                        and attr[len(long_name):] in ('', 'X', 'Y', 'Z'):
+                attr = short + attr[len(long_name):].lower()
+                break
+
+        return node, attr
+
+    def _resolve_node(self, name):
+        '''
+        locate collected node from a full, partial or short dag name
+
+        :type   name: C{str}
+        :param  name: node name as written in the file
+        '''
+        if name in self._nodes:
+            return self._nodes[name]
+
+        short = name.rpartition('|')[-1]
+        for path in self._short_names.get(short, []):
+            if path == name or path.endswith('|' + name):
+                return self._nodes[path]
+
+        return None
+
+    def _process_statement(self, statement):
+        '''
+        dispatch a complete statement to its handler
+
+        :type   statement: C{str}
+        :param  statement: full mel statement, including trailing ";"
+        '''
+        try:
+            tokens = shlex.split(statement.strip().rstrip(';'))
+        except ValueError:
+            return
+        if not tokens:
+            return
+
+        if tokens[0] == 'createNode':
+            self._create_node(tokens[1:])
+        elif tokens[0] == 'select':
+            self._select_node(tokens[1:])
+        elif tokens[0] == 'setAttr':
+            self._set_attr(tokens[1:])
+        elif tokens[0] == 'currentUnit':
+            self._current_unit(tokens[1:])
+
+    @staticmethod
+    def _flag_values(args, flags):
+        '''
+        collect values of specified single value flags from argument list
+
+        :type   args: C{list}
+        :param  args: command arguments
+        :type   flags: C{list}
+        :param  flags: flag names to collect, ie. ["-n", "-p"]
+        '''
+        found = {}
+        for i, arg in enumerate(args[:-1]):
+            if arg in flags:
+                found[arg] = args[i + 1]
+
+        return found
+
+    def _create_node(self, args):
+        '''
+        handle createNode statement
+
+        :type   args: C{list}
+        :param  args: createNode arguments
+        '''
+        self._current = None
+        if not args or args[0] not in self._track_types:
+            return
+
+        flags = self._flag_values(args, ['-n', '-p'])
+        name = flags.get('-n', args[0])
+        parent = None
+        if '-p' in flags:
+            parent_node = self._resolve_node(flags['-p'])
+            parent = parent_node.path if parent_node else flags['-p']
+
+        path = "%s|%s" % (parent or '', name)
+        node = MayaAsciiNode(name, path, args[0], parent)
+        self._nodes[path] = node
+        self._short_names.setdefault(name, []).append(path)
+        self._current = node
+
+    def _select_node(self, args):
+        '''
+        handle select statement, which changes the node setAttr applies to
+
+        :type   args: C{list}
+        :param  args: select arguments
+        '''
+        names = [arg for arg in args if not arg.startswith('-')]
+        self._current = self._resolve_node(names[0]) if names else None
+
+    def _set_attr(self, args):
+        '''
+        handle setAttr statement for a tracked node attribute
+
+        :type   args: C{list}
+        :param  args: setAttr arguments
+        '''
+        values = []
+        node = attr = None
+        skip_next = False
+        for arg in args:
+            if skip_next:
+                skip_next = False
+                continue
+            if arg in ('-k', '-l', '-cb', '-s', '-type', '-av', '-ch'):
+                # flags followed by a value
+                skip_next = arg not in ('-av',)
+                continue
+            if node is None and attr is None:
+                node, attr = self._split_plug(arg)
+                continue
+            values.append(arg)
+
+        if node is None or not values:
+            return
+
+        try:
+            node.attrs[attr] = [float(val) for val in values]
+        except ValueError:
+            node.attrs[attr] = values
+
+    def _current_unit(self, args):
+        '''
+        handle currentUnit statement declaring the file's working units
+
+        :type   args: C{list}
+        :param  args: currentUnit arguments
+        '''
+        flags = self._flag_values(args, ['-l', '-a'])
+        self._linear_unit = flags.get('-l', self._linear_unit)
+        self._angle_unit = flags.get('-a', self._angle_unit)
+
+    def get_vector(self, node, attr):
+        '''
+        get three value transform attribute, combining compound and per
+            axis values on top of the attribute default
+
+        :type   node: C{MayaAsciiNode}
+        :param  node: node to get attribute value from
+        :type   attr: C{str}
+        :param  attr: short attribute name, ie. "t"
+        '''
+        vector = list(node.attrs.get(attr, _VECTOR_DEFAULTS[attr])[:3])
+        for i, axis in enumerate('xyz'):
+            if '%s%s' % (attr, axis) in node.attrs:
+                vector[i] = node.attrs['%s%s' % (attr, axis)][0]
+
+        return vector
+
+    def local_matrix(self, node):
+        '''
+        build local transformation matrix of a transform node, following
+            maya's order of -sp * s * sp * spt * -rp * ra * r * rp * rpt * t.
+            Shear is not taken into account.
+
+        :type   node: C{MayaAsciiNode}
+        :param  node: transform node
+        '''
+        vec = lambda attr: self.get_vector(node, attr)
+        rotate_order = _ROTATE_ORDERS[int(node.attrs.get('ro', [0])[0])]
+        neg = lambda vals: [-val for val in vals]
+
+        matrices = [_translate_matrix(neg(vec('sp'))),
+                    _scale_matrix(vec('s')),
+                    _translate_matrix(vec('sp')),
+                    _translate_matrix(vec('spt')),
+                    _translate_matrix(neg(vec('rp'))),
+                    self._rotate_matrix(vec('ra'), 'xyz'),
+                    self._rotate_matrix(vec('r'), rotate_order),
+                    _translate_matrix(vec('rp')),
+                    _translate_matrix(vec('rpt')),
+                    _translate_matrix(vec('t'))]
+
+        return reduce(_mult_matrix, matrices)
+
+    def _rotate_matrix(self, angles, rotate_order):
+        '''
+        build rotation matrix in the file's angular units
+
+        :type   angles: C{list}
+        :param  angles: x, y, z rotation values
+        :type   rotate_order: C{str}
+        :param  rotate_order: order rotations are applied, ie. "xyz"
+        '''
+        if self._angle_unit.startswith('deg'):
+            angles = [math.radians(val) for val in angles]
+
+        matrix = _identity_matrix()
+        for axis in rotate_order:
+            index = 'xyz'.index(axis)
+            matrix = _mult_matrix(matrix, _axis_matrix(index, angles[index]))
+
+        return matrix
+
+    def world_matrix(self, path):
+        '''
+        build world transformation matrix by walking up node's parent chain
+
+        :type   path: C{str}
+        :param  path: full path of the transform node
+        '''
+        matrix = _identity_matrix()
+        node = self._nodes.get(path)
+        while node is not None:
+            if node.node_type == 'transform':
+                matrix = _mult_matrix(matrix, self.local_matrix(node))
+            node = self._nodes.get(node.parent) if node.parent else None
+
+        return matrix
+
+    def world_pivots(self, path):
+        '''
+        get world space rotate and scale pivots of a transform node, matching
+            the values of xform(query=True, worldSpace=True, pivots=True)
+
+        :type   path: C{str}
+        :param  path: full path of the transform node
+        '''
+        node = self._nodes[path]
+        parent_matrix = self.world_matrix(node.parent) \
+                                    if node.parent else _identity_matrix()
+
+        # rotation happens about the rotate pivot in the parent's space
+        rotate_pivot = [sum(vals) for vals in zip(self.get_vector(node, 'rp'),
+                                                  self.get_vector(node, 'rpt'),
+                                                  self.get_vector(node, 't'))]
+        scale_pivot = _mult_point(self.get_vector(node, 'sp'),
+                                  self.local_matrix(node))
+
+        return _mult_point(rotate_pivot, parent_matrix) \
+                                    + _mult_point(scale_pivot, parent_matrix)
+
+
+def _identity_matrix():
+    '''
+    4x4 identity matrix
+    '''
+    return [[1.0 if row == col else 0.0 for col in range(4)]
+                                                        for row in range(4)]
+
+
+def _translate_matrix(vals):
+    '''
+    4x4 translation matrix, row vector convention
+    '''
+    matrix = _identity_matrix()
+    matrix[3][:3] = vals
+    return matrix
+
+
+def _scale_matrix(vals):
+    '''
+    4x4 scale matrix
+    '''
+    matrix = _identity_matrix()
+    for i in range(3):
+        matrix[i][i] = vals[i]
+    return matrix
+
+
+def _axis_matrix(index, angle):
+    '''
+    4x4 rotation matrix about a single axis, row vector convention
+
+    :type   index: C{int}
+    :param  index: axis index, 0 = x, 1 = y, 2 = z
+    :type   angle: C{float}
+    :param  angle: rotation in radians
+    '''
+    cos, sin = math.cos(angle), math.sin(angle)
+    first, second = (index + 1) % 3, (index + 2) % 3
+    matrix = _identity_matrix()
+    matrix[first][first] = cos
+    matrix[second][second] = cos
+    matrix[first][second] = sin
+    matrix[second][first] = -sin
+    return matrix
+
+
+def _mult_matrix(mat_a, mat_b):
+    '''
+    multiply two 4x4 matrices
+    '''
+    return [[sum([mat_a[row][i] * mat_b[i][col] for i in range(4)])
+                                for col in range(4)] for row in range(4)]
+
+
+def _mult_point(point, matrix):
+    '''
+    transform a 3d point by a 4x4 matrix, row vector convention
+    '''
+    return [sum([point[i] * matrix[i][col] for i in range(3)])
+                                        + matrix[3][col] for col in range(3)]
@@ -0,0 +1,364 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Maya independent spatial hash of asset pivots, used for locating assets
+    that share the same world space position
+'''
+
+import array
+import math
+import re
+
+# legal asset group nodes carry this token in their short name
+ASSET_GRP_PATTERN = re.compile("_GRP_")
+
+
+def is_asset_node(node_path):
+    '''
+    check if the node is a legal asset group node based on its short name
+
+    :type   node_path: C{str}
+    :param  node_path: full or short dag path of node
+    '''
+    return bool(ASSET_GRP_PATTERN.search(node_path.rpartition("|")[-1]))
+
+
+def is_at_origin(t_pivot, tolerance=0.0):
+    '''
+    check if the asset's position is located at the origin
+
+    :type   t_pivot: C{list}
+    :param  t_pivot: world space pivot values, only the first three
+                        (rotate pivot x, y, z) are checked
+    :type   tolerance: C{float}
+    :param  tolerance: distance from origin still considered to be at origin,
+                        0.0 requires an exact match
+    '''
+    if tolerance > 0:
+        return _distance(t_pivot[:3], (0.0, 0.0, 0.0)) <= tolerance
+
+    found = 0
+    for i in range(3):
+        if t_pivot[i] == 0:
+            found += 1
+
+    if found == 3:
+        return True
+
+    return False
+
+
+def _distance(point_a, point_b):
+    '''
+    euclidean distance between two points of equal length
+
+    :type   point_a: C{list}
+    :param  point_a: first point
+    :type   point_b: C{list}
+    :param  point_b: second point
+    '''
+    return math.sqrt(sum([(point_a[i] - point_b[i]) ** 2
+                                            for i in range(len(point_a))]))
+
+
+class PositionIndex(object):
+    '''
+    Compact hash of asset pivots. Each pivot is read once and stored in a
+        flat array of doubles, while assets are bucketed on their pivot values
+        so duplicate groups can be found without comparing every asset
+        against every other asset.
+
+    With a tolerance the buckets become a uniform grid keyed on the rotate
+        pivot quantized to the tolerance, and only assets in neighbouring
+        cells are compared.
+    '''
+    PIVOT_SIZE = 6 # rotate pivot x,y,z + scale pivot x,y,z
+
+    def __init__(self, tolerance=0.0):
+        '''
+        initialize instance variables
+
+        :type   tolerance: C{float}
+        :param  tolerance: max distance between pivots for assets to be
+                            considered co-located, 0.0 requires an exact match
+        '''
+        self._tolerance = float(tolerance or 0.0)
+        self._names = []
+        self._pivots = array.array('d')
+        self._buckets = {}
+        self._slots = {}
+        self._free_slots = []
+
+    def __len__(self):
+        '''
+        get number of assets currently indexed
+        '''
+        return len(self._slots)
+
+    def __contains__(self, name):
+        '''
+        check if asset is currently indexed
+        '''
+        return name in self._slots
+
+    @property
+    def tolerance(self):
+        '''
+        get max distance between pivots for assets to be co-located
+        '''
+        return self._tolerance
+
+    @property
+    def names(self):
+        '''
+        get list of indexed asset names
+        '''
+        return [name for name in self._names if name is not None]
+
+    def pivots(self, slot):
+        '''
+        get stored pivot values for specified index slot
+
+        :type   slot: C{int}
+        :param  slot: index position of asset
+        '''
+        start = slot * self.PIVOT_SIZE
+        return self._pivots[start:start + self.PIVOT_SIZE]
+
+    def add(self, name, pivots):
+        '''
+        add asset and its world space pivots to the index
+
+        :type   name: C{str}
+        :param  name: asset name, typically full dag path
+        :type   pivots: C{list}
+        :param  pivots: world space pivot values as returned by
+                            xform(query=True, worldSpace=True, pivots=True)
+        '''
+        if name in self._slots:
+            self.remove(name)
+
+        values = [float(val) for val in pivots[:self.PIVOT_SIZE]]
+        # pad out missing scale pivot values so slots stay aligned
+        values += [0.0] * (self.PIVOT_SIZE - len(values))
+
+        # reuse slots freed by removed assets before growing the array
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._names[slot] = name
+            start = slot * self.PIVOT_SIZE
+            self._pivots[start:start + self.PIVOT_SIZE] = \
+                                                    array.array('d', values)
+        else:
+            slot = len(self._names)
+            self._names.append(name)
+            self._pivots.extend(values)
+
+        self._slots[name] = slot
+        self._buckets.setdefault(self._hash_key(values), []).append(slot)
+
+        return slot
+
+    def update(self, name, pivots):
+        '''
+        move an indexed asset to new pivots, adding it if not yet indexed
+
+        :type   name: C{str}
+        :param  name: asset name, typically full dag path
+        :type   pivots: C{list}
+        :param  pivots: new world space pivot values
+        '''
+        return self.add(name, pivots)
+
+    def remove(self, name):
+        '''
+        remove asset from the index, if indexed
+
+        :type   name: C{str}
+        :param  name: asset name to remove
+        '''
+        slot = self._slots.pop(name, None)
+        if slot is None:
+            return
+
+        key = self._hash_key(self.pivots(slot))
+        bucket = self._buckets[key]
+        bucket.remove(slot)
+        if not bucket:
+            del self._buckets[key]
+
+        self._names[slot] = None
+        self._free_slots.append(slot)
+
+    def _hash_key(self, values):
+        '''
+        build bucket key from pivot values. Without a tolerance the exact
+            float values are used so results match an element by element
+            equality test, otherwise the rotate pivot's grid cell is used
+
+        :type   values: C{list}
+        :param  values: pivot values to build key from
+        '''
+        if self._tolerance > 0:
+            return tuple([int(math.floor(val / self._tolerance))
+                                                    for val in values[:3]])
+
+        # adding 0.0 folds -0.0 into 0.0, matching == comparison
+        return tuple([val + 0.0 for val in values])
+
+    def _neighbour_keys(self, key):
+        '''
+        get keys of the grid cell and all cells surrounding it
+
+        :type   key: C{tuple}
+        :param  key: grid cell key
+        '''
+        offsets = (-1, 0, 1)
+        return [(key[0] + ox, key[1] + oy, key[2] + oz)
+                    for ox in offsets for oy in offsets for oz in offsets]
+
+    def _is_near(self, slot_a, slot_b):
+        '''
+        determine if both rotate and scale pivots of two slots are
+            within tolerance of each other, returning rotate pivot distance
+
+        :type   slot_a: C{int}
+        :param  slot_a: index position of first asset
+        :type   slot_b: C{int}
+        :param  slot_b: index position of second asset
+        '''
+        pivots_a = self.pivots(slot_a)
+        pivots_b = self.pivots(slot_b)
+
+        rp_dist = _distance(pivots_a[:3], pivots_b[:3])
+        if rp_dist > self._tolerance:
+            return None
+        if _distance(pivots_a[3:], pivots_b[3:]) > self._tolerance:
+            return None
+
+        return rp_dist
+
+    def _cluster_slots(self):
+        '''
+        group slots of co-located assets together, returning list of slot
+            lists. Exact buckets are already the groups, while tolerance
+            buckets are joined through neighbour cells with a union find
+        '''
+        if self._tolerance <= 0:
+            return [slots for slots in self._buckets.itervalues()
+                                                            if len(slots) > 1]
+
+        parents = {}
+
+        def find(slot):
+            root = slot
+            while parents[root] != root:
+                root = parents[root]
+            # compress path for later lookups
+            while slot != root:
+                parents[slot], slot = root, parents[slot]
+            return root
+
+        for key, slots in self._buckets.iteritems():
+            candidates = []
+            for nkey in self._neighbour_keys(key):
+                candidates.extend(self._buckets.get(nkey, []))
+
+            for slot_a in slots:
+                for slot_b in candidates:
+                    if slot_b <= slot_a:
+                        continue
+                    if self._is_near(slot_a, slot_b) is None:
+                        continue
+                    parents.setdefault(slot_a, slot_a)
+                    parents.setdefault(slot_b, slot_b)
+                    root_a, root_b = find(slot_a), find(slot_b)
+                    if root_a != root_b:
+                        parents[max(root_a, root_b)] = min(root_a, root_b)
+
+        groups = {}
+        for slot in parents.keys():
+            groups.setdefault(find(slot), []).append(slot)
+
+        return [sorted(slots) for slots in groups.itervalues()]
+
+    def clusters(self):
+        '''
+        get list of co-located asset clusters. Each cluster is a dict with
+            'members', 'distances' (rotate pivot distance of each member
+            from the first member) and 'max_distance'
+        '''
+        clusters = []
+        for slots in self._cluster_slots():
+            anchor = self.pivots(slots[0])[:3]
+            distances = [_distance(anchor, self.pivots(slot)[:3])
+                                                            for slot in slots]
+            clusters.append({'members': [self._names[slot] for slot in slots],
+                             'distances': distances,
+                             'max_distance': max(distances)})
+
+        clusters.sort(key=lambda x: x['members'])
+        return clusters
+
+    def duplicate_groups(self):
+        '''
+        get list of asset name groups, where each group contains assets
+            that share the same world space pivots
+        '''
+        return [cluster['members'] for cluster in self.clusters()]
+
+
+def find_duplicate_positions(asset_pivots, tolerance=0.0):
+    '''
+    locate assets with duplicate world space positions or sitting at origin
+
+    :type   asset_pivots: C{iterable}
+    :param  asset_pivots: iterable of (asset name, world space pivots) pairs
+    :type   tolerance: C{float}
+    :param  tolerance: max distance between pivots to still be considered
+                        a duplicate, 0.0 requires an exact match
+    :return: C{dict} with 'ws_dupes' and 'origin' asset lists, as well as
+                'clusters' of co-located assets with their distances
+    '''
+    origin = []
+    index = PositionIndex(tolerance)
+
+    for asset, apivots in asset_pivots:
+        # assets at origin are reported separately and never compared
+        if is_at_origin(apivots, tolerance):
+            origin.append(asset)
+            continue
+
+        index.add(asset, apivots)
+
+    return duplicate_results(index, origin)
+
+
+def duplicate_results(index, origin):
+    '''
+    build duplicate position results from a filled index
+
+    :type   index: C{PositionIndex}
+    :param  index: index of assets not sitting at origin
+    :type   origin: C{list}
+    :param  origin: assets found sitting at origin
+    :return: C{dict} with 'ws_dupes', 'origin' and 'clusters' results
+    '''
+    found_positions = {'ws_dupes': [], 'origin': list(origin), 'clusters': []}
+
+    found_positions['clusters'] = index.clusters()
+    for cluster in found_positions['clusters']:
+        found_positions['ws_dupes'].extend(cluster['members'])
+
+    # clean up list of found assets to eliminate duplicate assets in lists
+    found_positions['origin'] = list(set(found_positions['origin']))
+    found_positions['ws_dupes'] = list(set(found_positions['ws_dupes']))
+
+    return found_positions
@@ -10,10 +10,13 @@
 
 import maya.cmds as mc
 
+import errno
 import os
 import re
 import shutil
 import sys
+import time
+from multiprocessing.pool import ThreadPool
 
 apath = "B:/home/johnz/scripts/jbtools"
 if apath not in sys.path:
@@ -21,6 +24,171 @@ if apath not in sys.path:
 
 # VAD
 from mayatools.VAD import ddConstants
+from VAD.PublishCatalog import PublishCatalog
+from VAD.PublishStaging import StagedPublish
+
+
+class PublishVersionIndex(object):
+    '''
+    index of published versions of a file, built from a single listing of
+        each directory. Versions are reserved with lock files created
+        exclusively, so publishers racing for the next version never get
+        the same one.
+    '''
+    LOCK_EXT = 'lock'
+    STALE_LOCK_SECONDS = 6 * 60 * 60
+
+    def __init__(self, pub_dir, file_name, pub_ext, extra_dirs=None):
+        '''
+        initialize instance variables
+
+        :type   pub_dir: C{str}
+        :param  pub_dir: publish directory, where reservations are made
+        :type   file_name: C{str}
+        :param  file_name: publish file name prefix
+        :type   pub_ext: C{str}
+        :param  pub_ext: publish file extension, no "."
+        :type   extra_dirs: C{list}
+        :param  extra_dirs: *OPTIONAL* other directories holding versions,
+                                ie. the archive directory
+        '''
+        self._pub_dir = pub_dir
+        self._file_name = file_name
+        self._pub_ext = pub_ext
+        self._extra_dirs = extra_dirs or []
+        self._pattern = re.compile("^%s_v([0-9]{3,})\\.%s(\\.%s)?$"
+                                    % (re.escape(file_name), re.escape(pub_ext),
+                                       self.LOCK_EXT))
+        self._versions = None
+        self._reserved = []
+
+    @property
+    def versions(self):
+        '''
+        get sorted list of published and reserved version numbers
+        '''
+        if self._versions is None:
+            self.refresh()
+
+        return self._versions
+
+    @property
+    def latest(self):
+        '''
+        get highest published or reserved version number, 0 if none
+        '''
+        return self.versions[-1] if self.versions else 0
+
+    def version_file(self, version, lock=False):
+        '''
+        get file name of a version
+
+        :type   version: C{int}
+        :param  version: version number
+        :type   lock: C{bool}
+        :param  lock: get the reservation lock file name instead
+        '''
+        pub_file = '%s_v%03d.%s' % (self._file_name, version, self._pub_ext)
+        if lock:
+            pub_file = '%s.%s' % (pub_file, self.LOCK_EXT)
+
+        return pub_file
+
+    def refresh(self):
+        '''
+        list directories again and parse all version files
+        '''
+        versions = set()
+        now = time.time()
+        for pub_dir in [self._pub_dir] + self._extra_dirs:
+            if not os.path.isdir(pub_dir):
+                continue
+
+            for pub_file in os.listdir(pub_dir):
+                match = self._pattern.match(pub_file)
+                if not match:
+                    continue
+
+                # locks left behind by crashed publishes stop counting
+                if match.group(2) and now - os.path.getmtime(os.path.join(
+                            pub_dir, pub_file)) > self.STALE_LOCK_SECONDS:
+                    continue
+
+                versions.add(int(match.group(1)))
+
+        self._versions = sorted(versions)
+
+    def reserve(self, version):
+        '''
+        reserve a version by exclusively creating its lock file, unless
+            the version already exists in any of the directories
+
+        :type   version: C{int}
+        :param  version: version number
+        :return: C{bool} True if the version was reserved
+        '''
+        lock_path = os.path.join(self._pub_dir,
+                                 self.version_file(version, lock=True))
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+            return False
+
+        for pub_dir in [self._pub_dir] + self._extra_dirs:
+            if os.path.isfile(os.path.join(pub_dir,
+                                           self.version_file(version))):
+                # published since the directory was listed, or archived
+                os.remove(lock_path)
+                return False
+
+        self._reserved.append(version)
+        return True
+
+    def reserve_from(self, version):
+        '''
+        reserve first free version from a version on, without listing the
+            directories
+
+        :type   version: C{int}
+        :param  version: first version to try
+        :return: C{int} reserved version number
+        '''
+        while not self.reserve(version):
+            version += 1
+
+        return version
+
+    def reserve_next(self, after=0):
+        '''
+        reserve next free version above the latest known version
+
+        :type   after: C{int}
+        :param  after: version the next version needs to be above
+        :return: C{int} reserved version number
+        '''
+        version = self.reserve_from(max(self.latest, after) + 1)
+
+        self._versions = sorted(set(self.versions) | set([version]))
+        return version
+
+    def release(self, version=None):
+        '''
+        remove reservation lock of a version, or of all reserved versions
+
+        :type   version: C{int}
+        :param  version: *OPTIONAL* version number to release
+        '''
+        for reserved in list(self._reserved):
+            if version is not None and reserved != version:
+                continue
+
+            lock_path = os.path.join(self._pub_dir,
+                                     self.version_file(reserved, lock=True))
+            if os.path.isfile(lock_path):
+                os.remove(lock_path)
+            self._reserved.remove(reserved)
 
 
 class dPublisherBase(object):
@@ -42,6 +210,11 @@ class dPublisherBase(object):
         self._lib_category = lib_category
         self._pub_ext = 'ma'
         self._force_save = False
+        self._version_index = None
+        self._catalog = None
+        self._staged = None
+        self._interactive = True
+        self._exists_action = 'Version Up'
 
         self.obj = 'tester'
 
@@ -97,6 +270,42 @@ class dPublisherBase(object):
         '''
         self._force_save = force_state
 
+    @property
+    def interactive(self):
+        '''
+        get state of whether the user is asked through dialogs
+        '''
+        return self._interactive
+
+    @interactive.setter
+    def interactive(self, interactive_state):
+        '''
+        set whether the user is asked through dialogs. Without dialogs,
+            errors are only printed and existing publishes are handled with
+            the exists action.
+
+        :type   interactive_state: C{bool}
+        :param  interactive_state: new interactive state
+        '''
+        self._interactive = interactive_state
+
+    @property
+    def exists_action(self):
+        '''
+        get action taken on existing publishes when not interactive
+        '''
+        return self._exists_action
+
+    @exists_action.setter
+    def exists_action(self, action):
+        '''
+        set action taken on existing publishes when not interactive
+
+        :type   action: C{str}
+        :param  action: "Version Up", "Replace" or "Cancel"
+        '''
+        self._exists_action = action
+
     @property
     def asset_library(self):
         '''
@@ -201,10 +410,23 @@ class dPublisherBase(object):
 
         return confirm
 
+    def _report_error(self, title, message):
+        '''
+        show error to user, or only print it when not interactive
+        '''
+        if self.interactive:
+            mc.confirmDialog(title=title, message=message, button=['OK'],
+                             defaultButton='OK')
+        print '%s: %s' % (title, message)
+
     def _verify_path_dirs_exist(self):
         '''
         verify that path exists on disk
         '''
+        # archive directory is the deepest, if it exists all others do
+        if os.path.isdir(self.actual_pub_archive_path):
+            return
+
         try:
             # collect path elements for verification
             pub_path = self.asset_library
@@ -219,37 +441,112 @@ class dPublisherBase(object):
                     print 'directory %s, does not exist. Creating...' % pub_path
                     os.mkdir(pub_path)
         except Exception, e:
-            mc.confirmDialog(
-                    title='Path Error',
-                    message='Issue creating/validating publish path. %s' % e,
-                    button=['OK'],
-                    defaultButton='OK')
+            self._report_error('Path Error',
+                        'Issue creating/validating publish path. %s' % e)
             raise e
 
-    def get_next_version(self):
+    @property
+    def version_index(self):
         '''
-        determine next version of file
+        get index of published versions of the current publish file
         '''
-        found = False
-        version = int(self.version.replace('v', ''))
+        if self._version_index is None:
+            self._version_index = PublishVersionIndex(self.actual_pub_path,
+                                            self.file_name, self.pub_ext,
+                                            [self.actual_pub_archive_path])
+        return self._version_index
 
-        # locate next version that does not currently exist
-        while not found:
-            version += 1
-            test_pub_file = '%s_v%03d.%s' % (self.file_name,
-                                                version, self.pub_ext)
-            if not os.path.isfile(os.path.join(self.actual_pub_path,
-                                                                test_pub_file)):
-                found = True
-                break
+    def get_next_version(self):
+        '''
+        determine next version of file, reserving it until the publish
+            is done so concurrent publishes get different versions. Files
+            known to the catalog need no listing of the publish directories.
+        '''
+        after = int(self.version.replace('v', ''))
+        latest = self.catalog.latest_version(self.file_name)
+        if latest:
+            # reserving still skips versions on disk the catalog missed,
+            #   published or archived
+            version = self.version_index.reserve_from(max(latest, after) + 1)
+        else:
+            version = self.version_index.reserve_next(after)
 
         # update latest values
         self.version = 'v%03d' % version
 
+    def reserve_version(self):
+        '''
+        reserve the current version until the publish is done, moving on to
+            the next free version if another publish already holds it
+        '''
+        version = int(self.version.replace('v', ''))
+        if not self.version_index.reserve(version):
+            print '%s is being published elsewhere, using next version' \
+                                                        % self.version_file_name
+            self.version = 'v%03d' % self.version_index.reserve_next(version)
+
+    def release_version(self):
+        '''
+        release any version reserved by reserve_version or get_next_version
+        '''
+        if self._version_index is not None:
+            self._version_index.release()
+
+    @property
+    def catalog(self):
+        '''
+        get shared catalog of the asset library publishes are recorded in
+        '''
+        if self._catalog is None:
+            self._catalog = PublishCatalog(asset_library=self.asset_library,
+                                           create=True)
+        return self._catalog
+
+    @property
+    def catalog_details(self):
+        '''
+        get asset details recorded with each publish in the catalog
+        '''
+        return {'category': self._lib_category, 'asset_type': None,
+                'asset': self.obj}
+
+    def record_publish(self):
+        '''
+        record current publish, and the archiving of the version it
+            replaces, in the publish catalog
+        '''
+        pub_path = '%s.%s' % (self.actual_file_pub_path, self.pub_ext)
+        archived = None
+        if self.archive_version:
+            archived = (self.archive_version,
+                        os.path.join(self.actual_pub_archive_path,
+                                     os.path.basename(self.archive_version)))
+
+        # staged publishes were checksummed locally, no need to read the
+        #   file back from the share
+        size = checksum = None
+        if self._staged and self._staged.committed:
+            size = self._staged.size
+            checksum = self._staged.checksum
+
+        try:
+            self.catalog.record_publish(file_name=self.file_name,
+                                    version=int(self.version.replace('v', '')),
+                                    path=pub_path, archived=archived,
+                                    size=size, checksum=checksum,
+                                    **self.catalog_details)
+        except Exception, e:
+            # the publish itself is done, the catalog can catch up later
+            print 'Issue recording %s in publish catalog. %s' % (pub_path, e)
+
     def archive_old_version(self):
         '''
-        move old version from directory to archive directory
+        move old version from directory to archive directory, unless the
+            staged export already archived it
         '''
+        if self._staged and self._staged.archived:
+            return
+
         if self.archive_version:
             try:
                 print 'Attempting to archive %s to %s' \
@@ -257,11 +554,8 @@ class dPublisherBase(object):
                                        self.actual_pub_archive_path)
                 shutil.move(self.archive_version, self.actual_pub_archive_path)
             except Exception, e:
-                mc.confirmDialog(
-                        title='Archive Error',
-                        message='Issue archiving old publish version. %s' % e,
-                        button=['OK'],
-                        defaultButton='OK')
+                self._report_error('Archive Error',
+                        'Issue archiving old publish version. %s' % e)
                 raise e
 
     def _get_pub_file_type(self):
@@ -279,30 +573,84 @@ class dPublisherBase(object):
         '''
         Exports selection to the ".ma" file or specified publish extension
             basic version, may want a separate / better one for FBX's, etc.
+            The file is exported locally first, then copied to the share and
+            renamed into place together with archiving the old version, so
+            a failed publish never leaves a partial file behind.
         '''
-        ascii_path = "%s.%s" % (self.actual_file_pub_path, self.pub_ext)
-        print 'Exporting "%s"...' % ascii_path
+        staged = self.stage_export()
+        if not staged:
+            return False
+
         try:
-            exportedFile = mc.file(ascii_path, type=self._get_pub_file_type(),
-                                    exportSelected=True, force=self.force_save)
+            self.finish_export(staged)
         except Exception, e:
-            mc.confirmDialog(
-                    title='Publish Error',
-                    message='Issue exporting publish rig %s due to %s' \
-                                                            % (ascii_path, e),
-                    button=['OK'],
-                    defaultButton='OK')
+            self._report_error('Publish Error',
+                        'Issue exporting publish rig %s due to %s'
+                                                    % (staged.pub_path, e))
             print 'Export cancelled due to %s' % e
             return False
+        finally:
+            staged.cleanup()
 
         return True
 
+    def stage_export(self):
+        '''
+        export selection to a local staging file, the part of a publish
+            that needs the scene. Returns the C{StagedPublish}, or None if
+            the export failed.
+        '''
+        ascii_path = "%s.%s" % (self.actual_file_pub_path, self.pub_ext)
+        print 'Exporting "%s"...' % ascii_path
+        staged = StagedPublish(ascii_path, self.actual_pub_archive_path)
+        try:
+            with staged.stage('export'):
+                mc.file(staged.local_path, type=self._get_pub_file_type(),
+                        exportSelected=True, force=True)
+        except Exception, e:
+            staged.cleanup()
+            self._report_error('Publish Error',
+                        'Issue exporting publish rig %s due to %s'
+                                                        % (ascii_path, e))
+            print 'Export cancelled due to %s' % e
+            return None
+
+        return staged
+
+    def finish_export(self, staged, progress=None):
+        '''
+        copy a staged export onto the share and commit it, archiving the
+            old version. Uses no maya commands, so it can run on a publish
+            queue thread. Raises on failure, after removing any partial copy.
+
+        :type   staged: C{StagedPublish}
+        :param  staged: staged export returned by stage_export
+        :type   progress: C{function}
+        :param  progress: *OPTIONAL* called with (copied, total) bytes during
+                            the copy, raising from it aborts the publish
+        '''
+        try:
+            staged.transfer(progress)
+
+            if os.path.isfile(staged.pub_path) and not self.force_save:
+                raise Exception('File already exists, use force to replace.')
+            staged.commit(self.archive_version)
+        except Exception:
+            staged.rollback()
+            raise
+
+        self._staged = staged
+        staged.report()
+
     def _check_for_existing_publish(self):
         '''
         determine if publish version already exists
         '''
         if os.path.isfile('%s.%s' % (self.actual_file_pub_path, self.pub_ext)):
-            confirm_action = self._version_exists_win(self.version_file_name)
+            confirm_action = self.exists_action
+            if self.interactive:
+                confirm_action = self._version_exists_win(
+                                                    self.version_file_name)
 
             print 'File exists: %s.%s. Proceeding with %s' \
                                                 % (self.actual_file_pub_path,
@@ -322,12 +670,191 @@ class dPublisherBase(object):
         else:
             print 'File does not exist, checking if directory structure exists..'
             self._verify_path_dirs_exist()
+            self.reserve_version()
 
         return True
 
+    def _validate_attributes(self):
+        '''
+        validate all required attributes have been passed
+        '''
+        return bool(self.version) and os.path.isdir(self.asset_library)
+
     def do_publish(self):
         '''
         publish to versioned file
         '''
         raise Exception("This is the base class. Should be extended to "
-                            + "a child class for specific publishing purposes.")
\ No newline at end of file
+                            + "a child class for specific publishing purposes.")
+
+
+class BatchPublisher(object):
+    '''
+    publishes many assets in one go without dialogs. Versions and
+        directories are resolved for all assets first, then every asset is
+        exported back to back and the transfers onto the share run
+        concurrently, ie.
+
+        batch = BatchPublisher(RigPublisher)
+        results = batch.publish([{'character_type': 'humans',
+                                  'character': 'bob', 'rig_type': 'BSK',
+                                  'version': 'v001', 'nodes': ['bob_GRP']}])
+    '''
+    def __init__(self, publisher_class, exists_action='Version Up',
+                 transfers=4):
+        '''
+        initialize instance variables
+
+        :type   publisher_class: C{type}
+        :param  publisher_class: publisher created for each descriptor, ie.
+                                    C{RigPublisher}
+        :type   exists_action: C{str}
+        :param  exists_action: action on existing publishes, "Version Up",
+                                "Replace" or "Cancel"
+        :type   transfers: C{int}
+        :param  transfers: number of transfers onto the share run at once
+        '''
+        self._publisher_class = publisher_class
+        self._exists_action = exists_action
+        self._transfers = transfers
+
+    def _resolve(self, descriptor):
+        '''
+        create non interactive publisher for a descriptor and resolve its
+            version and directories
+        '''
+        details = dict(descriptor)
+        result = {'descriptor': descriptor, 'nodes': details.pop('nodes', None),
+                  'publisher': None, 'status': None, 'error': None,
+                  'path': None, 'version': None, 'timings': []}
+
+        try:
+            publisher = self._publisher_class(details)
+        except Exception, e:
+            result['status'] = 'invalid'
+            result['error'] = str(e)
+            return result
+
+        publisher.interactive = False
+        publisher.exists_action = self._exists_action
+        result['publisher'] = publisher
+
+        try:
+            if not publisher._validate_attributes():
+                result['status'] = 'invalid'
+                result['error'] = 'Missing publish details or asset library.'
+            elif not publisher._check_for_existing_publish():
+                result['status'] = 'skipped'
+                result['error'] = 'Publish exists and exists action is %s.' \
+                                                        % self._exists_action
+        except Exception, e:
+            result['status'] = 'failed'
+            result['error'] = str(e)
+            self._release(result)
+
+        return result
+
+    def _export(self, result):
+        '''
+        export an asset to local disk, needs the scene so runs in turn
+        '''
+        publisher = result['publisher']
+        try:
+            if result['nodes']:
+                mc.select(result['nodes'], replace=True)
+
+            result['staged'] = publisher.stage_export()
+            if not result['staged']:
+                result['status'] = 'failed'
+                result['error'] = 'Export failed.'
+                self._release(result)
+                return
+
+            # open catalog here, creating its schema while transfers record
+            #   publishes fails them with a schema change
+            publisher.catalog
+        except Exception, e:
+            result['status'] = 'failed'
+            result['error'] = str(e)
+            self._release(result)
+
+    def _transfer(self, result):
+        '''
+        copy, commit, archive and record an exported asset
+        '''
+        publisher = result['publisher']
+        staged = result['staged']
+        try:
+            publisher.finish_export(staged)
+            publisher.archive_old_version()
+            publisher.record_publish()
+            result['status'] = 'published'
+        except Exception, e:
+            result['status'] = 'failed'
+            result['error'] = str(e)
+        finally:
+            self._release(result)
+            result['timings'] = staged.timings
+
+        return result
+
+    @staticmethod
+    def _release(result):
+        '''
+        remove local staging files and release the reserved version of an
+            asset, safe to call more than once
+        '''
+        if result.get('staged'):
+            result['staged'].cleanup()
+        if result['publisher'] is not None:
+            result['publisher'].release_version()
+
+    def publish(self, descriptors):
+        '''
+        publish every asset described
+
+        :type   descriptors: C{list}
+        :param  descriptors: dicts of publisher details, with an optional
+                                'nodes' list selected for the export
+        :return: C{list} of result dicts, in descriptor order, with
+                    'descriptor', 'status' ("published", "failed",
+                    "skipped" or "invalid"), 'error', 'path', 'version' and
+                    'timings' of the publish stages
+        '''
+        start = time.time()
+        results = []
+        try:
+            for descriptor in descriptors:
+                results.append(self._resolve(descriptor))
+
+            ready = [result for result in results if result['status'] is None]
+            for result in ready:
+                self._export(result)
+
+            exported = [result for result in ready
+                                                if result['status'] is None]
+            if exported:
+                pool = ThreadPool(max(1, min(self._transfers, len(exported))))
+                try:
+                    pool.map(self._transfer, exported)
+                finally:
+                    pool.close()
+                    pool.join()
+        finally:
+            # nothing is left reserved or staged, even if the batch stopped
+            for result in results:
+                self._release(result)
+
+        for result in results:
+            publisher = result.pop('publisher')
+            result.pop('staged', None)
+            if result['status'] != 'invalid':
+                result['version'] = publisher.version
+                result['path'] = '%s.%s' % (publisher.actual_file_pub_path,
+                                            publisher.pub_ext)
+
+        print 'Batch published %d of %d assets in %.2fs' \
+                    % (len([result for result in results
+                                    if result['status'] == 'published']),
+                       len(results), time.time() - start)
+        return results
@@ -0,0 +1,332 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+SQLite catalog of asset library publishes, shared by everyone publishing to
+    the library. Every publish is recorded with its asset, category,
+    version, path, size, checksum, artist and time, so lookups like the
+    latest version of a file or all rigs of a character are indexed queries
+    rather than walks of the file server, ie.
+
+    catalog = PublishCatalog(asset_library=ddConstants.CHAR_ASSETLIBRARY)
+    catalog.latest_version('bob_rig_maya_BSK')
+
+Each asset library keeps its catalog in the library root, unless the
+    DD_PUBLISH_CATALOG environment variable points somewhere else.
+
+Locking: SQLite's own file locks are not reliable on network shares, so
+    they are never relied on between machines. Every query and every write
+    first creates a lock file next to the database exclusively (O_EXCL,
+    atomic on SMB and NFSv3) and holds it only for that one query or
+    transaction, so nobody reads pages another machine is half way through
+    writing. Locks older than STALE_LOCK_SECONDS are left by crashed
+    publishes and are broken.
+
+Only publishers create the database and its schema, readers of a library
+    without a catalog simply find no publishes.
+'''
+
+import contextlib
+import errno
+import getpass
+import hashlib
+import os
+import sqlite3
+import time
+
+CATALOG_ENV = 'DD_PUBLISH_CATALOG'
+CATALOG_FILE = '.publish_catalog.db'
+CHECKSUM_CHUNK_SIZE = 4 * 1024 * 1024
+LOCK_EXT = 'lock'
+LOCK_TIMEOUT = 60
+STALE_LOCK_SECONDS = 10 * 60
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS publishes (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,
+    asset_type TEXT,
+    asset TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER,
+    checksum TEXT,
+    artist TEXT,
+    published REAL NOT NULL,
+    archived INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS publishes_file_version
+    ON publishes (file_name, version);
+CREATE INDEX IF NOT EXISTS publishes_asset
+    ON publishes (category, asset);
+CREATE INDEX IF NOT EXISTS publishes_asset_type
+    ON publishes (category, asset_type);
+'''
+
+
+class PublishCatalogLockError(Exception):
+    pass
+
+
+def library_catalog_path(asset_library):
+    '''
+    get path to the catalog of an asset library, DD_PUBLISH_CATALOG if set
+
+    :type   asset_library: C{str}
+    :param  asset_library: asset library root directory
+    '''
+    return os.getenv(CATALOG_ENV) or os.path.join(asset_library, CATALOG_FILE)
+
+
+
+def file_checksum(file_path, chunk_size=CHECKSUM_CHUNK_SIZE):
+    '''
+    get sha1 checksum of a file, read in chunks
+
+    :type   file_path: C{str}
+    :param  file_path: path to file
+    :type   chunk_size: C{int}
+    :param  chunk_size: bytes read at a time
+    '''
+    checksum = hashlib.sha1()
+    with open(file_path, 'rb') as check_file:
+        for chunk in iter(lambda: check_file.read(chunk_size), ''):
+            checksum.update(chunk)
+
+    return checksum.hexdigest()
+
+
+class PublishCatalog(object):
+    '''
+    Indexed record of asset library publishes
+    '''
+    def __init__(self, db_path=None, asset_library=None, create=False):
+        '''
+        initialize instance variables
+
+        :type   db_path: C{str}
+        :param  db_path: *OPTIONAL* path to catalog database
+        :type   asset_library: C{str}
+        :param  asset_library: *OPTIONAL* asset library whose shared catalog
+                                is used when no db_path is given
+        :type   create: C{bool}
+        :param  create: create the database and its schema if needed, for
+                            catalogs publishes are recorded in
+        '''
+        if not db_path and not asset_library:
+            raise ValueError('PublishCatalog needs a db_path or asset_library.')
+
+        self._db_path = db_path or library_catalog_path(asset_library)
+        self._conn = None
+        if create:
+            with self._lock() as conn:
+                conn.execute('PRAGMA journal_mode = DELETE')
+                conn.executescript(SCHEMA)
+
+    @property
+    def db_path(self):
+        '''
+        get path to catalog database
+        '''
+        return self._db_path
+
+    @property
+    def lock_path(self):
+        '''
+        get path to the lock file held while querying or writing
+        '''
+        return '%s.%s' % (self._db_path, LOCK_EXT)
+
+    def close(self):
+        '''
+        close catalog database
+        '''
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @contextlib.contextmanager
+    def _lock(self):
+        '''
+        hold the catalog lock file and run a single transaction
+        '''
+        start = time.time()
+        while True:
+            try:
+                os.close(os.open(self.lock_path,
+                                 os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+            try:
+                if time.time() - os.path.getmtime(self.lock_path) \
+                                                        > STALE_LOCK_SECONDS:
+                    # left behind by a crashed publish
+                    os.remove(self.lock_path)
+                    continue
+            except OSError:
+                # released meanwhile
+                continue
+
+            if time.time() - start > LOCK_TIMEOUT:
+                raise PublishCatalogLockError('Timed out waiting for %s.'
+                                                            % self.lock_path)
+            time.sleep(0.1)
+
+        try:
+            if self._conn is None:
+                # publishes may be recorded from a publish queue thread
+                self._conn = sqlite3.connect(self._db_path, timeout=30,
+                                             check_same_thread=False)
+                self._conn.row_factory = sqlite3.Row
+            with self._conn:
+                yield self._conn
+        finally:
+            os.remove(self.lock_path)
+
+    def _query(self, sql, parameters=()):
+        '''
+        run a query while holding the catalog lock
+
+        :type   sql: C{str}
+        :param  sql: select statement
+        :type   parameters: C{tuple}
+        :param  parameters: *OPTIONAL* statement parameters
+        :return: C{list} of result rows, empty if there is no catalog yet
+        '''
+        if self._conn is None and not os.path.isfile(self._db_path):
+            return []
+
+        with self._lock() as conn:
+            return conn.execute(sql, parameters).fetchall()
+
+    def record_publish(self, category, asset, file_name, version, path,
+                       asset_type=None, size=None, checksum=None, artist=None,
+                       published=None, archived=None):
+        '''
+        record a publish, along with the archiving of the version it
+            replaces, in a single transaction
+
+        :type   category: C{str}
+        :param  category: asset library category, ie. "characters"
+        :type   asset: C{str}
+        :param  asset: asset name
+        :type   file_name: C{str}
+        :param  file_name: publish file name prefix, without version
+        :type   version: C{int}
+        :param  version: published version number
+        :type   path: C{str}
+        :param  path: full path to published file
+        :type   asset_type: C{str}
+        :param  asset_type: *OPTIONAL* asset type within the category
+        :type   size: C{int}
+        :param  size: *OPTIONAL* file size, read from the file if not given
+        :type   checksum: C{str}
+        :param  checksum: *OPTIONAL* sha1 of file, computed if not given
+        :type   artist: C{str}
+        :param  artist: *OPTIONAL* publishing artist, defaults to current user
+        :type   published: C{float}
+        :param  published: *OPTIONAL* publish time, defaults to now
+        :type   archived: C{tuple}
+        :param  archived: *OPTIONAL* previous and archive path of the version
+                            moved to the archive by this publish
+        '''
+        if size is None:
+            size = os.path.getsize(path)
+        if checksum is None:
+            checksum = file_checksum(path)
+
+        with self._lock() as conn:
+            if archived:
+                conn.execute('UPDATE publishes SET archived = 1, path = ? '
+                             'WHERE path = ?', (archived[1], archived[0]))
+            conn.execute('INSERT OR REPLACE INTO publishes (category, '
+                         'asset_type, asset, file_name, version, path, size, '
+                         'checksum, artist, published) VALUES '
+                         '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (category, asset_type, asset, file_name, version,
+                          path, size, checksum, artist or getpass.getuser(),
+                          published or time.time()))
+
+
+    def latest_version(self, file_name):
+        '''
+        get latest published version number of a file, 0 if never published
+
+        :type   file_name: C{str}
+        :param  file_name: publish file name prefix, without version
+        '''
+        rows = self._query('SELECT MAX(version) FROM publishes '
+                           'WHERE file_name = ?', (file_name,))
+        return rows[0][0] if rows and rows[0][0] else 0
+
+    def versions(self, file_name):
+        '''
+        get all recorded publishes of a file, oldest version first
+
+        :type   file_name: C{str}
+        :param  file_name: publish file name prefix, without version
+        :return: C{list} of C{dict} publish records
+        '''
+        return [dict(row) for row in self._query(
+                            'SELECT * FROM publishes WHERE file_name = ? '
+                            'ORDER BY version', (file_name,))]
+
+    def asset_files(self, category, asset):
+        '''
+        get latest publish of every file of an asset, ie. all rigs of a
+            character
+
+        :type   category: C{str}
+        :param  category: asset library category
+        :type   asset: C{str}
+        :param  asset: asset name
+        :return: C{list} of C{dict} publish records, sorted by file name
+        '''
+        return [dict(row) for row in self._query(
+                            'SELECT * FROM publishes WHERE category = ? AND '
+                            'asset = ? AND version = (SELECT MAX(version) '
+                            'FROM publishes AS p WHERE p.file_name = '
+                            'publishes.file_name) ORDER BY file_name',
+                            (category, asset))]
+
+    def assets(self, category, asset_type=None):
+        '''
+        get names of published assets of a category
+
+        :type   category: C{str}
+        :param  category: asset library category
+        :type   asset_type: C{str}
+        :param  asset_type: *OPTIONAL* limit to assets of this type
+        '''
+        if asset_type is None:
+            rows = self._query('SELECT DISTINCT asset FROM publishes '
+                               'WHERE category = ? ORDER BY asset',
+                               (category,))
+        else:
+            rows = self._query('SELECT DISTINCT asset FROM publishes '
+                               'WHERE category = ? AND asset_type = ? '
+                               'ORDER BY asset', (category, asset_type))
+
+        return [row[0] for row in rows]
+
+    def asset_types(self, category):
+        '''
+        get asset types with publishes in a category
+
+        :type   category: C{str}
+        :param  category: asset library category
+        '''
+        return [row[0] for row in self._query(
+                            'SELECT DISTINCT asset_type FROM publishes WHERE '
+                            'category = ? AND asset_type IS NOT NULL '
+                            'ORDER BY asset_type', (category,))]
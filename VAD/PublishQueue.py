@@ -0,0 +1,270 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Background publish queue. The scene is exported to local disk when a
+    publish is submitted, the slow part, copying onto the share, archiving
+    the old version and recording the publish in the catalog, runs on a
+    worker thread with progress, retries and cancellation, ie.
+
+    queue = PublishQueue(on_update=refresh_gui)
+    job = queue.submit(RigPublisher(details))
+    queue.cancel(job)
+
+on_update and notify are called from the worker thread, so maya UI updates
+    need to be deferred to the main thread, ie. with
+    maya.utils.executeDeferred.
+'''
+
+import Queue
+import threading
+import traceback
+
+QUEUED = 'queued'
+RUNNING = 'running'
+RETRYING = 'retrying'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class PublishCancelled(Exception):
+    '''
+    raised inside a publish job that has been cancelled
+    '''
+
+
+class PublishJob(object):
+    '''
+    A submitted publish and its progress
+    '''
+    def __init__(self, publisher, staged):
+        '''
+        initialize instance variables
+
+        :type   publisher: C{dPublisherBase}
+        :param  publisher: publisher the job was submitted for
+        :type   staged: C{StagedPublish}
+        :param  staged: staged export of the publish
+        '''
+        self.publisher = publisher
+        self.staged = staged
+        self.status = QUEUED
+        self.progress = 0.0
+        self.attempts = 0
+        self.error = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def name(self):
+        '''
+        get versioned file name being published
+        '''
+        return self.publisher.version_file_name
+
+    @property
+    def cancelled(self):
+        '''
+        get state of whether cancelling the job has been requested
+        '''
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        '''
+        get state of whether the job is done, failed or cancelled
+        '''
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def cancel(self):
+        '''
+        request cancelling the job, taking effect before the next copied
+            chunk or retry
+        '''
+        self._cancel_event.set()
+
+    def wait_cancelled(self, seconds):
+        '''
+        wait for a number of seconds or until the job is cancelled
+
+        :return: C{bool} True if the job was cancelled
+        '''
+        return self._cancel_event.wait(seconds)
+
+
+class PublishQueue(object):
+    '''
+    Runs the transfer stage of publishes, one at a time, on a worker thread
+    '''
+    def __init__(self, retries=2, retry_delay=5.0, on_update=None,
+                 notify=None):
+        '''
+        initialize instance variables
+
+        :type   retries: C{int}
+        :param  retries: times a failed transfer is tried again
+        :type   retry_delay: C{float}
+        :param  retry_delay: seconds to wait before retrying
+        :type   on_update: C{function}
+        :param  on_update: *OPTIONAL* called with the job whenever its status
+                            or progress changes
+        :type   notify: C{function}
+        :param  notify: *OPTIONAL* called with every finished job, ie. to
+                            send a notification email
+        '''
+        self._retries = retries
+        self._retry_delay = retry_delay
+        self._on_update = on_update
+        self._notify = notify
+        self._jobs = []
+        self._pending = Queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    @property
+    def jobs(self):
+        '''
+        get list of all submitted jobs
+        '''
+        return list(self._jobs)
+
+    @property
+    def active_jobs(self):
+        '''
+        get list of jobs not finished yet
+        '''
+        return [job for job in self._jobs if not job.finished]
+
+    def submit(self, publisher):
+        '''
+        export publish to local disk and queue its transfer. Needs to be
+            called from the main thread.
+
+        :type   publisher: C{dPublisherBase}
+        :param  publisher: publisher with its version resolved
+        :return: C{PublishJob}, or None if the export failed
+        '''
+        staged = publisher.stage_export()
+        if not staged:
+            publisher.release_version()
+            return None
+
+        job = PublishJob(publisher, staged)
+        self._jobs.append(job)
+        self._pending.put(job)
+        self._update(job)
+        self._start_worker()
+
+        return job
+
+    def cancel(self, job):
+        '''
+        cancel a queued or running job
+
+        :type   job: C{PublishJob}
+        :param  job: job to cancel
+        '''
+        job.cancel()
+
+    def wait(self):
+        '''
+        block until every submitted job is finished
+        '''
+        self._pending.join()
+
+    def _start_worker(self):
+        '''
+        start worker thread if it is not running
+        '''
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work,
+                                                name='PublishQueue')
+                self._worker.daemon = True
+                self._worker.start()
+
+    def _work(self):
+        '''
+        run queued jobs until none are left
+        '''
+        while True:
+            try:
+                job = self._pending.get(timeout=1.0)
+            except Queue.Empty:
+                # a job submitted meanwhile is picked up here, later ones
+                #   start a new worker
+                with self._lock:
+                    if self._pending.empty():
+                        self._worker = None
+                        return
+                continue
+
+            try:
+                self._run(job)
+            finally:
+                self._pending.task_done()
+
+    def _update(self, job):
+        '''
+        report job change
+        '''
+        if self._on_update:
+            try:
+                self._on_update(job)
+            except Exception:
+                traceback.print_exc()
+
+    def _run(self, job):
+        '''
+        transfer, archive and record a publish, retrying failed attempts
+        '''
+        def progress(copied, total):
+            if job.cancelled:
+                raise PublishCancelled()
+            job.progress = copied / float(max(total, 1))
+            self._update(job)
+
+        publisher = job.publisher
+        try:
+            while not job.finished:
+                if job.cancelled:
+                    job.status = CANCELLED
+                    break
+
+                job.attempts += 1
+                job.status = RUNNING
+                self._update(job)
+                try:
+                    publisher.finish_export(job.staged, progress)
+                    publisher.archive_old_version()
+                    publisher.record_publish()
+                    job.progress = 1.0
+                    job.status = DONE
+                except PublishCancelled:
+                    job.status = CANCELLED
+                except Exception, e:
+                    job.error = "%s\n%s" % (e, traceback.format_exc())
+                    print 'Publish of %s failed. %s' % (job.name, e)
+                    if job.attempts > self._retries:
+                        job.status = FAILED
+                    else:
+                        job.status = RETRYING
+                        self._update(job)
+                        job.wait_cancelled(self._retry_delay)
+        finally:
+            job.staged.cleanup()
+            publisher.release_version()
+
+        print 'Publish of %s %s.' % (job.name, job.status)
+        self._update(job)
+        if self._notify:
+            try:
+                self._notify(job)
+            except Exception:
+                traceback.print_exc()
@@ -0,0 +1,262 @@
+#
+# Copyright (c) [2014] John Zimmermann
+#
+# $URL$
+# $Date$
+# $Revision$
+# $Author$
+#
+
+'''
+Staged publish writes. A publish is exported to a local temp file,
+    checksummed, copied next to its final path on the share in large chunks,
+    read back from the share to verify the copy and only then renamed into
+    place, together with archiving the version it replaces, so downstream
+    tools never see a half written or corrupt publish, ie.
+
+    staged = StagedPublish('/lib/characters/bob/rig/maya/published/bob.ma')
+    try:
+        with staged.stage('export'):
+            export_to(staged.local_path)
+        staged.transfer()
+        staged.commit(archive_path=old_version_path)
+    except:
+        staged.rollback()
+        raise
+    finally:
+        staged.cleanup()
+'''
+
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from VAD.PublishCatalog import file_checksum
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+PARTIAL_EXT = 'partial'
+
+
+def copy_chunked(src_path, dst_path, chunk_size=COPY_CHUNK_SIZE,
+                 progress=None):
+    '''
+    copy file in large chunks, flushed to disk before returning
+
+    :type   src_path: C{str}
+    :param  src_path: file to copy
+    :type   dst_path: C{str}
+    :param  dst_path: path to copy to
+    :type   chunk_size: C{int}
+    :param  chunk_size: bytes read and written at a time
+    :type   progress: C{function}
+    :param  progress: *OPTIONAL* called with (copied, total) bytes after
+                        each chunk, raising from it aborts the copy
+    :return: C{str} sha1 checksum of the copied bytes
+    '''
+    checksum = hashlib.sha1()
+    total = os.path.getsize(src_path)
+    copied = 0
+    with open(src_path, 'rb') as src_file:
+        with open(dst_path, 'wb') as dst_file:
+            for chunk in iter(lambda: src_file.read(chunk_size), ''):
+                checksum.update(chunk)
+                dst_file.write(chunk)
+                copied += len(chunk)
+                if progress:
+                    progress(copied, total)
+            dst_file.flush()
+            os.fsync(dst_file.fileno())
+
+    return checksum.hexdigest()
+
+
+def replace_file(src_path, dst_path):
+    '''
+    rename file into place, replacing any existing file. Atomic where the
+        os allows renaming over an existing file.
+
+    :type   src_path: C{str}
+    :param  src_path: file to rename
+    :type   dst_path: C{str}
+    :param  dst_path: final path
+    '''
+    if os.name == 'nt' and os.path.isfile(dst_path):
+        os.remove(dst_path)
+    os.rename(src_path, dst_path)
+
+
+class StagedPublish(object):
+    '''
+    Stages a publish file locally and moves it onto the share in one step
+    '''
+    def __init__(self, pub_path, archive_dir=None):
+        '''
+        initialize instance variables
+
+        :type   pub_path: C{str}
+        :param  pub_path: final publish file path
+        :type   archive_dir: C{str}
+        :param  archive_dir: *OPTIONAL* directory replaced versions are
+                                archived to on commit
+        '''
+        self._pub_path = pub_path
+        self._archive_dir = archive_dir
+        self._staging_dir = tempfile.mkdtemp(prefix='publish_')
+        self._checksum = None
+        self._size = None
+        self._archived = None
+        self._committed = False
+        self._timings = []
+
+    @property
+    def pub_path(self):
+        '''
+        get final publish file path
+        '''
+        return self._pub_path
+
+    @property
+    def local_path(self):
+        '''
+        get local path the publish is exported to
+        '''
+        return os.path.join(self._staging_dir,
+                            os.path.basename(self._pub_path))
+
+    @property
+    def partial_path(self):
+        '''
+        get path the publish is copied to before being renamed into place
+        '''
+        return '%s.%d.%s' % (self._pub_path, os.getpid(), PARTIAL_EXT)
+
+    @property
+    def checksum(self):
+        '''
+        get sha1 checksum of the staged publish
+        '''
+        return self._checksum
+
+    @property
+    def size(self):
+        '''
+        get size of the staged publish
+        '''
+        return self._size
+
+    @property
+    def archived(self):
+        '''
+        get previous and archive path of the version archived on commit
+        '''
+        return self._archived
+
+    @property
+    def committed(self):
+        '''
+        get state of whether the publish has been renamed into place
+        '''
+        return self._committed
+
+    @property
+    def timings(self):
+        '''
+        get list of (stage, seconds) in the order stages ran
+        '''
+        return list(self._timings)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''
+        time a publish stage
+
+        :type   name: C{str}
+        :param  name: stage name
+        '''
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._timings.append((name, time.time() - start))
+
+    def transfer(self, progress=None):
+        '''
+        checksum local publish, copy it next to its final path and verify
+            the copy by reading it back from the share
+
+        :type   progress: C{function}
+        :param  progress: *OPTIONAL* called with (copied, total) bytes during
+                            the copy, raising from it aborts the transfer
+        '''
+        with self.stage('checksum'):
+            self._checksum = file_checksum(self.local_path)
+            self._size = os.path.getsize(self.local_path)
+
+        with self.stage('copy'):
+            copied = copy_chunked(self.local_path, self.partial_path,
+                                  progress=progress)
+
+        if copied != self._checksum:
+            raise IOError('Local publish %s changed while copying.'
+                                                            % self.local_path)
+
+        # the copy was flushed to disk, so this reads what the share stored
+        with self.stage('verify'):
+            written = file_checksum(self.partial_path)
+
+        if written != self._checksum:
+            raise IOError('Checksum mismatch copying %s to %s.'
+                                        % (self.local_path, self.partial_path))
+
+    def commit(self, archive_path=None):
+        '''
+        archive the replaced version and rename the copied publish into
+            place, restoring the archived version if the rename fails.
+            Refuses to overwrite a file of the same name in the archive.
+
+        :type   archive_path: C{str}
+        :param  archive_path: *OPTIONAL* previous version to archive
+        '''
+        with self.stage('commit'):
+            if archive_path and self._archive_dir:
+                archived = (archive_path, os.path.join(self._archive_dir,
+                                            os.path.basename(archive_path)))
+                if os.path.exists(archived[1]):
+                    raise IOError('Archive already has %s.' % archived[1])
+                replace_file(*archived)
+                self._archived = archived
+
+            try:
+                replace_file(self.partial_path, self._pub_path)
+            except Exception:
+                if self._archived:
+                    replace_file(self._archived[1], self._archived[0])
+                    self._archived = None
+                raise
+
+        self._committed = True
+
+    def rollback(self):
+        '''
+        remove copied publish that was not committed
+        '''
+        if not self._committed and os.path.isfile(self.partial_path):
+            os.remove(self.partial_path)
+
+    def cleanup(self):
+        '''
+        remove local staging files
+        '''
+        shutil.rmtree(self._staging_dir, ignore_errors=True)
+
+    def report(self):
+        '''
+        print stage timings
+        '''
+        print 'Publish timings for %s:' % self._pub_path
+        for name, seconds in self._timings:
+            print '\t%s: %.2fs' % (name, seconds)
+        print '\ttotal: %.2fs' % sum(seconds for _, seconds in self._timings)
@@ -60,6 +60,15 @@ class RigPublisher(dPublisherBase):
         '''
         return self._rig_type
 
+    @property
+    def catalog_details(self):
+        '''
+        get asset details recorded with each publish in the catalog
+        '''
+        return {'category': self._lib_category,
+                'asset_type': self.character_type,
+                'asset': self.character}
+
     @property
     def file_name(self):
         '''
@@ -91,9 +100,13 @@ class RigPublisher(dPublisherBase):
 
         return True
 
-    def do_publish(self, force=False):
+    def do_publish(self, force=False, queue=None):
         '''
         publish rig to versioned file
+
+        :type   queue: C{PublishQueue}
+        :param  queue: *OPTIONAL* publish queue to run the transfer on in the
+                        background, returning the C{PublishJob}
         '''
         # valid information provided
         if self._validate_attributes():
@@ -106,12 +119,20 @@ class RigPublisher(dPublisherBase):
             if not do_publish:
                 return
 
-            # attempt to publish file
-            valid_export = self.export_maya_file()
+            if queue is not None:
+                # only the local export blocks, the rest is queued
+                return queue.submit(self)
+
+            try:
+                # attempt to publish file
+                valid_export = self.export_maya_file()
 
-            if valid_export:
-                # archive found older publish
-                self.archive_old_version()
+                if valid_export:
+                    # archive found older publish
+                    self.archive_old_version()
+                    self.record_publish()
+            finally:
+                self.release_version()
 
             print 'Published %s.ma%s complete.' \
                                     % (self.version_file_name,
@@ -8,7 +8,9 @@
 #
 
 import maya.cmds as mc
+import maya.utils
 
+import getpass
 import os
 import re
 import sys
@@ -21,8 +23,15 @@ if apath not in sys.path:
 # VAD
 # from cw_scripts import ddConstants
 from VAD import ddRigPublisher as ddrp
+from VAD.PublishCatalog import PublishCatalog
+from VAD.PublishQueue import DONE, PublishQueue
 from mayatools.VAD import ddConstants
 
+try:
+    from vir_prod.vp_mail.publish_email import PublishEmail
+except ImportError:
+    PublishEmail = None
+
 
 class RigPublisher_GUI(object):
     '''
@@ -40,14 +49,27 @@ class RigPublisher_GUI(object):
     CHAR_NAME_LABEL = 'Select character'
     RIG_TYPE_LABEL = 'Select rig type'
     DESC_LABEL = 'Sel or type description'
+    EMAIL_CATEGORY = 'vad_anim_rig'
 
     def __init__(self):
         '''
         initialize instance
         '''
         self._remove_existing()
+        self._publish_queue = PublishQueue(on_update=self._job_updated,
+                                           notify=self._email_publish)
+        self._catalog = None
         self._build_ui()
 
+    @property
+    def catalog(self):
+        '''
+        get shared publish catalog of the character library
+        '''
+        if self._catalog is None:
+            self._catalog = PublishCatalog(asset_library=self.ASSET_LIB)
+        return self._catalog
+
     @property
     def character_type(self):
         return mc.textFieldGrp(self._tfg_char_type, query=True, text=True)
@@ -124,6 +146,29 @@ class RigPublisher_GUI(object):
                                         annotation=
                                         "Enter rig version to attempt publish as")
 
+        self._version_hint = mc.text(label='', align='right',
+                                        parent=self._main_flayout,
+                                        annotation="Latest version in the "
+                                            + "publish catalog")
+
+        self._background_chbx = mc.checkBox(label='Publish in background',
+                                        value=True,
+                                        parent=self._main_flayout,
+                                        annotation="Only export the rig "
+                                            + "while waiting, copying to the "
+                                            + "library and archiving happen "
+                                            + "in the background.")
+
+        self._job_list = mc.textScrollList(height=90,
+                                        allowMultiSelection=True,
+                                        parent=self._main_flayout,
+                                        annotation="Background publishes")
+
+        self._cancel_btn = mc.button(label='Cancel Selected Publishes',
+                                        height=25,
+                                        parent=self._main_flayout,
+                                        command=self.cancel_publishes)
+
         self._publish_btn = mc.button(label='Publish', height=30,
                                         parent=self._main_flayout,
                                         command=self.kick_off_publish)
@@ -132,12 +177,26 @@ class RigPublisher_GUI(object):
             attachForm=[(self._tfg_rlayout, 'top', 15),
                         (self._tfg_rlayout, 'left', 10),
                         (self._tfg_rlayout, 'right', 10),
+                        (self._version_hint, 'right', 15),
+                        (self._background_chbx, 'left', 15),
+                        (self._job_list, 'left', 15),
+                        (self._job_list, 'right', 15),
+                        (self._cancel_btn, 'left', 15),
+                        (self._cancel_btn, 'right', 15),
                         (self._publish_btn, 'left', 15),
                         (self._publish_btn, 'right', 15),
                         (self._publish_btn, 'bottom', 15)
+                        ],
+            attachControl=[(self._version_hint, 'top', 10,
+                                                        self._tfg_rlayout),
+                           (self._background_chbx, 'top', 10,
+                                                        self._tfg_rlayout),
+                           (self._job_list, 'top', 5, self._background_chbx),
+                           (self._cancel_btn, 'top', 5, self._job_list),
+                           (self._cancel_btn, 'bottom', 5, self._publish_btn)
                         ])
 
-        mc.window(self._window, edit=True, widthHeight=(755, 100))
+        mc.window(self._window, edit=True, widthHeight=(755, 260))
 
         self._buildCharTypeTFG()
 
@@ -271,6 +330,15 @@ class RigPublisher_GUI(object):
         '''
         mc.textFieldGrp(self._tfg_rig_type, edit=True, text=data)
 
+        # hint at the latest catalogued publish, leaving the version as typed
+        hint = ''
+        if data not in [self.RIG_TYPE_LABEL, '---'] and self.version.isdigit():
+            file_name = ddrp.RigPublisher(self._get_naming_details()).file_name
+            latest = self.catalog.latest_version(file_name)
+            if latest:
+                hint = 'Latest published: v%03d' % latest
+        mc.text(self._version_hint, edit=True, label=hint)
+
     def _get_naming_details(self):
         '''
         collect details from gui
@@ -337,7 +405,69 @@ class RigPublisher_GUI(object):
         if self._validate_naming_details():
             print 'attempting to publish character rig...'
             rpublish = ddrp.RigPublisher(self._get_naming_details())
-            rpublish.do_publish()
+            if mc.checkBox(self._background_chbx, query=True, value=True):
+                rpublish.do_publish(queue=self._publish_queue)
+            else:
+                rpublish.do_publish()
         else:
             raise Exception('Publish Canceled. '
-                                + 'Character details not correctly entered.')
\ No newline at end of file
+                                + 'Character details not correctly entered.')
+
+    def cancel_publishes(self, *args):
+        '''
+        cancel background publishes selected in the job list
+        '''
+        jobs = self._publish_queue.jobs
+        for index in mc.textScrollList(self._job_list, query=True,
+                                       selectIndexedItem=True) or []:
+            self._publish_queue.cancel(jobs[index - 1])
+
+    def _job_updated(self, job):
+        '''
+        refresh job list from the main thread, called by publish queue thread
+        '''
+        maya.utils.executeDeferred(self._refresh_jobs)
+
+    def _email_publish(self, job):
+        '''
+        email a finished background publish, called by publish queue thread
+            so no notes dialog is raised
+        '''
+        if job.status != DONE or PublishEmail is None:
+            return
+
+        rpublish = job.publisher
+        pub_email = PublishEmail(self.EMAIL_CATEGORY, get_notes=False)
+        pub_email.publish_details = {
+                    'SHOW': os.getenv('SHOW') or '',
+                    'ARTIST': getpass.getuser(),
+                    'FILE': '%s.%s' % (rpublish.version_file_name,
+                                       rpublish.pub_ext),
+                    'FILEPATH': '%s.%s' % (rpublish.actual_file_pub_path,
+                                           rpublish.pub_ext),
+                    'Character': rpublish.character,
+                    'RigType': rpublish.rig_type,
+                    'Version': rpublish.version}
+        pub_email.build_email()
+        pub_email.send_mail()
+
+    def _refresh_jobs(self):
+        '''
+        list background publishes with their status and progress
+        '''
+        if not mc.textScrollList(self._job_list, exists=True):
+            return
+
+        selected = mc.textScrollList(self._job_list, query=True,
+                                     selectIndexedItem=True) or []
+        mc.textScrollList(self._job_list, edit=True, removeAll=True)
+        for job in self._publish_queue.jobs:
+            line = '%s    %s %3d%%' % (job.name, job.status,
+                                       int(job.progress * 100))
+            if job.attempts > 1:
+                line += '  (attempt %d)' % job.attempts
+            mc.textScrollList(self._job_list, edit=True, append=line)
+
+        for index in selected:
+            mc.textScrollList(self._job_list, edit=True,
+                              selectIndexedItem=index)
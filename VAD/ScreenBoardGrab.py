@@ -12,7 +12,10 @@ import maya.mel as mel
 
 import os
 import re
+import shutil
 import sys
+import tempfile
+import time
 
 #jpath = "B:/home/johnz/scripts/jbtools"
 #if jpath not in sys.path:
@@ -20,6 +23,16 @@ import sys
 #from cw_scripts import ddConstants
 
 from mayatools.VAD import ddConstants
+from VAD import BoardCaptureBackends
+from VAD import BoardCaptureCache
+from VAD import BoardContactSheet
+from VAD import BoardImageOps
+from VAD import BoardRenderWorker
+from VAD import BookmarkFilter
+
+# rough capture times used to estimate scene wide layout board batches
+LAYOUT_BOARD_SECONDS = 1.5
+CAMERA_SWITCH_SECONDS = 0.5
 
 
 class BoardCamera(object):
@@ -36,10 +49,10 @@ class BoardCamera(object):
 
         # bookmark related
         self._bookmarks = None
+        self._bookmark_names = set()
+        self._rejected_bookmarks = []
         self._cur_bookmark = None
-        self._includes_prefix = ['board']
-        self._excludes = {'prefix': [],
-                        'postfix': []}
+        self._bookmark_filter = BookmarkFilter.BookmarkFilter()
 
     @property
     def camera(self):
@@ -56,7 +69,8 @@ class BoardCamera(object):
         :type   cam: C{str}
         :param  cam: camera to be object
         '''
-        cam_shape = mc.listRelatives(cam, type='camera')[0] or ''
+        cam_shape = mc.listRelatives(cam, type='camera',
+                                     fullPath=True)[0] or ''
         if not cam_shape:
             raise TypeError("%s is not a camera" % cam)
         self._camera = cam
@@ -122,13 +136,23 @@ class BoardCamera(object):
         :type   bmarks: C{list}
         :param  bmarks: list of bookmarks to process
         '''
-        new_bmarks = []
-        for bmark in bmarks:
-            if not re.match(self.exclude_prefix_pattern, bmark) \
-                    and not re.match(self.exclude_postfix_pattern, bmark):
-                new_bmarks.append(bmark)
+        self._bookmarks, self._rejected_bookmarks = \
+                                            self._bookmark_filter.split(bmarks)
+        self._bookmark_names = set(self._bookmarks)
+
+    @property
+    def rejected_bookmarks(self):
+        '''
+        get list of bookmarks excluded by the exclude patterns
+        '''
+        return self._rejected_bookmarks
 
-        self._bookmarks = new_bmarks
+    @property
+    def bookmark_filter(self):
+        '''
+        get filter used to exclude bookmarks
+        '''
+        return self._bookmark_filter
 
     @property
     def current_bookmark(self):
@@ -153,7 +177,8 @@ class BoardCamera(object):
         combine and compile pattern for locating bookmarks
             that match the list of specified prefixes
         '''
-        return re.compile("^(%s)[_\w]*$" % "|".join(self._includes_prefix))
+        return BookmarkFilter.compile_pattern("^(%s)[_\w]*$"
+                        % "|".join(self._bookmark_filter.include_prefixes))
 
     @property
     def exclude_prefix_pattern(self):
@@ -161,10 +186,11 @@ class BoardCamera(object):
         combine and compile pattern for locating bookmarks
             that match the list of specified prefixes to exclude
         '''
-        if not self._excludes['prefix']:
+        if not self._bookmark_filter.exclude_prefixes:
             return self.empty_pattern
 
-        return re.compile("^(%s)[_\w]+$" % "|".join(self._excludes['prefix']))
+        return BookmarkFilter.compile_pattern(BookmarkFilter.prefix_rule(
+                                    self._bookmark_filter.exclude_prefixes))
 
     @property
     def exclude_postfix_pattern(self):
@@ -172,17 +198,18 @@ class BoardCamera(object):
         combine and compile pattern for locating bookmarks
             that match the list of specified postfixes to exclude
         '''
-        if not self._excludes['postfix']:
+        if not self._bookmark_filter.exclude_postfixes:
             return self.empty_pattern
 
-        return re.compile("^[\w_]+(%s)" % "|".join(self._excludes['postfix']))
+        return BookmarkFilter.compile_pattern(BookmarkFilter.postfix_rule(
+                                    self._bookmark_filter.exclude_postfixes))
 
     @property
     def empty_pattern(self):
         '''
         false pattern to use when an exclude list is empty
         '''
-        return re.compile("^$")
+        return BookmarkFilter.compile_pattern("^$")
 
     def use_exclude_prefixes(self, exprefixes):
         '''
@@ -191,8 +218,7 @@ class BoardCamera(object):
         :type   exprefixes: C{list}
         :param  exprefixes: list of prefixes to exclude bookmarks
         '''
-        for prefix in exprefixes:
-            self._excludes['prefix'].append(prefix)
+        self._bookmark_filter.add_rules(exclude_prefixes=exprefixes)
 
     def use_exclude_postfixes(self, expostfixes):
         '''
@@ -201,20 +227,33 @@ class BoardCamera(object):
         :type   expostfixes: C{list}
         :param  expostfixes: list of postfixes to exclude bookmarks
         '''
-        for postfix in expostfixes:
-            self._excludes['postfix'].append(postfix)
+        self._bookmark_filter.add_rules(exclude_postfixes=expostfixes)
+
+    def use_exclude_globs(self, exglobs):
+        '''
+        add user specified shell style patterns to exclude bookmarks
+
+        :type   exglobs: C{list}
+        :param  exglobs: list of patterns to exclude bookmarks, ie. "*_temp"
+        '''
+        self._bookmark_filter.add_rules(exclude_globs=exglobs)
+
+    def use_exclude_regexes(self, exregexes):
+        '''
+        add user specified regular expressions to exclude bookmarks
+
+        :type   exregexes: C{list}
+        :param  exregexes: list of regular expressions to exclude bookmarks
+        '''
+        self._bookmark_filter.add_rules(exclude_regexes=exregexes)
 
     def remove_exclude_prefix(self):
         '''
         make sure any default include prefixes are not within
-            the specified exclude list
+            the specified exclude list. The bookmark filter already drops
+            them whenever its rules are compiled.
         '''
-        new_exclude = []
-        for prefix in self._excludes['prefix']:
-            if not re.match(self.include_prefix_pattern, prefix):
-                new_exclude.append(prefix)
-
-        self._excludes['prefix'] = new_exclude
+        return self._bookmark_filter.exclude_prefixes
 
     def _get_original_attrs(self):
         '''
@@ -256,7 +295,7 @@ class BoardCamera(object):
         :type   bmark: C{str}
         :param  bmark: bookmark for camera position
         '''
-        if bmark and bmark in self.bookmarks:
+        if bmark and bmark in self._bookmark_names:
             mc.cameraView(bmark, edit=True, camera=self.camera, setCamera=True)
             self.current_bookmark = bmark
         elif self.current_bookmark:
@@ -281,11 +320,19 @@ class BoardView(object):
         self._current_panel = None
         self.camera = camera
         self._isolate_objs = isolate_objs
+        self._isolated = []
         self.display_defaults = None
 
         self._get_current_panel()
         self._get_display_defaults()
 
+    @property
+    def panel(self):
+        '''
+        get model panel used for screen grabs
+        '''
+        return self._current_panel
+
     def _get_current_panel(self):
         '''
         determine current model panel for use
@@ -319,15 +366,54 @@ class BoardView(object):
         '''
         prep current view panel with required settings for screen grab
         '''
-        mel.eval('lookThroughModelPanel %s %s' %
-                                            (self.camera, self._current_panel))
         if self._isolate_objs:
+            self.isolate(mc.ls(selection=True, long=True))
+        self.prep_display()
+
+    def isolate(self, nodes):
+        '''
+        isolate nodes in the view and fit the camera to them, swapping out
+            whatever was isolated before rather than rebuilding the view
+
+        :type   nodes: C{list}
+        :param  nodes: nodes to isolate
+        '''
+        if not isinstance(nodes, list):
+            nodes = [nodes]
+
+        if not self._isolated:
             # mel.eval('enableIsolateSelect %s %s;' %
             #                         (self._current_panel, self._isolate_objs))
-            mc.isolateSelect(self._current_panel, state=self._isolate_objs)
-            mc.isolateSelect(self._current_panel, addSelected=True)
-            mc.viewFit()
+            mc.isolateSelect(self._current_panel, state=True)
+        for node in self._isolated:
+            if mc.objExists(node):
+                mc.isolateSelect(self._current_panel, removeDagObject=node)
+        for node in nodes:
+            mc.isolateSelect(self._current_panel, addDagObject=node)
+        self._isolated = list(nodes)
+
+        mc.select(nodes, replace=True)
+        mc.viewFit(self.camera)
+        mc.select(clear=True)
+
+    def look_through(self, camera=None):
+        '''
+        look through camera in the current view panel
 
+        :type   camera: C{str}
+        :param  camera: *OPTIONAL* camera to switch the view to
+        '''
+        if camera:
+            self.camera = camera
+        mel.eval('lookThroughModelPanel %s %s' %
+                                            (self.camera, self._current_panel))
+
+    def prep_display(self):
+        '''
+        look through camera and set renderer and display settings of the
+            current view panel for screen grab
+        '''
+        self.look_through()
         mc.select(clear=True)
 
         # attempt to use Viewport 2.0 for better image
@@ -352,12 +438,88 @@ class BoardView(object):
         '''
         mc.isolateSelect(self._current_panel, state=False)
         # mel.eval('enableIsolateSelect %s %s;' % (self._current_panel, False))
+        self._isolated = []
         mc.modelEditor(self._current_panel, edit=True,
                         displayAppearance=self.display_defaults['appearance'],
                         displayTextures=self.display_defaults['textures'],
                         displayLights=self.display_defaults['lights'])
 
 
+class BoardCaptureSession(object):
+    '''
+    sets up camera and view panel once for a batch of asset screen grabs, so
+        only the isolated asset changes between grabs, ie.
+
+        with BoardCaptureSession(camera) as session:
+            for node in nodes:
+                session.isolate(node)
+                ScreenBoard(...).grab_all()
+    '''
+    def __init__(self, camera):
+        '''
+        initialize instance variables
+
+        :type   camera: C{str}
+        :param  camera: camera that screen grabs are taken from
+        '''
+        self._cam = BoardCamera()
+        self._cam.camera = camera
+        self._view = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end()
+
+    @property
+    def camera(self):
+        '''
+        get board camera of the session
+        '''
+        return self._cam
+
+    @property
+    def view(self):
+        '''
+        get board view of the session, None before the session is started
+        '''
+        return self._view
+
+    def start(self):
+        '''
+        prep camera attributes and view panel for the whole batch
+        '''
+        sys.stdout.write("prepping camera %s..." % self._cam.camera)
+        self._cam.prep_camera()
+
+        sys.stdout.write('prepping board view for capture session')
+        self._view = BoardView(self._cam.camera, isolate_objs=True)
+        self._view.prep_display()
+
+    def isolate(self, nodes):
+        '''
+        isolate asset nodes in the session view, fitting camera to them
+
+        :type   nodes: C{list}
+        :param  nodes: nodes to isolate
+        '''
+        self._view.isolate(nodes)
+
+    def end(self):
+        '''
+        reset view panel and camera to their original settings
+        '''
+        sys.stdout.write("resetting views..")
+        if self._view:
+            self._view.reset_view()
+            self._view = None
+
+        # resetting camera to original position and settings
+        self._cam.reset_original()
+
+
 class BoardImage(object):
     '''
     deals with the processing of a image name for a screen grab
@@ -1119,19 +1281,24 @@ class ScreenBoard(object):
     deals with the processing of screen board grabs for specified item,
         creating image as well as thumbnail image if requested
     '''
-    def __init__(self, image_path=None, thumb_path=None):
+    def __init__(self, image_path=None, thumb_path=None, backend=None):
         '''
         initialize instance
 
         :type   image_path: C{str}
         :param  image_path: path to save image out as
+        :type   backend: C{BoardCaptureBackends.CaptureBackend}
+        :param  backend: *OPTIONAL* backend used to capture the view,
+                            defaults to playblast through the model panel
         '''
+        self._backend = backend or BoardCaptureBackends.PlayblastBackend()
         self._image_path = image_path
         self._image_ext = "jpg"
         self._quality = 40
         self._width_height = (0, 0) # zero's means use panel size
         self._thumb_width_height = (144, 144)
         self._thumb_image_path = thumb_path
+        self._variants = []
 
     @property
     def image_path(self):
@@ -1241,6 +1408,42 @@ class ScreenBoard(object):
         '''
         self._thumb_image_path = thumb_path
 
+    @property
+    def backend(self):
+        '''
+        get backend used to capture the view
+        '''
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend):
+        '''
+        set backend used to capture the view, ie. an offscreen backend to
+            capture without an interactive model panel
+
+        :type   backend: C{BoardCaptureBackends.CaptureBackend}
+        :param  backend: capture backend to use
+        '''
+        self._backend = backend
+
+    @property
+    def variants(self):
+        '''
+        get list of post-processing variants written from every grab_all
+        '''
+        return self._variants
+
+    @variants.setter
+    def variants(self, variants):
+        '''
+        set post-processing variants written from every grab_all, ie. web
+            previews or re-encodes of the board
+
+        :type   variants: C{list}
+        :param  variants: list of C{BoardImageOps.BoardVariant}
+        '''
+        self._variants = list(variants)
+
     def use_board_image(self, board_image, do_thumb=True):
         '''
         utilize BoardImage variant object as basis for details
@@ -1274,11 +1477,8 @@ class ScreenBoard(object):
         '''
         sys.stdout.write("Generating screen board thumbnail image %s" \
                                                         % self.thumb_image_path)
-        mc.playblast(
-                frame=1, format="image", completeFilename=self.thumb_image_path,
-                clearCache=True, viewer=False, showOrnaments=False,
-                compression=self.image_ext, quality=self.quality, percent=100,
-                widthHeight=self.thumb_width_height)
+        self.backend.capture(self.thumb_image_path, self.thumb_width_height,
+                             self.image_ext, self.quality)
 
     def grab(self):
         '''
@@ -1293,17 +1493,62 @@ class ScreenBoard(object):
                                 image; values of 0 means current panel size
         '''
         sys.stdout.write("Generating screen board image %s" % self.image_path)
-        mc.playblast(
-                frame=1, format="image", completeFilename=self.image_path,
-                clearCache=True, viewer=False, showOrnaments=False,
-                compression=self.image_ext, quality=self.quality, percent=100,
-                widthHeight=self.width_height)
+        self.backend.capture(self.image_path, self.width_height,
+                             self.image_ext, self.quality)
 
+    def grab_all(self, extra_sizes=None):
+        '''
+        generate screen grab once at full resolution, producing the thumbnail,
+            any extra sizes and the post-processing variants from the captured
+            image in-process rather than rendering the view again for each.
+            Compressed boards are captured lossless first, so the thumbnail
+            and sizes are not encoded from an already compressed image.
 
-def do_layout_boards(use_path=None, exclude_prefixes=[],
-                     exclude_postfixes=[], use_panel=False):
+        :type   extra_sizes: C{list}
+        :param  extra_sizes: *OPTIONAL* list of (path, width, height) of
+                                additional sizes to write
+        :return: C{list} of written post-processed image paths
+        '''
+        if self.image_ext.lower() not in BoardImageOps.LOSSY_FORMATS:
+            self.grab()
+            frame = BoardImageOps.read_image(self.image_path)
+        else:
+            sys.stdout.write("Generating screen board image %s"
+                                                            % self.image_path)
+            capture_dir = tempfile.mkdtemp(prefix='board_')
+            capture_path = os.path.join(capture_dir, 'capture.%s'
+                                                % BoardImageOps.LOSSLESS_EXT)
+            try:
+                self.backend.capture(capture_path, self.width_height,
+                                     BoardImageOps.LOSSLESS_EXT, 100)
+                frame = BoardImageOps.read_image(capture_path)
+            finally:
+                shutil.rmtree(capture_dir, ignore_errors=True)
+            BoardImageOps.write_image(frame, self.image_path, self.image_ext,
+                                      self.quality)
+
+        variants = []
+        if self.thumb_image_path:
+            variants.append(BoardImageOps.BoardVariant(self.thumb_image_path,
+                                                self.thumb_width_height[0],
+                                                self.thumb_width_height[1],
+                                                self.image_ext,
+                                                quality=self.quality))
+        for image_path, width, height in extra_sizes or []:
+            variants.append(BoardImageOps.BoardVariant(image_path, width,
+                                                       height, self.image_ext,
+                                                       quality=self.quality))
+        variants.extend(self.variants)
+
+        sys.stdout.write("Post-processing screen board image to %d variants"
+                                                            % len(variants))
+        return BoardImageOps.PostProcessStage(variants).run(frame)
+
+
+def _prep_layout_boards(use_path=None, exclude_prefixes=[],
+                        exclude_postfixes=[], use_panel=False):
     '''
-    process layout image boards for selected camera with specified options
+    prep board camera and layout board image from the current selection
 
     :type   use_path: C{str}
     :param  use_path: user specified path to save image boards to
@@ -1313,6 +1558,7 @@ def do_layout_boards(use_path=None, exclude_prefixes=[],
     :param  exclude_postfixes: list of postfixes to exclude bookmarks
     :type   use_panel: C{bool}
     :param  use_panel: if True, use the panels current size for resolution
+    :return: C{tuple} of C{BoardCamera} and C{LayoutBoardImage}
     '''
     sel = mc.ls(sl=True)
     if len(sel) < 1:
@@ -1342,29 +1588,438 @@ def do_layout_boards(use_path=None, exclude_prefixes=[],
     if use_panel:
         set_image.use_panel()
 
+    return cam, set_image
+
+
+def preview_layout_bookmarks(exclude_prefixes=[], exclude_postfixes=[]):
+    '''
+    get bookmarks of the selected camera that layout boards would be
+        created for, and those the exclude patterns reject
+
+    :type   exclude_prefixes: C{list}
+    :param  exclude_prefixes: list of prefixes to exclude bookmarks
+    :type   exclude_postfixes: C{list}
+    :param  exclude_postfixes: list of postfixes to exclude bookmarks
+    :return: C{tuple} of matched and rejected bookmark lists
+    '''
+    sel = mc.ls(sl=True)
+    if len(sel) < 1:
+        raise Exception("Incorrect selection. Need to select a camera "
+                        + "to preview its bookmarks.")
+
+    cam = BoardCamera()
+    cam.camera = sel[0]
+    cam.use_exclude_prefixes(exclude_prefixes)
+    cam.use_exclude_postfixes(exclude_postfixes)
+    cam.bookmarks = cam.all_bookmarks
+
+    return cam.bookmarks, cam.rejected_bookmarks
+
+
+def do_layout_boards(use_path=None, exclude_prefixes=[],
+                     exclude_postfixes=[], use_panel=False, use_cache=True):
+    '''
+    process layout image boards for selected camera with specified options
+
+    :type   use_path: C{str}
+    :param  use_path: user specified path to save image boards to
+    :type   exclude_prefixes: C{list}
+    :param  exclude_prefixes: list of prefixes to exclude bookmarks
+    :type   exclude_postfixes: C{list}
+    :param  exclude_postfixes: list of postfixes to exclude bookmarks
+    :type   use_panel: C{bool}
+    :param  use_panel: if True, use the panels current size for resolution
+    :type   use_cache: C{bool}
+    :param  use_cache: skip boards whose published image is still up to date
+    '''
+    cam, set_image = _prep_layout_boards(use_path, exclude_prefixes,
+                                         exclude_postfixes, use_panel)
+
     # prepping panel view setup
     sys.stdout.write("Prepping the board view")
     bview = BoardView(cam.camera)
     bview.prep_view()
 
+    cache = None
+    scene_print = None
+    if use_cache:
+        cache = BoardCaptureCache.BoardCaptureCache()
+        scene_print = _layout_scene_fingerprint(bview, set_image)
+
     sys.stdout.write('About to process %02d bookmarks for cam %s'\
                                             % (len(cam.bookmarks), cam.camera))
     for bmark in cam.bookmarks:
-        sys.stdout.write('processing %s' % bmark)
-        cam.set_to_bookmark(bmark)
-        set_image.img_file = bmark
-        sys.stdout.write('grabbing %s' % set_image.full_pub_path)
+        _grab_layout_board(cam, bmark, set_image, cache, scene_print)
 
-        # prepping screen board
-        screen_board = ScreenBoard()
-        screen_board.use_board_image(set_image, do_thumb=False)
-        screen_board.grab()
+    if cache:
+        cache.save()
+        cache.report()
 
     sys.stdout.write('completed processing bookmarks.. resetting environment..')
     bview.reset_view()
     cam.reset_original()
 
 
+def _layout_scene_fingerprint(bview, set_image):
+    '''
+    get fingerprint shared by all layout boards of a batch. Layout boards
+        show the whole scene, only the camera changes between bookmarks.
+    '''
+    return BoardCaptureCache.board_fingerprint(
+                        BoardCaptureCache.nodes_fingerprint(),
+                        BoardCaptureCache.lights_fingerprint(),
+                        BoardCaptureCache.display_fingerprint(bview.panel),
+                        set_image.width_height if all(set_image.width_height)
+                                                else get_current_panel_size(),
+                        set_image.img_quality, set_image.img_extension)
+
+
+def _grab_layout_board(cam, bmark, set_image, cache=None, scene_print=None):
+    '''
+    grab layout board of a single bookmark, unless the cache has it as
+        up to date
+
+    :return: C{bool} True if the board was grabbed
+    '''
+    sys.stdout.write('processing %s' % bmark)
+    cam.set_to_bookmark(bmark)
+    set_image.img_file = bmark
+
+    if cache:
+        board_print = BoardCaptureCache.board_fingerprint(scene_print,
+                            BoardCaptureCache.camera_fingerprint(cam.camera))
+        if cache.is_current(set_image.full_pub_path, board_print):
+            sys.stdout.write('%s is up to date' % set_image.full_pub_path)
+            return False
+
+    sys.stdout.write('grabbing %s' % set_image.full_pub_path)
+
+    # prepping screen board
+    screen_board = ScreenBoard()
+    screen_board.use_board_image(set_image, do_thumb=False)
+    screen_board.grab()
+
+    if cache:
+        cache.store(set_image.full_pub_path, board_print)
+
+    return True
+
+
+def _scene_layout_cameras(exclude_prefixes=[], exclude_postfixes=[]):
+    '''
+    collect a board camera for every scene camera that has bookmarks left
+        after the excludes, sorted by camera name
+    '''
+    cams = []
+    for cam_shape in mc.ls(type='camera'):
+        if mc.camera(cam_shape, query=True, startupCamera=True) \
+                or not mc.listConnections('%s.bookmarks' % cam_shape):
+            continue
+
+        cam = BoardCamera()
+        # full path, scenes can hold several cameras of the same name
+        cam.camera = mc.listRelatives(cam_shape, parent=True,
+                                      fullPath=True)[0]
+        cam.use_exclude_prefixes(exclude_prefixes)
+        cam.use_exclude_postfixes(exclude_postfixes)
+        cam.bookmarks = cam.all_bookmarks
+        if cam.bookmarks:
+            cams.append(cam)
+
+    return sorted(cams, key=lambda x: x.camera)
+
+
+def _scene_layout_board_image(use_path=None, use_panel=False):
+    '''
+    prep layout board image for scene wide batches, named after the
+        selected layout set group node if any
+    '''
+    sel_nodes = [node for node in mc.ls(sl=True)
+                            if not mc.listRelatives(node, type='camera')]
+    set_image = LayoutBoardImage((sel_nodes or [''])[0], use_path=use_path)
+    if use_panel:
+        set_image.use_panel()
+
+    return set_image
+
+
+def _scene_layout_plan(cams, set_image):
+    '''
+    collect board jobs of all cameras, grouped by camera, with the total
+        count and estimated capture time
+    '''
+    width, height = set_image.width_height
+    if not width or not height:
+        width, height = get_current_panel_size()
+
+    jobs = []
+    for cam in cams:
+        for bmark in cam.bookmarks:
+            set_image.img_file = bmark
+            jobs.append({'camera': cam.camera, 'bookmark': bmark,
+                         'path': set_image.full_pub_path,
+                         'width': width, 'height': height,
+                         'quality': set_image.img_quality,
+                         'ext': set_image.img_extension})
+
+    return {'cameras': [cam.camera for cam in cams], 'jobs': jobs,
+            'count': len(jobs),
+            'estimated_seconds': len(jobs) * LAYOUT_BOARD_SECONDS
+                                    + len(cams) * CAMERA_SWITCH_SECONDS}
+
+
+def plan_scene_layout_boards(use_path=None, exclude_prefixes=[],
+                             exclude_postfixes=[], use_panel=False):
+    '''
+    plan layout boards for every camera in the scene with matching
+        bookmarks, without capturing anything
+
+    :type   use_path: C{str}
+    :param  use_path: user specified path to save image boards to
+    :type   exclude_prefixes: C{list}
+    :param  exclude_prefixes: list of prefixes to exclude bookmarks
+    :type   exclude_postfixes: C{list}
+    :param  exclude_postfixes: list of postfixes to exclude bookmarks
+    :type   use_panel: C{bool}
+    :param  use_panel: if True, use the panels current size for resolution
+    :return: C{dict} with 'cameras', 'jobs' grouped by camera, total 'count'
+                and 'estimated_seconds'
+    '''
+    plan = _scene_layout_plan(
+                    _scene_layout_cameras(exclude_prefixes, exclude_postfixes),
+                    _scene_layout_board_image(use_path, use_panel))
+
+    sys.stdout.write('Planned %d layout boards across %d cameras, '
+                     'estimated %.0fs' % (plan['count'], len(plan['cameras']),
+                                          plan['estimated_seconds']))
+    return plan
+
+
+def do_scene_layout_boards(use_path=None, exclude_prefixes=[],
+                           exclude_postfixes=[], use_panel=False,
+                           use_cache=True):
+    '''
+    process layout image boards for every camera in the scene with matching
+        bookmarks as one batch, setting up the view panel once and
+        capturing all boards of a camera before switching to the next
+
+    :type   use_path: C{str}
+    :param  use_path: user specified path to save image boards to
+    :type   exclude_prefixes: C{list}
+    :param  exclude_prefixes: list of prefixes to exclude bookmarks
+    :type   exclude_postfixes: C{list}
+    :param  exclude_postfixes: list of postfixes to exclude bookmarks
+    :type   use_panel: C{bool}
+    :param  use_panel: if True, use the panels current size for resolution
+    :type   use_cache: C{bool}
+    :param  use_cache: skip boards whose published image is still up to date
+    :return: C{dict} of the plan with 'grabbed' count and 'seconds' taken
+    '''
+    cams = _scene_layout_cameras(exclude_prefixes, exclude_postfixes)
+    if not cams:
+        raise Exception("No cameras with layout board bookmarks found.")
+
+    set_image = _scene_layout_board_image(use_path, use_panel)
+    plan = _scene_layout_plan(cams, set_image)
+    sys.stdout.write('About to process %d layout boards across %d cameras, '
+                     'estimated %.0fs' % (plan['count'], len(cams),
+                                          plan['estimated_seconds']))
+
+    # prepping panel view setup once for all cameras
+    sys.stdout.write("Prepping the board view")
+    bview = BoardView(cams[0].camera)
+    bview.prep_view()
+
+    cache = None
+    scene_print = None
+    if use_cache:
+        cache = BoardCaptureCache.BoardCaptureCache()
+        scene_print = _layout_scene_fingerprint(bview, set_image)
+
+    start = time.time()
+    done = 0
+    grabbed = 0
+    try:
+        for cam in cams:
+            sys.stdout.write('switching to cam %s for %02d bookmarks'
+                                            % (cam.camera, len(cam.bookmarks)))
+            bview.look_through(cam.camera)
+            try:
+                for bmark in cam.bookmarks:
+                    if _grab_layout_board(cam, bmark, set_image, cache,
+                                          scene_print):
+                        grabbed += 1
+                    done += 1
+
+                    elapsed = time.time() - start
+                    sys.stdout.write('[%d/%d] %.0fs elapsed, %.0fs remaining'
+                                % (done, plan['count'], elapsed,
+                                   elapsed / done * (plan['count'] - done)))
+            finally:
+                cam.reset_original()
+    finally:
+        if cache:
+            cache.save()
+            cache.report()
+
+        sys.stdout.write('completed processing bookmarks.. '
+                                                + 'resetting environment..')
+        bview.reset_view()
+
+    plan['grabbed'] = grabbed
+    plan['seconds'] = time.time() - start
+    return plan
+
+
+def do_layout_contact_sheets(use_path=None, exclude_prefixes=[],
+                             exclude_postfixes=[], columns=4, rows=4,
+                             tile_size=(384, 216)):
+    '''
+    tile the published layout boards of the selected camera into labelled
+        contact sheets, reading one board at a time
+
+    :type   use_path: C{str}
+    :param  use_path: user specified path the image boards were saved to
+    :type   exclude_prefixes: C{list}
+    :param  exclude_prefixes: list of prefixes to exclude bookmarks
+    :type   exclude_postfixes: C{list}
+    :param  exclude_postfixes: list of postfixes to exclude bookmarks
+    :type   columns: C{int}
+    :param  columns: number of boards across a sheet
+    :type   rows: C{int}
+    :param  rows: number of boards down a sheet
+    :type   tile_size: C{tuple}
+    :param  tile_size: width and height each board is scaled to
+    :return: C{list} of written sheet paths
+    '''
+    cam, set_image = _prep_layout_boards(use_path, exclude_prefixes,
+                                         exclude_postfixes)
+
+    sheet_path = os.path.join(set_image.pub_dir, "%s_contact_v%03d_%%02d.%s"
+                                % (set_image.img_prefix, set_image.version,
+                                   set_image.img_extension))
+    sheet = BoardContactSheet.ContactSheet(sheet_path, columns, rows,
+                                           tile_size,
+                                           ext=set_image.img_extension)
+    with sheet:
+        for bmark in cam.bookmarks:
+            set_image.img_file = bmark
+            if not os.path.isfile(set_image.full_pub_path):
+                sys.stdout.write('skipping %s, no board found at %s'
+                                        % (bmark, set_image.full_pub_path))
+                continue
+            sheet.add(set_image.full_pub_path,
+                      '%s v%03d' % (bmark, set_image.version))
+
+    sys.stdout.write('wrote %d contact sheets: %s' % (len(sheet.written),
+                                                      ', '.join(sheet.written)))
+    return sheet.written
+
+
+def plan_layout_boards(use_path=None, exclude_prefixes=[],
+                       exclude_postfixes=[], use_panel=False):
+    '''
+    collect a board job for every bookmark of the selected camera, without
+        capturing anything, so boards can be rendered outside this session
+
+    :type   use_path: C{str}
+    :param  use_path: user specified path to save image boards to
+    :type   exclude_prefixes: C{list}
+    :param  exclude_prefixes: list of prefixes to exclude bookmarks
+    :type   exclude_postfixes: C{list}
+    :param  exclude_postfixes: list of postfixes to exclude bookmarks
+    :type   use_panel: C{bool}
+    :param  use_panel: if True, use the panels current size for resolution
+    :return: C{list} of job dicts with 'camera', 'bookmark', 'path',
+                'width', 'height', 'quality' and 'ext'
+    '''
+    cam, set_image = _prep_layout_boards(use_path, exclude_prefixes,
+                                         exclude_postfixes, use_panel)
+
+    # workers have no panel, so panel sizes are resolved up front
+    return _scene_layout_plan([cam], set_image)['jobs']
+
+
+def _default_mayapy():
+    '''
+    get mayapy interpreter installed next to the running maya executable
+    '''
+    mayapy = os.path.join(os.path.dirname(sys.executable), 'mayapy')
+    if sys.platform.startswith('win'):
+        mayapy += '.exe'
+
+    if os.path.isfile(mayapy):
+        return mayapy
+
+    return sys.executable
+
+
+def do_layout_boards_parallel(use_path=None, exclude_prefixes=[],
+                              exclude_postfixes=[], use_panel=False,
+                              workers=4, mayapy=None, renderer='ogs'):
+    '''
+    process layout image boards for selected camera, splitting the bookmarks
+        across headless worker sessions rendering the saved scene
+
+    :type   use_path: C{str}
+    :param  use_path: user specified path to save image boards to
+    :type   exclude_prefixes: C{list}
+    :param  exclude_prefixes: list of prefixes to exclude bookmarks
+    :type   exclude_postfixes: C{list}
+    :param  exclude_postfixes: list of postfixes to exclude bookmarks
+    :type   use_panel: C{bool}
+    :param  use_panel: if True, use the panels current size for resolution
+    :type   workers: C{int}
+    :param  workers: number of worker sessions
+    :type   mayapy: C{str}
+    :param  mayapy: *OPTIONAL* path to mayapy for the workers
+    :type   renderer: C{str}
+    :param  renderer: one of BoardRenderWorker.RENDERERS, "standin" writes
+                        placeholder images without starting Maya
+    :return: C{dict} with 'rendered' and 'failed' results and 'seconds'
+    '''
+    scene_file = mc.file(query=True, sceneName=True)
+    if not scene_file:
+        raise Exception("Scene needs to be saved before boards can be "
+                        + "rendered by worker sessions.")
+    if mc.file(query=True, modified=True):
+        sys.stdout.write("Scene has unsaved changes. Workers render the "
+                         + "last saved version of %s" % scene_file)
+
+    jobs = plan_layout_boards(use_path, exclude_prefixes, exclude_postfixes,
+                              use_panel)
+
+    def progress(done, total, result):
+        status = 'FAILED' if result['error'] else 'done'
+        sys.stdout.write('[%d/%d] %s %s: %s' % (done, total, status,
+                                                result['bookmark'],
+                                                result['path']))
+
+    sys.stdout.write('About to render %02d bookmarks across %d workers'
+                                                        % (len(jobs), workers))
+    results = BoardRenderWorker.render_jobs(scene_file, jobs, workers,
+                                            mayapy or _default_mayapy(),
+                                            renderer, progress)
+
+    sys.stdout.write('Rendered %d of %d boards in %.2fs'
+                            % (len(results['rendered']), len(jobs),
+                               results['seconds']))
+    for result in results['failed']:
+        sys.stdout.write('FAILED %s: %s' % (result['bookmark'],
+                                            result['error'].splitlines()[0]))
+
+    return results
+
+
+def get_current_panel_size():
+    '''
+    retrieve width and height of the currently active model editor
+    '''
+    current_editor = mc.playblast(activeEditor=True)
+    return (mc.control(current_editor, query=True, width=True),
+            mc.control(current_editor, query=True, height=True))
+
+
 def get_current_camera():
     '''
     retrieve currently active camera
@@ -1380,7 +2035,8 @@ def get_current_camera():
         raise
 
 
-def do_boards(nodes=None, current_asset_category="environments"):
+def do_boards(nodes=None, current_asset_category="environments",
+              use_cache=True):
     '''
     process image boards for specified assets
 
@@ -1388,6 +2044,8 @@ def do_boards(nodes=None, current_asset_category="environments"):
     :param  nodes: node assets to create images for
     :type   current_asset_category: C{str}
     :param  current_asset_category: asset category type to process
+    :type   use_cache: C{bool}
+    :param  use_cache: skip assets whose published boards are still up to date
     '''
     if not nodes:
         nodes = mc.ls(selection=True, long=True)
@@ -1396,52 +2054,68 @@ def do_boards(nodes=None, current_asset_category="environments"):
         nodes = [nodes]
 
     sys.stdout.write("About to process nodes: %s" % nodes)
-    # prepping camera details
-    current_cam = get_current_camera()
-    cam = BoardCamera()
-    cam.camera = current_cam
+    # camera and view panel are set up once for all nodes
+    session = BoardCaptureSession(get_current_camera())
+    session.start()
 
-    for node in nodes:
-        sys.stdout.write("processing node, %s, as category: %s"
+    cache = None
+    if use_cache:
+        cache = BoardCaptureCache.BoardCaptureCache()
+        lights_print = BoardCaptureCache.lights_fingerprint()
+        display_print = BoardCaptureCache.display_fingerprint(
+                                                        session.view.panel)
+
+    try:
+        for node in nodes:
+            sys.stdout.write("processing node, %s, as category: %s"
                                             % (node, current_asset_category))
-        asset_board = None
-        if current_asset_category == "characters":
-            asset_board = CharacterBoardImage(node)
-        elif current_asset_category == "environments":
-            asset_board = EnvironmentBoardImage(node)
-        else:
-            raise TypeError("Asset category %s, is not either type " \
+            asset_board = None
+            if current_asset_category == "characters":
+                asset_board = CharacterBoardImage(node)
+            elif current_asset_category == "environments":
+                asset_board = EnvironmentBoardImage(node)
+            else:
+                raise TypeError("Asset category %s, is not either type " \
                                             + "'characters' or 'environments'.")
 
-        sys.stdout.write("Prepping screen boards for %s asset." % node)
-
-        # make sure character asset is selected
+            sys.stdout.write("Prepping screen boards for %s asset." % node)
+
+            # only isolate membership changes between assets
+            sys.stdout.write('isolating asset in board view')
+            session.isolate(node)
+
+            sys.stdout.write('prepping screen board...')
+            # prepping screen board
+            screen_board = ScreenBoard()
+            sys.stdout.write('setting use board...')
+            screen_board.use_board_image(asset_board)
+
+            board_print = None
+            if cache:
+                board_print = BoardCaptureCache.board_fingerprint(
+                        BoardCaptureCache.nodes_fingerprint([node]),
+                        lights_print, display_print,
+                        BoardCaptureCache.camera_fingerprint(
+                                                    session.camera.camera),
+                        screen_board.width_height,
+                        screen_board.thumb_width_height,
+                        screen_board.quality, screen_board.image_ext)
+                # the thumbnail is always written alongside the image
+                if cache.is_current(screen_board.image_path, board_print,
+                                    [screen_board.thumb_image_path]):
+                    sys.stdout.write('%s is up to date'
+                                                    % screen_board.image_path)
+                    continue
+
+            sys.stdout.write('now grabbing screen board...')
+            screen_board.grab_all()
+            if cache:
+                cache.store(screen_board.image_path, board_print)
+    finally:
+        if cache:
+            cache.save()
+            cache.report()
+
+        # resetting view and camera to original settings
+        session.end()
         mc.select(deselect=True)
-        mc.select(node)
-
-        sys.stdout.write("prepping camera %s..." % current_cam)
-        cam.prep_camera()
-
-        sys.stdout.write('prepping board view to isolate asset')
-        # prepping panel view setup
-        bview = BoardView(cam.camera, isolate_objs=True)
-        bview.prep_view()
-
-        sys.stdout.write('prepping screen board...')
-        # prepping screen board
-        screen_board = ScreenBoard()
-        sys.stdout.write('setting use board...')
-        screen_board.use_board_image(asset_board)
-        sys.stdout.write('now grabbing screen board...')
-        screen_board.grab()
-        screen_board.grab_thumbnail()
-
-        # resetting to previous environment settings for view
-        sys.stdout.write("resetting views..")
-        bview.reset_view()
-
-        # clear selection
-        mc.select(deselect=True)
-
-    # resetting camera to original position and settings
-    cam.reset_original()